@@ -0,0 +1,210 @@
+"""
+Concurrent inventory fetch engine for Toyota's GraphQL API
+"""
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from config import Config
+from http_cache import RawResponse
+from rate_limiter import get_rate_limiter
+from retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from working_toyota_scraper import InventoryEvent, PageKey, PageResults, ToyotaInventoryAPI
+
+
+class AsyncInventoryEngine:
+    """Runs many SearchInventory queries at once over one keep-alive session"""
+
+    def __init__(self, concurrency: Optional[int] = None, requests_per_second: Optional[float] = None,
+                 page_size: Optional[int] = None, max_pages: Optional[int] = None):
+        self.api = ToyotaInventoryAPI()
+        self.concurrency = concurrency or Config.API_CONCURRENCY
+        self.requests_per_second = requests_per_second if requests_per_second is not None else Config.API_REQUESTS_PER_SECOND
+        self.page_size = page_size or Config.API_PAGE_SIZE
+        self.max_pages = max_pages or Config.MAX_PAGES_TO_SCRAPE
+        self.rate_limiter = get_rate_limiter()
+        self.rate_limiter.configure(self.api.rate_key, self.requests_per_second)
+        self.retry = RetryPolicy()
+        self.breaker = CircuitBreaker()
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a pooled session sized to the concurrency ceiling"""
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        )
+        timeout = aiohttp.ClientTimeout(total=Config.PAGE_LOAD_TIMEOUT)
+        return aiohttp.ClientSession(headers=self.api.headers, connector=connector, timeout=timeout)
+
+    async def _send(self, session: aiohttp.ClientSession, payload: Dict[str, Any],
+                    extra_headers: Dict[str, str]) -> RawResponse:
+        await self.rate_limiter.acquire_async(self.api.rate_key)
+        async with session.post(self.api.api_url, json=payload, headers=extra_headers) as response:
+            self.rate_limiter.observe(self.api.rate_key, response.status, response.headers.get("Retry-After"))
+            return response.status, response.headers, await response.read()
+
+    async def _post(self, session: aiohttp.ClientSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.api.cache.request_async(
+            "POST", self.api.api_url, lambda headers: self._send(session, payload, headers), body=payload
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_page(self, session: aiohttp.ClientSession, zip_code: str, page: int) -> Dict[str, Any]:
+        """Fetch one raw SearchInventory page, retrying timeouts and 429/5xx responses"""
+        payload = self.api.build_payload(zip_code, self.page_size, page)
+        return await self.retry.call_async(
+            self._post, session, payload, description=f"Inventory request for ZIP {zip_code} page {page}"
+        )
+
+    async def fetch_batch(self, session: aiohttp.ClientSession,
+                          keys: List[PageKey]) -> Dict[PageKey, Optional[Dict[str, Any]]]:
+        """Fetch several raw pages in one batched request"""
+        payload = self.api.build_batch_payload(keys, self.page_size)
+        data = await self.retry.call_async(
+            self._post, session, payload, description=f"Batched inventory request for {len(keys)} pages"
+        )
+        return self.api.split_batch_response(data, keys)
+
+    async def _send_request(self, session: aiohttp.ClientSession, request: List[PageKey]) -> Any:
+        """Send one planned request, returning its result or the exception it raised"""
+        try:
+            if len(request) == 1:
+                return await self.fetch_page(session, request[0][0], request[0][1])
+            return await self.fetch_batch(session, request)
+        except Exception as e:
+            return e
+
+    async def fetch_pages(self, session: aiohttp.ClientSession, keys: List[PageKey]) -> PageResults:
+        """Fetch (zip, page) pages in as few requests as the server accepts, returning (pages, errors)"""
+        plan = self.api.page_plan(keys)
+        try:
+            planned = next(plan)
+            while True:
+                planned = plan.send(await asyncio.gather(*(self._send_request(session, request)
+                                                           for request in planned)))
+        except StopIteration as done:
+            return done.value
+
+    async def stream_zips(self, session: aiohttp.ClientSession,
+                          zip_codes: List[str]) -> AsyncIterator[InventoryEvent]:
+        """Run inventory_rounds over the session, yielding its ('vehicles', ...) and ('done', ...) events"""
+        rounds = self.api.inventory_rounds(zip_codes, self.page_size, self.max_pages)
+        reply = None
+        while True:
+            try:
+                event = rounds.send(reply)
+            except StopIteration:
+                return
+            if event[0] == 'fetch':
+                reply = await self.fetch_pages(session, event[1])
+            else:
+                reply = None
+                yield event
+
+    async def iter_inventory(self, zip_codes: Iterable[str], on_start: Optional[Callable[[str], None]] = None
+                             ) -> AsyncIterator[InventoryEvent]:
+        """
+        Yield ('vehicles', zip, vehicles) as each page arrives and ('done', zip, error) as each ZIP code
+        finishes, calling on_start(zip) as each fetch begins
+        """
+        jobs: asyncio.Queue = asyncio.Queue()
+        for zip_code in zip_codes:
+            jobs.put_nowait(zip_code)
+
+        total = jobs.qsize()
+        if not total:
+            return
+
+        # Bounded, so fetching waits for the consumer instead of piling pages up in memory
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+
+        async with self._create_session() as session:
+            async def worker():
+                while True:
+                    # With API_BATCH_SIZE > 1 a worker takes several ZIP codes and batches their queries
+                    chunk = []
+                    while len(chunk) < self.api.batch_size and not jobs.empty():
+                        chunk.append(jobs.get_nowait())
+                    if not chunk:
+                        return
+                    unfinished = set(chunk)
+                    try:
+                        await self.breaker.wait_if_open_async()
+                        if on_start:
+                            for zip_code in chunk:
+                                on_start(zip_code)
+                        async for event in self.stream_zips(session, chunk):
+                            await results.put(event)
+                            if event[0] == 'done':
+                                unfinished.discard(event[1])
+                                self.breaker.record(event[2] is None)
+                    except CircuitOpenError as e:
+                        # Report this and every queued ZIP as failed instead of burning through them
+                        for zip_code in chunk:
+                            await results.put(('done', zip_code, f"CircuitOpenError: {e}"))
+                        while not jobs.empty():
+                            await results.put(('done', jobs.get_nowait(), f"CircuitOpenError: {e}"))
+                        return
+                    except Exception as e:
+                        # Whatever failed, every ZIP in the chunk still gets its ('done', ...) event
+                        for zip_code in unfinished:
+                            await results.put(('done', zip_code, f"{type(e).__name__}: {e}"))
+                        for _ in unfinished:
+                            self.breaker.record(False)
+
+            async def close_results():
+                # Ends the stream once every worker has returned, even one that died without reporting
+                await asyncio.gather(*workers, return_exceptions=True)
+                await results.put(None)
+
+            worker_count = min(self.concurrency, -(-total // self.api.batch_size))
+            workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+            closer = asyncio.create_task(close_results())
+            try:
+                while True:
+                    event = await results.get()
+                    if event is None:
+                        break
+                    yield event
+                while not jobs.empty():
+                    yield 'done', jobs.get_nowait(), "not fetched: every worker stopped"
+            finally:
+                for task in workers + [closer]:
+                    task.cancel()
+                await asyncio.gather(*workers, closer, return_exceptions=True)
+
+    async def fetch_all(self, zip_codes: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Fetch inventory for every ZIP code and collect it by ZIP"""
+        inventory: Dict[str, List[Dict[str, Any]]] = {}
+        async for event in self.iter_inventory(zip_codes):
+            if event[0] == 'vehicles':
+                inventory.setdefault(event[1], []).extend(event[2])
+            elif event[2]:
+                print(f"Error fetching inventory for ZIP {event[1]}: {event[2]}")
+                inventory[event[1]] = []
+            else:
+                inventory.setdefault(event[1], [])
+        return inventory
+
+
+def main():
+    import sys
+    import time
+
+    zip_codes = sys.argv[1:] or ["78712"]
+    engine = AsyncInventoryEngine()
+
+    start = time.monotonic()
+    inventory = asyncio.run(engine.fetch_all(zip_codes))
+    elapsed = time.monotonic() - start
+
+    total = sum(len(vehicles) for vehicles in inventory.values())
+    print(f"\n✅ Retrieved {total} vehicles for {len(inventory)} ZIP codes in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
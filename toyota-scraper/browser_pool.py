@@ -0,0 +1,241 @@
+"""
+Pool of warm Selenium drivers that scrape ZIP codes in parallel
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import Config
+from database import CarDataSink
+from parse_pipeline import ParsePipeline
+from retry import CircuitBreaker, CircuitOpenError
+from toyota_scraper import ToyotaInventoryScraper
+
+# Opens the sink a ZIP code's cars are written to as they are parsed
+SinkFactory = Callable[[str], CarDataSink]
+# Called with the ZIP code's filled sink, still open, once the ZIP code is scraped
+ResultCallback = Callable[[str, CarDataSink], None]
+ErrorCallback = Callable[[str, str], None]
+StartCallback = Callable[[str], None]
+
+
+class WorkerStats:
+    """Throughput counters for a single pool worker"""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.zip_codes = 0
+        self.cars = 0
+        self.pages = 0
+        self.failures = 0
+        self.recycles = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def zips_per_minute(self) -> float:
+        return self.zip_codes * 60 / self.busy_seconds if self.busy_seconds else 0.0
+
+    def summary(self) -> str:
+        avg = self.busy_seconds / self.zip_codes if self.zip_codes else 0.0
+        counted = f"{self.pages} pages" if self.pages else f"{self.cars} cars"
+        return (f"worker {self.worker_id}: {self.zip_codes} ZIPs, {counted}, "
+                f"{self.failures} failures, {self.recycles} recycles, "
+                f"{avg:.1f}s/ZIP, {self.zips_per_minute:.1f} ZIPs/min")
+
+
+class BrowserPool:
+    """
+    Hands ZIP jobs from a shared queue to N headless Chrome workers.
+    With parse_processes > 0 the workers only capture pages; a ParsePipeline parses and stores them.
+    """
+
+    def __init__(self, size: Optional[int] = None, max_zips_per_driver: Optional[int] = None,
+                 scraper_factory: Callable[..., ToyotaInventoryScraper] = ToyotaInventoryScraper,
+                 breaker: Optional[CircuitBreaker] = None, parse_processes: Optional[int] = None):
+        self.size = size or Config.BROWSER_POOL_SIZE
+        self.parse_processes = Config.PARSE_PROCESSES if parse_processes is None else parse_processes
+        self.pipeline: Optional[ParsePipeline] = None
+        self.max_zips_per_driver = max_zips_per_driver or Config.DRIVER_MAX_ZIPS
+        self.scraper_factory = scraper_factory
+        self.breaker = breaker or CircuitBreaker()
+        self.stats: Dict[int, WorkerStats] = {}
+        self._jobs: queue.Queue = queue.Queue()
+        self._callback_lock = threading.Lock()
+
+    def _recycle(self, scraper: Optional[ToyotaInventoryScraper], stats: WorkerStats,
+                 reason: str) -> Optional[ToyotaInventoryScraper]:
+        """Quit a worker's browser and start a fresh one"""
+        print(f"♻️  Worker {stats.worker_id}: recycling driver ({reason})")
+        if scraper:
+            scraper.close_driver()
+        stats.recycles += 1
+        try:
+            return self.scraper_factory(profile_slot=stats.worker_id)
+        except Exception as e:
+            print(f"❌ Worker {stats.worker_id}: could not start a new driver: {e}")
+            return None
+
+    def _worker(self, stats: WorkerStats, open_sink: SinkFactory, on_result: ResultCallback,
+                on_error: Optional[ErrorCallback], on_start: Optional[StartCallback]):
+        """Pull ZIP jobs until the queue is empty"""
+        try:
+            scraper = self.scraper_factory(profile_slot=stats.worker_id)
+        except Exception as e:
+            print(f"❌ Worker {stats.worker_id}: could not start driver: {e}")
+            return
+
+        zips_on_driver = 0
+        try:
+            while True:
+                try:
+                    self.breaker.wait_if_open()
+                except CircuitOpenError as e:
+                    print(f"🛑 Worker {stats.worker_id}: stopping, {e}")
+                    return
+
+                try:
+                    zip_code = self._jobs.get_nowait()
+                except queue.Empty:
+                    return
+
+                if on_start:
+                    with self._callback_lock:
+                        try:
+                            on_start(zip_code)
+                        except Exception as e:
+                            print(f"❌ Worker {stats.worker_id}: error marking ZIP {zip_code} started: {e}")
+
+                start = time.monotonic()
+                sink: Optional[CarDataSink] = None
+                pages = []
+                error = None
+                try:
+                    if self.pipeline:
+                        pages = scraper.capture_zip_code(zip_code)
+                    else:
+                        # Cars are written in batches as each page is parsed, not held until the ZIP is done
+                        sink = open_sink(zip_code)
+                        sink.extend(scraper.iter_zip_code(zip_code))
+                except Exception as e:
+                    if sink:
+                        # Keep the cars parsed before the failure; the sink is not closed, so the ZIP stays due
+                        sink.flush()
+                    print(f"❌ Worker {stats.worker_id}: error scraping ZIP {zip_code}: {e}"
+                          + (f" ({sink.count} cars stored)" if sink else ""))
+                    error = str(e)
+                failed = error is not None
+                zips_on_driver += 1
+
+                stats.zip_codes += 1
+                stats.cars += sink.count if sink else 0
+                stats.pages += len(pages)
+                stats.busy_seconds += time.monotonic() - start
+
+                if error is None and self.pipeline:
+                    try:
+                        # Parsing and storing happen in the pipeline; this waits while it is full
+                        self.pipeline.submit(zip_code, pages)
+                    except Exception as e:
+                        error = f"could not queue pages for parsing: {type(e).__name__}: {e}"
+                        print(f"❌ Worker {stats.worker_id}: {error} (ZIP {zip_code})")
+                        failed = True
+                if error is not None or not self.pipeline:
+                    if not self._report(stats, zip_code, sink, error, on_result, on_error):
+                        failed = True
+
+                if not scraper.is_driver_alive():
+                    failed = True
+                    scraper = self._recycle(scraper, stats, "driver crashed")
+                    zips_on_driver = 0
+                elif zips_on_driver >= self.max_zips_per_driver:
+                    scraper = self._recycle(scraper, stats, f"{zips_on_driver} ZIP codes served")
+                    zips_on_driver = 0
+
+                self.breaker.record(not failed)
+                if failed:
+                    stats.failures += 1
+                if scraper is None:
+                    return
+        finally:
+            if scraper:
+                scraper.close_driver()
+
+    def _report(self, stats: WorkerStats, zip_code: str, sink: Optional[CarDataSink], error: Optional[str],
+                on_result: ResultCallback, on_error: Optional[ErrorCallback]) -> bool:
+        """
+        Hand a finished ZIP code to on_result, or to on_error when it failed or on_result raised.
+        Returns False when the ZIP code was reported as failed.
+        """
+        with self._callback_lock:
+            if error is None:
+                try:
+                    on_result(zip_code, sink)
+                    return True
+                except Exception as e:
+                    print(f"❌ Worker {stats.worker_id}: error handling results for ZIP {zip_code}: {e}")
+                    error = f"result handling failed: {type(e).__name__}: {e}"
+            try:
+                if on_error:
+                    on_error(zip_code, error)
+            except Exception as e:
+                print(f"❌ Worker {stats.worker_id}: error recording failure for ZIP {zip_code}: {e}")
+            return False
+
+    def run(self, zip_codes: Iterable[str], open_sink: SinkFactory, on_result: ResultCallback,
+            on_error: Optional[ErrorCallback] = None, on_start: Optional[StartCallback] = None) -> Dict[int, WorkerStats]:
+        """
+        Scrape every ZIP code into a sink from open_sink(zip), calling on_result(zip, sink) or
+        on_error(zip, reason) as each one finishes
+        """
+        for zip_code in zip_codes:
+            self._jobs.put(zip_code)
+
+        worker_count = min(self.size, self._jobs.qsize())
+        if self.parse_processes > 0 and worker_count:
+            def store_parsed(zip_code: str, car_data: List[Dict[str, Any]]):
+                sink = open_sink(zip_code)
+                sink.extend(car_data)
+                on_result(zip_code, sink)
+
+            self.pipeline = ParsePipeline(self._locked(store_parsed), self._locked(on_error) if on_error else None,
+                                          processes=self.parse_processes)
+            print(f"🧵 Parsing in {self.pipeline.processes} processes "
+                  f"(up to {self.pipeline.queue_size} ZIP codes queued)")
+
+        self.stats = {worker_id: WorkerStats(worker_id) for worker_id in range(1, worker_count + 1)}
+        threads = [
+            threading.Thread(target=self._worker, args=(stats, open_sink, on_result, on_error, on_start), name=f"browser-worker-{worker_id}", daemon=True)
+            for worker_id, stats in self.stats.items()
+        ]
+
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if self.pipeline:
+                self.pipeline.close()
+
+        if not self._jobs.empty():
+            print(f"⚠️  {self._jobs.qsize()} ZIP codes left unprocessed (all workers stopped)")
+
+        return self.stats
+
+    def _locked(self, callback: Callable[..., None]) -> Callable[..., None]:
+        """Run a callback under the lock that serialises every result callback"""
+        def call(*args):
+            with self._callback_lock:
+                callback(*args)
+        return call
+
+    def print_report(self):
+        """Print per-worker and overall throughput"""
+        print("📈 Browser pool throughput:")
+        for stats in self.stats.values():
+            print(f"   - {stats.summary()}")
+        total = sum(stats.zips_per_minute for stats in self.stats.values())
+        print(f"   - combined: {total:.1f} ZIPs/min")
+        if self.pipeline:
+            print(f"   - parse pipeline: {self.pipeline.summary()}")
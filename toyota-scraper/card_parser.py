@@ -0,0 +1,411 @@
+"""
+Single-pass vehicle card extraction over a pluggable HTML parser
+
+Card and field selectors are compiled once into lookup tables keyed by
+class token and tag name, so one walk over a card's elements finds the
+first match for every candidate selector of every field at once, instead
+of one select_one() scan per selector. The year is read from the card's
+text and attribute values rather than by re-serialising the card.
+
+The tree comes from the fastest parser installed: selectolax, then lxml,
+then BeautifulSoup's built-in html.parser (PARSER_BACKEND picks one).
+Run this module to compare the backends on saved result pages:
+
+    python3 card_parser.py fixtures/*.html
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from config import Config
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional
+    lxml = None
+
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+NUMBER_PATTERN = re.compile(r'([\d,]+)')
+PRICE_PATTERN = re.compile(r'\$?([\d,]+)')
+# 17 characters, no I, O or Q (ISO 3779)
+VIN_PATTERN = re.compile(r'\b([A-HJ-NPR-Z0-9]{17})\b')
+SELECTOR_PATTERN = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*)?(?:\.(?P<cls>[\w-]+))?'
+    r'(?:\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)["\']?(?P<value>[^"\'\]]*)["\']?)?\])?$'
+)
+
+CARD_SELECTORS = [
+    ".vehicle-listing",
+    ".inventory-item",
+    ".car-card",
+    ".vehicle-card",
+    "[data-testid*='vehicle']",
+    ".result-item",
+    ".vehicle-result",
+]
+
+
+def _integer(pattern: "re.Pattern") -> Callable[[str], Optional[int]]:
+    def parse(text: str) -> Optional[int]:
+        match = pattern.search(text)
+        digits = match.group(1).replace(',', '') if match else ''
+        return int(digits) if digits else None
+    return parse
+
+
+def _with_keyword(keywords: Sequence[str], transform: Callable[[str], str] = str) -> Callable[[str], Optional[str]]:
+    def parse(text: str) -> Optional[str]:
+        lowered = text.lower()
+        return transform(text) if any(keyword in lowered for keyword in keywords) else None
+    return parse
+
+
+def _vin(text: str) -> Optional[str]:
+    match = VIN_PATTERN.search(text.upper())
+    return match.group(1) if match else None
+
+
+def _absolute_url(href: Optional[str]) -> Optional[str]:
+    if not href:
+        return None
+    return 'https://www.toyota.com' + href if href.startswith('/') else href
+
+
+# field -> (candidate selectors in priority order, parser of the first match's text or href)
+FIELD_RULES: Dict[str, Tuple[List[str], Callable[[str], Any]]] = {
+    'model': (['.model', '.vehicle-model', '.car-model', 'h3', 'h2', '.title'], lambda text: text),
+    'price': (['.price', '.vehicle-price', '.car-price', '[class*="price"]'], _integer(PRICE_PATTERN)),
+    'dealerName': (['.dealer', '.dealer-name', '.dealership', '[class*="dealer"]'], lambda text: text),
+    'fuelType': (['.fuel-type', '.fuel', '[class*="fuel"]'], _with_keyword(['hybrid', 'electric', 'gas', 'gasoline'])),
+    'drivetrain': (['.drivetrain', '.drive', '[class*="drive"]'], _with_keyword(['awd', 'fwd', 'rwd', '4wd'], str.upper)),
+    'mileage': (['.mileage', '.miles', '[class*="mile"]'], _integer(NUMBER_PATTERN)),
+    'availabilityUrl': (['a[href]'], _absolute_url),
+    'vin': (['[data-vin]'], _vin),
+}
+
+# Fields whose value comes from an attribute rather than the element text
+ATTRIBUTE_FIELDS = {'availabilityUrl': 'href', 'vin': 'data-vin'}
+
+# [field, selectors, attribute] triples for extractors that run outside Python (the in-browser one)
+FIELD_SPECS = [[field, selectors, ATTRIBUTE_FIELDS.get(field)] for field, (selectors, _) in FIELD_RULES.items()]
+
+
+# A captured page: ('html', markup, card selectors to try) or ('cars', records already extracted, [])
+PagePayload = Tuple[str, Any, List[str]]
+
+
+def vehicle_key(car_data: Dict[str, Any]) -> tuple:
+    """Identity used to spot vehicles already seen on an earlier page"""
+    if car_data.get('vin'):
+        return ('vin', car_data['vin'])
+    if car_data.get('availabilityUrl'):
+        return ('url', car_data['availabilityUrl'])
+    return ('card', car_data.get('model'), car_data.get('price'), car_data.get('dealerName'))
+
+
+def build_car_record(candidate: Callable[[str, int], Optional[str]], year: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Car record from candidate(field, position), the text (or attribute) of the first element matching a
+    field's selector at that position, or None when nothing matched it. None if there is no model or price.
+    """
+    car_data: Dict[str, Any] = {}
+    for field, (selectors, parse) in FIELD_RULES.items():
+        for position in range(len(selectors)):
+            text = candidate(field, position)
+            value = parse(text) if text is not None else None
+            if value is not None:
+                car_data[field] = value
+                break
+    if year:
+        car_data['year'] = year
+    if not car_data.get('vin') and car_data.get('availabilityUrl'):
+        # Vehicle detail links usually carry the VIN, the only identity that survives price changes
+        vin = _vin(car_data['availabilityUrl'])
+        if vin:
+            car_data['vin'] = vin
+
+    if car_data.get('model') and car_data.get('price'):
+        return car_data
+    return None
+
+
+def record_from_candidates(candidates: Dict[str, List[Optional[str]]], year_text: Optional[str] = None
+                           ) -> Optional[Dict[str, Any]]:
+    """Car record from per-field candidate lists, as returned by the in-browser extractor"""
+    def candidate(field: str, position: int) -> Optional[str]:
+        values = candidates.get(field) or []
+        return values[position] if position < len(values) else None
+
+    return build_car_record(candidate, int(year_text) if year_text else None)
+
+
+class CompiledSelectors:
+    """Simple selectors (tag, .class, [attr], [attr*=value] and combinations) indexed for one-pass matching"""
+
+    def __init__(self, selectors: Sequence[Tuple[Any, str]]):
+        # Each selector is registered under an id; matches are reported as (id, position in its list)
+        self.by_class: Dict[str, List[Tuple[Any, int]]] = {}
+        self.by_tag: Dict[str, List[Tuple[Any, int]]] = {}
+        self.others: List[Tuple[Any, int, Callable[[str, Dict[str, str]], bool]]] = []
+        positions: Dict[Any, int] = {}
+        for owner, selector in selectors:
+            position = positions.get(owner, 0)
+            positions[owner] = position + 1
+            self._add(owner, position, selector)
+
+    def _add(self, owner: Any, position: int, selector: str):
+        match = SELECTOR_PATTERN.match(selector.strip())
+        if not match:
+            raise ValueError(f"unsupported selector for single-pass matching: {selector!r}")
+        tag, cls, attr, op, value = match.group('tag', 'cls', 'attr', 'op', 'value')
+        tag = tag.lower() if tag else None
+        if cls and not tag and not attr:
+            self.by_class.setdefault(cls, []).append((owner, position))
+        elif tag and not cls and not attr:
+            self.by_tag.setdefault(tag, []).append((owner, position))
+        else:
+            def predicate(element_tag: str, attrs: Dict[str, str]) -> bool:
+                if tag and element_tag != tag:
+                    return False
+                if cls and cls not in attrs.get('class', '').split():
+                    return False
+                if attr:
+                    if attr not in attrs:
+                        return False
+                    if op == '=' and attrs[attr] != value:
+                        return False
+                    if op == '*=' and value not in (attrs[attr] or ''):
+                        return False
+                return True
+            self.others.append((owner, position, predicate))
+
+    def matches(self, element_tag: str, attrs: Dict[str, str]) -> Iterator[Tuple[Any, int]]:
+        for token in attrs.get('class', '').split():
+            yield from self.by_class.get(token, ())
+        yield from self.by_tag.get(element_tag, ())
+        for owner, position, predicate in self.others:
+            if predicate(element_tag, attrs):
+                yield owner, position
+
+
+FIELD_SELECTORS = CompiledSelectors([(field, selector) for field, (selectors, _) in FIELD_RULES.items()
+                                     for selector in selectors])
+
+
+class Bs4Backend:
+    """BeautifulSoup with the pure-Python html.parser; always available"""
+
+    name = 'bs4'
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, 'html.parser')
+
+    def elements(self, node) -> Iterator[Any]:
+        """Descendant elements in document order"""
+        return (element for element in node.descendants if isinstance(element, Tag))
+
+    def describe(self, element) -> Tuple[str, Dict[str, str]]:
+        attrs = {key: ' '.join(value) if isinstance(value, list) else value for key, value in element.attrs.items()}
+        return element.name, attrs
+
+    def text(self, element, separator: str = '') -> str:
+        return element.get_text(separator, strip=True)
+
+
+class LxmlBackend:
+    """lxml's C HTML parser"""
+
+    name = 'lxml'
+
+    def parse(self, html: str):
+        return lxml.html.fromstring(html)
+
+    def elements(self, node) -> Iterator[Any]:
+        return node.iterdescendants(etree.Element)
+
+    def describe(self, element) -> Tuple[str, Dict[str, str]]:
+        return element.tag, element.attrib
+
+    def text(self, element, separator: str = '') -> str:
+        return separator.join(piece.strip() for piece in element.itertext() if piece.strip())
+
+
+class SelectolaxBackend:
+    """selectolax's Lexbor engine: the fastest parse and traversal"""
+
+    name = 'selectolax'
+
+    def parse(self, html: str):
+        return LexborHTMLParser(html).root
+
+    def elements(self, node) -> Iterator[Any]:
+        walker = node.traverse(include_text=False)
+        next(walker, None)  # traverse() starts with the node itself
+        return walker
+
+    def describe(self, element) -> Tuple[str, Dict[str, str]]:
+        return element.tag, {key: value or '' for key, value in element.attributes.items()}
+
+    def text(self, element, separator: str = '') -> str:
+        return element.text(deep=True, separator=separator, strip=True)
+
+
+BACKENDS = {
+    'selectolax': SelectolaxBackend if LexborHTMLParser else None,
+    'lxml': LxmlBackend if lxml else None,
+    'bs4': Bs4Backend,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, backend in BACKENDS.items() if backend]
+
+
+def get_backend(name: Optional[str] = None):
+    """Parser backend by name; 'auto' picks the fastest one installed"""
+    name = (name or Config.PARSER_BACKEND).lower()
+    if name == 'auto':
+        name = available_backends()[0]
+    backend = BACKENDS.get(name)
+    if not backend:
+        print(f"Parser backend {name!r} is not available, using bs4")
+        backend = Bs4Backend
+    return backend()
+
+
+class CardParser:
+    """Finds result cards in a page and extracts each card's fields in one walk"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None and not isinstance(backend, str) else get_backend(backend)
+        self._card_selectors: Dict[Tuple[str, ...], CompiledSelectors] = {}
+
+    def _compiled_cards(self, selectors: Sequence[str]) -> CompiledSelectors:
+        key = tuple(selectors)
+        if key not in self._card_selectors:
+            self._card_selectors[key] = CompiledSelectors([(index, selector) for index, selector in enumerate(key)])
+        return self._card_selectors[key]
+
+    def find_cards(self, root, selectors: Sequence[str] = CARD_SELECTORS) -> Tuple[Optional[str], List[Any]]:
+        """Cards matched by the first selector (in the given order) that matches anything"""
+        compiled = self._compiled_cards(selectors)
+        found: Dict[int, List[Any]] = {}
+        for element in self.backend.elements(root):
+            for index, _ in compiled.matches(*self.backend.describe(element)):
+                found.setdefault(index, []).append(element)
+        for index, selector in enumerate(selectors):
+            if index in found:
+                return selector, found[index]
+        return None, []
+
+    def extract(self, card) -> Optional[Dict[str, Any]]:
+        """Car record for one card, or None if it has no model or price"""
+        backend = self.backend
+        first: Dict[Tuple[str, int], Tuple[Any, Dict[str, str]]] = {}
+        # The card's own attributes count for the year (e.g. data-year), as its descendants' do
+        attribute_values = [value for value in backend.describe(card)[1].values() if value]
+        for element in backend.elements(card):
+            element_tag, attrs = backend.describe(element)
+            attribute_values.extend(value for value in attrs.values() if value)
+            for hit in FIELD_SELECTORS.matches(element_tag, attrs):
+                if hit not in first:
+                    first[hit] = (element, attrs)
+
+        def candidate(field: str, position: int) -> Optional[str]:
+            if (field, position) not in first:
+                return None
+            element, attrs = first[field, position]
+            attribute = ATTRIBUTE_FIELDS.get(field)
+            return attrs.get(attribute) if attribute else backend.text(element)
+
+        year_match = YEAR_PATTERN.search(backend.text(card, ' ')) or YEAR_PATTERN.search(' '.join(attribute_values))
+        return build_car_record(candidate, int(year_match.group(1)) if year_match else None)
+
+    def parse_page(self, html: str, selectors: Sequence[str] = CARD_SELECTORS
+                   ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """(matching card selector, car records) for a whole page"""
+        selector, cards = self.find_cards(self.backend.parse(html), selectors)
+        cars = []
+        for card in cards:
+            try:
+                car_data = self.extract(card)
+            except Exception as e:
+                print(f"Error extracting vehicle data: {e}")
+                continue
+            if car_data:
+                cars.append(car_data)
+        return selector, cars
+
+    def parse_payload(self, payload: PagePayload) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """(matching card selector, car records) for a page captured by ToyotaInventoryScraper.capture_page"""
+        kind, content, selectors = payload
+        if kind == 'cars':
+            return None, content
+        return self.parse_page(content, selectors or CARD_SELECTORS)
+
+
+def synthetic_page(cards: int) -> str:
+    """A results page shaped like the selectors expect, for benchmarking without fixtures"""
+    card = (
+        '<div class="vehicle-card" data-testid="vehicle-{i}"><h3 class="title">2024 Camry XSE {i}</h3>'
+        '<div class="specs"><span class="price-label">MSRP</span><span class="vehicle-price">${price:,}</span>'
+        '<span class="fuel-type">Hybrid</span><span class="drivetrain-label">awd</span>'
+        '<span class="mileage">{miles} mi</span></div><p class="dealer-name">Toyota of Austin</p>'
+        '<a href="/search-inventory/vehicle/{i}">Check availability</a></div>'
+    )
+    filler = '<nav>' + ''.join(f'<a href="/link/{i}">Link {i}</a>' for i in range(200)) + '</nav>'
+    body = ''.join(card.format(i=i, price=28000 + i * 37, miles=i % 50) for i in range(cards))
+    return f'<html><head><script>var x = 1;</script></head><body>{filler}<main>{body}</main>{filler}</body></html>'
+
+
+def benchmark(pages: Dict[str, str], runs: int):
+    """Cards per second for every installed backend over the given pages"""
+    print(f"\n📊 Card parser benchmark: {len(pages)} pages, {runs} runs each")
+    print(f"   {'backend':<11} {'cards':>7} {'parse ms':>9} {'extract ms':>11} {'cards/s':>9}")
+    for name in available_backends():
+        parser = CardParser(name)
+        parse_seconds = extract_seconds = 0.0
+        cards = 0
+        for _ in range(runs):
+            for html in pages.values():
+                start = time.perf_counter()
+                root = parser.backend.parse(html)
+                parsed = time.perf_counter()
+                _, found = parser.find_cards(root)
+                cars = [parser.extract(card) for card in found]
+                extract_seconds += time.perf_counter() - parsed
+                parse_seconds += parsed - start
+                cards += sum(1 for car in cars if car)
+        total = parse_seconds + extract_seconds
+        print(f"   {name:<11} {cards // runs:>7} {parse_seconds * 1000 / runs:>9.1f} "
+              f"{extract_seconds * 1000 / runs:>11.1f} {cards / total if total else 0:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark card extraction across parser backends")
+    parser.add_argument("fixtures", nargs="*", help="Saved result pages (default: every .html file in HTML_FIXTURE_DIR)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--synthetic", type=int, default=200, help="Cards in a generated page when no fixtures are found")
+    args = parser.parse_args()
+
+    paths = args.fixtures or sorted(glob.glob(os.path.join(Config.HTML_FIXTURE_DIR or "fixtures", "*.html")))
+    if paths:
+        pages = {}
+        for path in paths:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages[path] = f.read()
+    else:
+        print(f"No fixtures found; using a generated page with {args.synthetic} cards")
+        pages = {"synthetic": synthetic_page(args.synthetic)}
+    benchmark(pages, args.runs)
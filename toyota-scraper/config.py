@@ -15,15 +15,111 @@ class Config:
     HEADLESS_MODE = os.getenv('HEADLESS_MODE', 'true').lower() == 'true'
     PAGE_LOAD_TIMEOUT = int(os.getenv('PAGE_LOAD_TIMEOUT', '30'))
     IMPLICIT_WAIT = int(os.getenv('IMPLICIT_WAIT', '10'))
+    WAIT_TIMEOUT = float(os.getenv('WAIT_TIMEOUT', '15'))
+    WAIT_POLL_INTERVAL = float(os.getenv('WAIT_POLL_INTERVAL', '0.2'))
+    # A condition-based wait gives up after this many times the fixed sleep it replaced (never past WAIT_TIMEOUT)
+    WAIT_BUDGET_MULTIPLE = float(os.getenv('WAIT_BUDGET_MULTIPLE', '2'))
+    DOM_QUIET_MS = int(os.getenv('DOM_QUIET_MS', '500'))
+    NETWORK_QUIET_MS = int(os.getenv('NETWORK_QUIET_MS', '500'))
+    SELECTOR_TIMEOUT = float(os.getenv('SELECTOR_TIMEOUT', '5'))
+    SELECTOR_POLL_INTERVAL = float(os.getenv('SELECTOR_POLL_INTERVAL', '0.25'))
+    SELECTOR_REGISTRY_PATH = os.getenv('SELECTOR_REGISTRY_PATH', 'selector_registry.json')
+    CHROME_USER_DATA_DIR = os.getenv('CHROME_USER_DATA_DIR', '')
+    BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '4'))
+    # Pool mode: recycle a browser after it has searched this many ZIP codes (each may load several result pages)
+    DRIVER_MAX_ZIPS = int(os.getenv('DRIVER_MAX_ZIPS', '50'))
+    # Pool mode: parse captured pages in this many processes, pipelined with the browsers (0 = parse in the browser thread)
+    PARSE_PROCESSES = int(os.getenv('PARSE_PROCESSES', '0'))
+    # ZIP codes captured but not yet parsed and stored before browsers wait (0 = twice the number of parse processes)
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '0'))
+    
+    # Lean page profile: block resources the scraper never reads
+    LEAN_PAGE = os.getenv('LEAN_PAGE', 'false').lower() == 'true'
+    BLOCK_IMAGES = os.getenv('BLOCK_IMAGES', 'true').lower() == 'true'
+    BLOCK_STYLESHEETS = os.getenv('BLOCK_STYLESHEETS', 'false').lower() == 'true'
+    BLOCK_FONTS = os.getenv('BLOCK_FONTS', 'true').lower() == 'true'
+    BLOCK_MEDIA = os.getenv('BLOCK_MEDIA', 'true').lower() == 'true'
+    BLOCK_TRACKERS = os.getenv('BLOCK_TRACKERS', 'true').lower() == 'true'
+    LEAN_EXTRA_BLOCKLIST = [p.strip() for p in os.getenv('LEAN_EXTRA_BLOCKLIST', '').split(',') if p.strip()]
     
     # Scraping Configuration
     MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+    BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))
+    BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))
+    BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '300'))
+    BREAKER_MAX_TRIPS = int(os.getenv('BREAKER_MAX_TRIPS', '3'))
     DELAY_BETWEEN_REQUESTS = int(os.getenv('DELAY_BETWEEN_REQUESTS', '2'))
     MAX_PAGES_TO_SCRAPE = int(os.getenv('MAX_PAGES_TO_SCRAPE', '5'))
     
+    # Per-host token buckets shared by every scraper (0 = unlimited); defaults to one request per DELAY_BETWEEN_REQUESTS
+    RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', str(1 / DELAY_BETWEEN_REQUESTS if DELAY_BETWEEN_REQUESTS > 0 else 0)))
+    RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '2'))
+    RATE_LIMIT_MIN_PER_SECOND = float(os.getenv('RATE_LIMIT_MIN_PER_SECOND', '0.05'))
+    RATE_LIMIT_BACKOFF = float(os.getenv('RATE_LIMIT_BACKOFF', '0.5'))
+    RATE_LIMIT_RECOVERY = float(os.getenv('RATE_LIMIT_RECOVERY', '0.05'))
+    
+    # On-disk HTTP response cache: 'off', 'on' (TTL + ETag/Last-Modified revalidation) or 'only' (offline)
+    HTTP_CACHE_MODE = os.getenv('HTTP_CACHE_MODE', 'off').lower()
+    HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', '.http_cache')
+    HTTP_CACHE_TTL_SECONDS = float(os.getenv('HTTP_CACHE_TTL_SECONDS', '900'))
+    HTTP_CACHE_MAX_MB = float(os.getenv('HTTP_CACHE_MAX_MB', '200'))
+    
+    # How the Selenium scraper reads results: 'dom' parses the page, 'scoped' parses only the
+    # results container's outerHTML, 'js' reads card fields with one in-page script,
+    # 'network' reads the inventory XHR responses from the DevTools log
+    EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'dom').lower()
+    INVENTORY_XHR_PATTERN = os.getenv('INVENTORY_XHR_PATTERN', r'graphql|inventory|search')
+    
+    # HTML parser for result cards: 'auto' (selectolax, then lxml, then bs4), 'selectolax', 'lxml' or 'bs4'
+    PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'auto').lower()
+    # Save every parsed results page here (for card_parser.py benchmarks); empty = off
+    HTML_FIXTURE_DIR = os.getenv('HTML_FIXTURE_DIR', '')
+    
+    # GraphQL API Configuration
+    API_CONCURRENCY = int(os.getenv('API_CONCURRENCY', '20'))
+    API_REQUESTS_PER_SECOND = float(os.getenv('API_REQUESTS_PER_SECOND', '10'))
+    API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '20'))
+    API_BATCH_SIZE = int(os.getenv('API_BATCH_SIZE', '1'))
+    
     # Toyota Website URLs
     TOYOTA_SEARCH_URL = 'https://www.toyota.com/search-inventory/'
+    SEARCH_URL_ZIP_PARAM = os.getenv('SEARCH_URL_ZIP_PARAM', 'zipcode')
+    
+    # Open the search URL with the learned location cookies/storage instead of the ZIP popup
+    DIRECT_SEARCH = os.getenv('DIRECT_SEARCH', 'true').lower() == 'true'
+    LOCATION_STATE_PATH = os.getenv('LOCATION_STATE_PATH', 'location_state.json')
+    
+    # Database Configuration
+    DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '500'))
+    # Streamed cars are written once a batch is full or its oldest car has waited this long (0 = size only)
+    DB_FLUSH_SECONDS = float(os.getenv('DB_FLUSH_SECONDS', '5'))
+    FRESH_DATA_MAX_AGE_HOURS = float(os.getenv('FRESH_DATA_MAX_AGE_HOURS', '24'))
+    CAR_DATA_TTL_DAYS = float(os.getenv('CAR_DATA_TTL_DAYS', '30'))
+    
+    # Refresh Scheduling (0 = no limit)
+    SCHEDULER_BUDGET_MINUTES = float(os.getenv('SCHEDULER_BUDGET_MINUTES', '0'))
+    SCHEDULER_MAX_ZIPS = int(os.getenv('SCHEDULER_MAX_ZIPS', '0'))
+    SCHEDULER_DEFAULT_CHANGE_RATE = float(os.getenv('SCHEDULER_DEFAULT_CHANGE_RATE', '0.02'))
+    SCHEDULER_DEFAULT_ZIP_SECONDS = float(os.getenv('SCHEDULER_DEFAULT_ZIP_SECONDS', '30'))
+    
+    # Coverage planning: search one ZIP for every user ZIP within this many miles (0 = off)
+    COVERAGE_RADIUS_MILES = float(os.getenv('COVERAGE_RADIUS_MILES', '0'))
+    ZIP_COORDINATES_PATH = os.getenv('ZIP_COORDINATES_PATH', 'zip_coordinates.csv')
+    
+    # Run journals (one append-only JSONL file per run, used by --resume)
+    RUN_JOURNAL_DIR = os.getenv('RUN_JOURNAL_DIR', 'runs')
+    SHARD_SUMMARY_DIR = os.getenv('SHARD_SUMMARY_DIR', 'runs')
+    
+    # Shared work queue (--enqueue / --worker)
+    QUEUE_LEASE_SECONDS = float(os.getenv('QUEUE_LEASE_SECONDS', '300'))
+    QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '3'))
+    QUEUE_POLL_INTERVAL = float(os.getenv('QUEUE_POLL_INTERVAL', '10'))
     
     # Database Collections
     USERS_COLLECTION = 'users'
     CAR_DATA_COLLECTION = 'car_data'
+    ZIP_STATE_COLLECTION = 'zip_state'
+    WORK_QUEUE_COLLECTION = 'scrape_jobs'
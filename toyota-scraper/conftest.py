@@ -0,0 +1,20 @@
+"""
+Shared pytest fixtures; MongoDB is replaced by mongomock
+"""
+import mongomock
+import pytest
+
+import database
+from config import Config
+
+# test_scraper.py drives a real browser and database; run it by hand
+collect_ignore = ["test_scraper.py"]
+
+
+@pytest.fixture
+def db_manager(monkeypatch):
+    monkeypatch.setattr(database, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(Config, "MONGO_URI", "mongodb://localhost:27017/toyota_test")
+    manager = database.DatabaseManager(ensure_indexes=False)
+    yield manager
+    manager.close_connection()
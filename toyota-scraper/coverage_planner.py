@@ -0,0 +1,141 @@
+"""
+Geographic coverage planning to collapse overlapping ZIP searches
+
+Inventory search returns dealers within a radius of the searched ZIP, so
+neighbouring user ZIP codes get nearly the same cars. Using the bundled
+ZIP centroid table (zip_coordinates.csv), the planner solves a greedy set
+cover: it picks a small set of query ZIP codes such that every user ZIP
+code lies within COVERAGE_RADIUS_MILES of one of them. Each query's
+results are then stored for every user ZIP code it covers.
+"""
+import csv
+import heapq
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import Config
+
+Coordinates = Tuple[float, float]
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.0
+
+_coordinates: Dict[str, Dict[str, Coordinates]] = {}
+_coordinates_lock = threading.Lock()
+
+
+def load_zip_coordinates(path: Optional[str] = None) -> Dict[str, Coordinates]:
+    """ZIP code -> (lat, lon) from the bundled centroid table, loaded once per process"""
+    path = path or Config.ZIP_COORDINATES_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+    with _coordinates_lock:
+        if path not in _coordinates:
+            with open(path, newline="") as f:
+                rows = csv.DictReader(line for line in f if not line.startswith("#"))
+                _coordinates[path] = {row["zip"]: (float(row["lat"]), float(row["lon"])) for row in rows}
+        return _coordinates[path]
+
+
+def haversine_miles(a: Coordinates, b: Coordinates) -> float:
+    """Great-circle distance between two (lat, lon) points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(h))
+
+
+class CoveragePlan:
+    """Query ZIP codes and the user ZIP codes each one's results are stored for"""
+
+    def __init__(self, queries: List[str], members: Dict[str, List[str]], radius_miles: float):
+        self.queries = queries
+        self.members = members
+        self.radius_miles = radius_miles
+
+    @property
+    def covers(self) -> Dict[str, List[str]]:
+        """Query ZIP -> the other user ZIP codes it stands in for"""
+        return {query: [zip_code for zip_code in self.members[query] if zip_code != query]
+                for query in self.queries}
+
+    @property
+    def user_zip_count(self) -> int:
+        return sum(len(members) for members in self.members.values())
+
+    def summary(self) -> str:
+        saved = self.user_zip_count - len(self.queries)
+        return (f"{self.user_zip_count} user ZIP codes covered by {len(self.queries)} searches "
+                f"within {self.radius_miles:g} mi ({saved} searches saved)")
+
+
+class CoveragePlanner:
+    """Greedy set cover of user ZIP codes by search radius"""
+
+    def __init__(self, radius_miles: Optional[float] = None, coordinates: Optional[Dict[str, Coordinates]] = None):
+        self.radius_miles = Config.COVERAGE_RADIUS_MILES if radius_miles is None else radius_miles
+        self.coordinates = coordinates if coordinates is not None else load_zip_coordinates()
+
+    def _neighbours(self, located: Dict[str, Coordinates]) -> Dict[str, Set[str]]:
+        """ZIP codes within the radius of each ZIP code (itself included), via a lat/lon grid"""
+        cell_lat = self.radius_miles / MILES_PER_DEGREE_LATITUDE
+        # A longitude degree shrinks towards the poles, so size cells for the highest latitude present
+        max_lat = min(max((abs(lat) for lat, _ in located.values()), default=0.0), 80.0)
+        cell_lon = cell_lat / math.cos(math.radians(max_lat))
+
+        grid: Dict[Tuple[int, int], List[str]] = {}
+        for zip_code, (lat, lon) in located.items():
+            grid.setdefault((int(lat // cell_lat), int(lon // cell_lon)), []).append(zip_code)
+
+        neighbours = {}
+        for zip_code, point in located.items():
+            row, col = int(point[0] // cell_lat), int(point[1] // cell_lon)
+            neighbours[zip_code] = {
+                other
+                for d_row in (-1, 0, 1) for d_col in (-1, 0, 1)
+                for other in grid.get((row + d_row, col + d_col), ())
+                if haversine_miles(point, located[other]) <= self.radius_miles
+            }
+        return neighbours
+
+    def plan(self, zip_codes: Iterable[str]) -> CoveragePlan:
+        """Pick query ZIP codes covering every user ZIP code; ties go to the earlier (higher-demand) ZIP"""
+        zip_codes = list(dict.fromkeys(zip_codes))
+        located = {zip_code: self.coordinates[zip_code] for zip_code in zip_codes if zip_code in self.coordinates}
+        neighbours = self._neighbours(located) if self.radius_miles > 0 else {z: {z} for z in located}
+
+        # Lazy greedy: a candidate's gain only shrinks, so a popped gain that still beats the heap is the best
+        heap = [(-len(neighbours[zip_code]), order, zip_code)
+                for order, zip_code in enumerate(zip_codes) if zip_code in located]
+        heapq.heapify(heap)
+        uncovered = set(located)
+        chosen: List[str] = []
+        while uncovered and heap:
+            _, order, candidate = heapq.heappop(heap)
+            gain = len(neighbours[candidate] & uncovered)
+            if not gain:
+                continue
+            if heap and gain < -heap[0][0]:
+                heapq.heappush(heap, (-gain, order, candidate))
+                continue
+            chosen.append(candidate)
+            uncovered -= neighbours[candidate]
+
+        # Each user ZIP takes its results from the nearest chosen query ZIP
+        chosen_set = set(chosen)
+        members: Dict[str, List[str]] = {query: [] for query in chosen}
+        for zip_code in zip_codes:
+            if zip_code not in located:
+                # No coordinates: the ZIP code has to be searched for itself
+                chosen.append(zip_code)
+                members[zip_code] = [zip_code]
+                continue
+            nearest = min((query for query in neighbours[zip_code] if query in chosen_set),
+                          key=lambda query: haversine_miles(located[zip_code], located[query]))
+            members[nearest].append(zip_code)
+
+        order = {zip_code: index for index, zip_code in enumerate(zip_codes)}
+        queries = sorted(chosen, key=order.__getitem__)
+        return CoveragePlan(queries, members, self.radius_miles)
@@ -1,76 +1,486 @@
 """
 Database operations for Toyota inventory scraper
 """
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import time
+import hashlib
+import json
 from config import Config
 
-class DatabaseManager:
+# Fields managed by the database layer rather than scraped from the page
+METADATA_FIELDS = {'_id', 'zipCode', 'zipCodes', 'scrapedAt', 'firstSeenAt', 'updatedAt', 'recordKey', 'contentHash'}
+
+# Fields that identify a vehicle when the scraper could not read its VIN. Price and ZIP are left out:
+# they change for the same car, and a re-scrape has to update its row rather than add another
+IDENTITY_FIELDS = ('model', 'year', 'trim', 'dealerName', 'color', 'availabilityUrl')
+
+USERS_ZIP_INDEX = [('location.zip', 1), ('personal.location', 1)]
+USERS_ZIP_INDEX_NAME = 'zip_extraction'
+
+TTL_INDEX_NAME = 'scraped_at_ttl'
+
+# Weight of the newest observation in the per-ZIP change rate and scrape time averages
+STATE_SMOOTHING = 0.3
+
+# Identity keys are only enforced for real values, so rows missing them never collide
+CAR_DATA_INDEXES = [
+    IndexModel([('vin', ASCENDING)], name='vin_unique', unique=True,
+               partialFilterExpression={'vin': {'$gt': ''}}),
+    IndexModel([('recordKey', ASCENDING)], name='record_key_unique', unique=True,
+               partialFilterExpression={'recordKey': {'$gt': ''}}),
+    IndexModel([('zipCodes', ASCENDING), ('scrapedAt', DESCENDING)], name='zip_scraped_at'),
+    IndexModel([('model', ASCENDING), ('price', ASCENDING)], name='model_price'),
+]
+
+# Representative car_data queries checked by explain_queries()
+QUERY_PLAN_CHECKS = {
+    'upsert key (vin)': {'vin': 'JTDKBRFU0J3000000'},
+    'upsert key (recordKey)': {'recordKey': '0' * 40},
+    'cars for a ZIP': {'zipCodes': '90210'},
+    'model price range': {'model': 'Camry', 'price': {'$lte': 30000}},
+}
+
+# location.zip if set, otherwise the first 5-digit token in a personal.location
+# string like "Atlanta, CA 90001"; grouped into ZIP -> number of users. A location.zip
+# that is missing, empty or not convertible to a string (an object or array) counts
+# as unset instead of aborting the whole aggregation
+ZIP_CODE_PIPELINE = [
+    {'$project': {
+        '_id': 0,
+        'zip': {'$let': {
+            'vars': {'zip': {'$convert': {'input': '$location.zip', 'to': 'string', 'onError': None, 'onNull': None}}},
+            'in': {'$cond': [
+                {'$in': ['$$zip', [None, '']]},
+                {'$cond': [
+                    {'$eq': [{'$type': '$personal.location'}, 'string']},
+                    {'$let': {
+                        'vars': {'found': {'$regexFind': {'input': '$personal.location', 'regex': r'(?:^|\s)(\d{5})(?:\s|$)'}}},
+                        'in': {'$arrayElemAt': ['$$found.captures', 0]},
+                    }},
+                    None,
+                ]},
+                '$$zip',
+            ]},
+        }},
+    }},
+    {'$match': {'zip': {'$regex': r'^\d{5}$'}}},
+    {'$group': {'_id': '$zip', 'userCount': {'$sum': 1}}},
+    {'$sort': {'userCount': -1, '_id': 1}},
+]
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Every stage name in a winning plan tree (rejected plans are skipped)"""
+    stages = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get('stage'), str):
+            stages.append(plan['stage'])
+        for key, value in plan.items():
+            if key != 'rejectedPlans':
+                stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+def _stable_hash(values: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def vehicle_filter(car: Dict[str, Any]) -> Dict[str, str]:
+    """Upsert key for a car: its VIN, or a stable hash of its identifying fields"""
+    if car.get('vin'):
+        return {'vin': car['vin']}
+    return {'recordKey': _stable_hash({field: car.get(field) for field in IDENTITY_FIELDS})}
+
+class UpsertSummary:
+    """Counts from a bulk upsert: new, content-changed and unchanged vehicles"""
     def __init__(self):
+        self.inserted = 0
+        self.modified = 0
+        self.unchanged = 0
+        self.errors = 0
+    
+    def add(self, other: 'UpsertSummary'):
+        self.inserted += other.inserted
+        self.modified += other.modified
+        self.unchanged += other.unchanged
+        self.errors += other.errors
+    
+    @property
+    def total(self) -> int:
+        return self.inserted + self.modified + self.unchanged
+    
+    def __str__(self) -> str:
+        text = f"{self.inserted} inserted, {self.modified} modified, {self.unchanged} unchanged"
+        return text + (f", {self.errors} errors" if self.errors else "")
+
+class CarDataSink:
+    """Writes one ZIP code's cars in bounded batches as they are scraped, so rows land before the scrape ends"""
+    def __init__(self, db_manager: 'DatabaseManager', zip_code: str, covered_zip_codes: Optional[List[str]] = None,
+                 batch_size: Optional[int] = None, flush_seconds: Optional[float] = None):
+        self.db_manager = db_manager
+        self.zip_code = zip_code
+        self.covered_zip_codes = covered_zip_codes
+        self.batch_size = batch_size or Config.DB_BATCH_SIZE
+        self.flush_seconds = Config.DB_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.scraped_at = datetime.utcnow()
+        self.summary = UpsertSummary()
+        self.count = 0
+        self.batches = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._batch_started = 0.0
+    
+    def add(self, car: Dict[str, Any]):
+        """Buffer a car, writing the batch once it is full or has waited flush_seconds"""
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append(car)
+        self.count += 1
+        if (len(self._batch) >= self.batch_size
+                or (self.flush_seconds and time.monotonic() - self._batch_started >= self.flush_seconds)):
+            self.flush()
+    
+    def extend(self, cars: Iterable[Dict[str, Any]]):
+        """Consume cars from any iterable (e.g. a scraper's generator) as they are produced"""
+        for car in cars:
+            self.add(car)
+    
+    def flush(self):
+        """Upsert the buffered cars as one bulk write"""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self.batches += 1
+        try:
+            batch_summary = self.db_manager._upsert_batch(batch, self.zip_code, self.scraped_at,
+                                                          self.covered_zip_codes)
+        except Exception as e:
+            print(f"Error writing batch {self.batches} for ZIP {self.zip_code}: {e}")
+            batch_summary = UpsertSummary()
+            batch_summary.errors = len(batch)
+        print(f"   Batch {self.batches} for ZIP {self.zip_code}: {batch_summary}")
+        self.summary.add(batch_summary)
+    
+    def close(self, scrape_seconds: Optional[float] = None) -> bool:
+        """Write what is left and update the ZIP codes' scheduling state; False if any write failed"""
+        try:
+            self.flush()
+            if not self.count:
+                print(f"No car data to insert for ZIP code {self.zip_code}")
+            else:
+                print(f"Successfully stored cars for ZIP code {self.zip_code}: {self.summary}")
+                if self.summary.errors:
+                    return False
+            
+            self.db_manager.record_zip_scrape(self.zip_code, self.summary, scrape_seconds)
+            for covered_zip_code in self.covered_zip_codes or []:
+                self.db_manager.record_zip_scrape(covered_zip_code, self.summary)
+            if self.covered_zip_codes:
+                print(f"   Fanned out to {len(self.covered_zip_codes)} nearby user ZIP codes")
+            return True
+            
+        except Exception as e:
+            print(f"Error inserting car data for ZIP {self.zip_code}: {e}")
+            return False
+
+class DatabaseManager:
+    def __init__(self, ensure_indexes: bool = True):
         self.client = MongoClient(Config.MONGO_URI)
         self.db = self.client.get_default_database()
         self.users_collection = self.db[Config.USERS_COLLECTION]
         self.car_data_collection = self.db[Config.CAR_DATA_COLLECTION]
+        self.zip_state_collection = self.db[Config.ZIP_STATE_COLLECTION]
+        self.zip_index_ready = False
+        if ensure_indexes:
+            self.ensure_indexes()
     
-    def get_unique_zip_codes(self) -> List[str]:
-        """Get all unique ZIP codes from users collection"""
+    def ensure_zip_index(self):
+        """Index the ZIP source fields so the extraction pipeline can scan index keys instead of user documents"""
+        self.users_collection.create_index(USERS_ZIP_INDEX, name=USERS_ZIP_INDEX_NAME)
+        self.zip_index_ready = True
+    
+    def _ensure_ttl_index(self):
+        """Expire rows not seen for CAR_DATA_TTL_DAYS, updating the TTL in place if it changed"""
+        if Config.CAR_DATA_TTL_DAYS <= 0:
+            return
+        seconds = int(Config.CAR_DATA_TTL_DAYS * 86400)
         try:
-            # Get all users and extract ZIP codes
-            users = list(self.users_collection.find({}, {"location.zip": 1, "personal.location": 1}))
-            zip_codes = set()
+            self.car_data_collection.create_index([('scrapedAt', ASCENDING)], name=TTL_INDEX_NAME,
+                                                  expireAfterSeconds=seconds)
+        except OperationFailure as e:
+            if e.code != 85:  # IndexOptionsConflict: same index, different TTL
+                raise
+            self.db.command('collMod', self.car_data_collection.name,
+                            index={'name': TTL_INDEX_NAME, 'expireAfterSeconds': seconds})
+    
+    def migrate_legacy_car_data(self) -> int:
+        """
+        One-time upgrade of rows stored before upserts existed (only zipCode set): give them zipCodes, an
+        upsert key and a content hash, merge copies of the same vehicle, and seed zip_state with when each
+        ZIP code was last scraped. Returns the number of rows upgraded.
+        """
+        now = datetime.utcnow()
+        kept: Dict[Tuple[str, str], Any] = {}
+        operations = []
+        duplicates = []
+        scraped: Dict[str, Dict[str, Any]] = {}
+        
+        # {'zipCodes': None} also matches a missing field and can use the zip_scraped_at index; oldest first,
+        # so when copies are merged the newest one's content wins
+        for doc in self.car_data_collection.find({'zipCodes': None}).sort('scrapedAt', ASCENDING):
+            zip_code = doc.get('zipCode')
+            scraped_at = doc.get('scrapedAt') or now
+            if zip_code:
+                last = scraped.setdefault(zip_code, {'lastScrapedAt': scraped_at, 'cars': 0})
+                last['lastScrapedAt'] = max(last['lastScrapedAt'], scraped_at)
+                last['cars'] += 1
             
-            for user in users:
-                # Try different possible ZIP code fields
-                zip_code = None
-                if user.get('location', {}).get('zip'):
-                    zip_code = user['location']['zip']
-                elif user.get('personal', {}).get('location'):
-                    # Extract ZIP from personal.location if it's a full address
-                    location = user['personal']['location']
-                    if isinstance(location, str):
-                        # Try to extract ZIP from string like "Atlanta, CA 90001"
-                        parts = location.split()
-                        for part in parts:
-                            if part.isdigit() and len(part) == 5:
-                                zip_code = part
-                                break
-                
-                if zip_code and len(str(zip_code)) == 5:
-                    zip_codes.add(str(zip_code))
+            key_filter = vehicle_filter(doc)
+            key = next(iter(key_filter.items()))
+            member_zip_codes = {'zipCodes': {'$each': [zip_code] if zip_code else []}}
+            content = {field: value for field, value in doc.items() if field not in METADATA_FIELDS}
+            newest = dict(content, zipCode=zip_code, scrapedAt=scraped_at, contentHash=_stable_hash(content),
+                          updatedAt=scraped_at)
             
+            if key not in kept:
+                current = self.car_data_collection.find_one(dict(key_filter, zipCodes={'$ne': None}), {'_id': 1})
+                if current:
+                    # Already upserted since the upgrade: that row is newer, only its ZIP codes and age change
+                    kept[key] = current['_id']
+                    operations.append(UpdateOne({'_id': current['_id']}, {
+                        '$addToSet': member_zip_codes, '$min': {'firstSeenAt': scraped_at}}))
+                    duplicates.append(doc['_id'])
+                    continue
+                kept[key] = doc['_id']
+                newest.update(key_filter, firstSeenAt=scraped_at)
+            elif kept[key] != doc['_id']:
+                duplicates.append(doc['_id'])
+            
+            operations.append(UpdateOne({'_id': kept[key]}, {'$set': newest, '$addToSet': member_zip_codes}))
+        
+        if not operations:
+            return 0
+        for start in range(0, len(operations), Config.DB_BATCH_SIZE):
+            self.car_data_collection.bulk_write(operations[start:start + Config.DB_BATCH_SIZE], ordered=True)
+        if duplicates:
+            self.car_data_collection.delete_many({'_id': {'$in': duplicates}})
+        
+        # Those rows were stored for the searched ZIP only, so their newest scrapedAt is when it was scraped
+        states = self.get_zip_states(list(scraped))
+        for zip_code, last in scraped.items():
+            if not states.get(zip_code, {}).get('lastScrapedAt'):
+                self.zip_state_collection.update_one(
+                    {'_id': zip_code},
+                    {'$set': {'lastScrapedAt': last['lastScrapedAt'], 'lastCarCount': last['cars']}},
+                    upsert=True
+                )
+        
+        migrated = len(operations)
+        print(f"Upgraded {migrated} car_data rows from before upserts "
+              f"({len(duplicates)} duplicates merged, {len(scraped)} ZIP codes)")
+        return migrated
+    
+    def ensure_indexes(self):
+        """Upgrade legacy car_data rows, then create the users and car_data indexes the scraper's queries rely on"""
+        try:
+            self.ensure_zip_index()
+        except Exception as e:
+            print(f"Could not ensure ZIP index on users: {e}")
+        
+        try:
+            # Before the unique indexes, which the legacy duplicates would violate
+            self.migrate_legacy_car_data()
+        except Exception as e:
+            print(f"Could not upgrade legacy car_data rows: {e}")
+        
+        for index in CAR_DATA_INDEXES:
+            try:
+                self.car_data_collection.create_indexes([index])
+            except Exception as e:
+                print(f"Could not ensure car_data index {index.document['name']}: {e}")
+        
+        try:
+            self._ensure_ttl_index()
+        except Exception as e:
+            print(f"Could not ensure car_data TTL index: {e}")
+    
+    def explain_queries(self) -> Dict[str, List[str]]:
+        """Explain the scraper's car_data queries and flag any that fall back to a collection scan"""
+        plans = {}
+        checks = [(label, self.car_data_collection.find(query).explain())
+                  for label, query in QUERY_PLAN_CHECKS.items()]
+        
+        for label, explanation in checks:
+            stages = _plan_stages(explanation)
+            plans[label] = stages
+            if 'COLLSCAN' in stages:
+                print(f"⚠️  Query plan for {label} is a collection scan: {' -> '.join(stages)}")
+            else:
+                print(f"✅ Query plan for {label}: {' -> '.join(stages) or 'no stages reported'}")
+        return plans
+    
+    def iter_zip_codes_weighted(self) -> Iterator[Tuple[str, int]]:
+        """Stream (zip_code, user_count) pairs built inside MongoDB, most-demanded ZIP first"""
+        options = {'allowDiskUse': True, 'batchSize': 1000}
+        try:
+            if not self.zip_index_ready:
+                self.ensure_zip_index()
+            options['hint'] = USERS_ZIP_INDEX_NAME
+        except Exception as e:
+            print(f"Could not ensure ZIP index on users, scanning the collection: {e}")
+        
+        for doc in self.users_collection.aggregate(ZIP_CODE_PIPELINE, **options):
+            yield doc['_id'], doc['userCount']
+    
+    def get_unique_zip_codes(self) -> List[str]:
+        """Get all unique ZIP codes from users collection"""
+        try:
+            zip_codes = [zip_code for zip_code, _ in self.iter_zip_codes_weighted()]
             print(f"Found {len(zip_codes)} unique ZIP codes")
-            return list(zip_codes)
+            return zip_codes
             
         except Exception as e:
             print(f"Error getting ZIP codes: {e}")
             return []
     
-    def insert_car_data(self, car_data: List[Dict[str, Any]], zip_code: str) -> bool:
-        """Insert scraped car data into the database"""
+    def _existing_hashes(self, filters: List[Dict[str, str]]) -> Dict[Tuple[str, str], Optional[str]]:
+        """Look up the stored content hash for each upsert key in one query"""
+        vins = [f['vin'] for f in filters if 'vin' in f]
+        record_keys = [f['recordKey'] for f in filters if 'recordKey' in f]
+        clauses = []
+        if vins:
+            clauses.append({'vin': {'$in': vins}})
+        if record_keys:
+            clauses.append({'recordKey': {'$in': record_keys}})
+        
+        existing = {}
+        for doc in self.car_data_collection.find({'$or': clauses}, {'vin': 1, 'recordKey': 1, 'contentHash': 1}):
+            if doc.get('vin'):
+                existing[('vin', doc['vin'])] = doc.get('contentHash')
+            if doc.get('recordKey'):
+                existing[('recordKey', doc['recordKey'])] = doc.get('contentHash')
+        return existing
+    
+    def _upsert_batch(self, batch: List[Dict[str, Any]], zip_code: str, scraped_at: datetime,
+                      covered_zip_codes: Optional[List[str]] = None) -> UpsertSummary:
+        """Write one batch of cars as unordered UpdateOne(upsert=True) operations"""
+        summary = UpsertSummary()
+        
+        # Last record wins when the same vehicle appears twice in a batch
+        keyed = {}
+        for car in batch:
+            key_filter = vehicle_filter(car)
+            keyed[next(iter(key_filter.items()))] = (key_filter, car)
+        existing = self._existing_hashes([key_filter for key_filter, _ in keyed.values()])
+        
+        member_zip_codes = [zip_code] + list(covered_zip_codes or [])
+        operations = []
+        for key, (key_filter, car) in keyed.items():
+            content = {field: value for field, value in car.items() if field not in METADATA_FIELDS}
+            content_hash = _stable_hash(content)
+            update = {
+                '$set': {'zipCode': zip_code, 'scrapedAt': scraped_at},
+                '$addToSet': {'zipCodes': {'$each': member_zip_codes}},
+                '$setOnInsert': {'firstSeenAt': scraped_at},
+            }
+            if existing.get(key) != content_hash:
+                update['$set'].update(content)
+                update['$set'].update({'contentHash': content_hash, 'updatedAt': scraped_at})
+                if key in existing:
+                    summary.modified += 1
+            else:
+                summary.unchanged += 1
+            operations.append(UpdateOne(key_filter, update, upsert=True))
+        
         try:
-            if not car_data:
-                print(f"No car data to insert for ZIP code {zip_code}")
-                return True
-            
-            # Add metadata to each car record
-            for car in car_data:
-                car['zipCode'] = zip_code
-                car['scrapedAt'] = datetime.utcnow()
-            
-            # Insert with upsert to avoid duplicates
-            result = self.car_data_collection.insert_many(car_data, ordered=False)
-            print(f"Successfully inserted {len(result.inserted_ids)} cars for ZIP code {zip_code}")
-            return True
-            
+            result = self.car_data_collection.bulk_write(operations, ordered=False)
+            summary.inserted = result.upserted_count
+        except BulkWriteError as e:
+            summary.inserted = e.details.get('nUpserted', 0)
+            summary.errors = len(e.details.get('writeErrors', []))
+            print(f"Bulk upsert for ZIP {zip_code} had {summary.errors} write errors: "
+                  f"{e.details['writeErrors'][0].get('errmsg') if summary.errors else ''}")
+        return summary
+    
+    def car_sink(self, zip_code: str, covered_zip_codes: Optional[List[str]] = None,
+                 batch_size: Optional[int] = None) -> CarDataSink:
+        """A sink that upserts a ZIP code's cars in batches as a scraper yields them
+
+        covered_zip_codes are user ZIP codes the searched ZIP stands in for; they join zipCodes too.
+        """
+        return CarDataSink(self, zip_code, covered_zip_codes, batch_size)
+    
+    def upsert_car_data(self, car_data: Iterable[Dict[str, Any]], zip_code: str, batch_size: Optional[int] = None,
+                        covered_zip_codes: Optional[List[str]] = None) -> UpsertSummary:
+        """Upsert cars keyed by VIN (or a stable hash), in batches of DB_BATCH_SIZE"""
+        sink = CarDataSink(self, zip_code, covered_zip_codes, batch_size, flush_seconds=0)
+        sink.extend(car_data)
+        sink.flush()
+        return sink.summary
+    
+    def insert_car_data(self, car_data: Iterable[Dict[str, Any]], zip_code: str, scrape_seconds: Optional[float] = None,
+                        covered_zip_codes: Optional[List[str]] = None) -> bool:
+        """Insert scraped car data (a list or a scraper's generator) and update the ZIP codes' scheduling state"""
+        # Upsert by VIN so reruns refresh existing rows instead of duplicating them
+        sink = self.car_sink(zip_code, covered_zip_codes)
+        try:
+            sink.extend(car_data)
         except Exception as e:
             print(f"Error inserting car data for ZIP {zip_code}: {e}")
             return False
+        return sink.close(scrape_seconds)
+    
+    def sync_zip_demand(self, weighted_zip_codes: List[Tuple[str, int]]):
+        """Store each ZIP code's user count in zip_state"""
+        operations = [UpdateOne({'_id': zip_code}, {'$set': {'userCount': user_count}}, upsert=True)
+                      for zip_code, user_count in weighted_zip_codes]
+        for start in range(0, len(operations), Config.DB_BATCH_SIZE):
+            self.zip_state_collection.bulk_write(operations[start:start + Config.DB_BATCH_SIZE], ordered=False)
+    
+    def get_zip_states(self, zip_codes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Scheduling state (lastScrapedAt, changeRate, userCount, ...) for each ZIP code"""
+        return {doc['_id']: doc for doc in self.zip_state_collection.find({'_id': {'$in': list(zip_codes)}})}
+    
+    def record_zip_scrape(self, zip_code: str, summary: UpsertSummary, scrape_seconds: Optional[float] = None):
+        """Update a ZIP code's last scrape time, change rate and scrape time after a successful scrape"""
+        now = datetime.utcnow()
+        state = self.zip_state_collection.find_one({'_id': zip_code}) or {}
+        car_count = summary.total
+        update = {'lastScrapedAt': now, 'lastAttemptAt': now, 'lastCarCount': car_count, 'consecutiveFailures': 0}
+        
+        if state.get('lastScrapedAt'):
+            # Share of the inventory that appeared, changed or disappeared, per hour since the last scrape
+            hours = max((now - state['lastScrapedAt']).total_seconds() / 3600, 1.0)
+            previous_count = state.get('lastCarCount', 0)
+            changed = summary.inserted + summary.modified + max(0, previous_count - car_count)
+            rate = min(1.0, changed / max(car_count, previous_count, 1)) / hours
+            old_rate = state.get('changeRate')
+            update['changeRate'] = rate if old_rate is None else old_rate + STATE_SMOOTHING * (rate - old_rate)
+        
+        if scrape_seconds is not None:
+            old_seconds = state.get('scrapeSeconds')
+            update['scrapeSeconds'] = (scrape_seconds if old_seconds is None
+                                       else old_seconds + STATE_SMOOTHING * (scrape_seconds - old_seconds))
+        
+        self.zip_state_collection.update_one({'_id': zip_code}, {'$set': update}, upsert=True)
+    
+    def record_zip_failure(self, zip_code: str):
+        """Count a failed scrape so the scheduler backs off the ZIP code"""
+        try:
+            self.zip_state_collection.update_one(
+                {'_id': zip_code},
+                {'$set': {'lastAttemptAt': datetime.utcnow()}, '$inc': {'consecutiveFailures': 1}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Error recording failure for ZIP {zip_code}: {e}")
     
     def get_existing_cars_count(self, zip_code: str) -> int:
         """Get count of existing cars for a ZIP code"""
         try:
-            return self.car_data_collection.count_documents({"zipCode": zip_code})
+            return self.car_data_collection.count_documents({"zipCodes": zip_code})
         except Exception as e:
             print(f"Error getting existing cars count: {e}")
             return 0
@@ -79,3 +489,11 @@ class DatabaseManager:
         """Close database connection"""
         if self.client:
             self.client.close()
+
+if __name__ == "__main__":
+    # Create the indexes and report how the scraper's queries are planned
+    db_manager = DatabaseManager()
+    try:
+        db_manager.explain_queries()
+    finally:
+        db_manager.close_connection()
@@ -0,0 +1,321 @@
+"""
+On-disk HTTP response cache with conditional revalidation
+
+Responses are stored under HTTP_CACHE_DIR, one JSON file per request,
+keyed by method, URL and a normalised request body (JSON keys sorted,
+GraphQL query whitespace collapsed), so the same GraphQL payload or page
+fetch maps to the same entry however it was built. Bodies are kept
+base64-encoded, byte for byte, next to their Content-Type, so text is
+decoded with the charset the server declared.
+
+HTTP_CACHE_MODE:
+- off:  every request goes to the network (default)
+- on:   fresh entries (younger than HTTP_CACHE_TTL_SECONDS) are served
+        from disk; stale ones are revalidated with If-None-Match /
+        If-Modified-Since and a 304 refreshes them without a new body
+- only: offline; every request is answered from the cache, stale or
+        not, and a miss raises CacheMissError
+
+The least recently used entries are evicted once the cache grows past
+HTTP_CACHE_MAX_MB. Run this module to see the cache size, or with
+--clear to empty it.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config import Config
+
+OFF = "off"
+ON = "on"
+ONLY = "only"
+
+# Response headers kept with a cached body
+STORED_HEADERS = ("content-type", "etag", "last-modified")
+
+# send(extra_headers) performs the real request and returns (status, headers, body)
+RawResponse = Tuple[int, Any, bytes]
+Send = Callable[[Dict[str, str]], RawResponse]
+SendAsync = Callable[[Dict[str, str]], Awaitable[RawResponse]]
+
+_caches: Dict[str, "ResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(directory: Optional[str] = None) -> "ResponseCache":
+    """Return the process-wide cache for a directory"""
+    directory = os.path.abspath(directory or Config.HTTP_CACHE_DIR)
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ResponseCache(directory)
+        return _caches[directory]
+
+
+class CacheMissError(Exception):
+    """Cache-only mode was asked for a request it has never seen"""
+
+
+def normalise_body(body: Union[None, str, bytes, Dict[str, Any]]) -> str:
+    """Canonical form of a request body, so equivalent payloads share a cache entry"""
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return body
+    if isinstance(body, dict) and isinstance(body.get("query"), str):
+        body = dict(body, query=" ".join(body["query"].split()))
+    return json.dumps(body, sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(method: str, url: str, body: Union[None, str, bytes, Dict[str, Any]] = None) -> str:
+    return hashlib.sha256(f"{method.upper()} {url}\n{normalise_body(body)}".encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Minimal response object shared by cache hits and network responses"""
+
+    def __init__(self, url: str, status_code: int, headers: Any, content: bytes, from_cache: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self) -> str:
+        """Charset from the Content-Type header, read the way requests reads it (UTF-8 without one)"""
+        return get_encoding_from_headers(self.headers) or "utf-8"
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class ResponseCache:
+    """LRU, TTL-bounded response store in a directory of JSON files"""
+
+    def __init__(self, directory: str, mode: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.mode = (mode or Config.HTTP_CACHE_MODE).lower()
+        self.ttl_seconds = Config.HTTP_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_bytes = int(Config.HTTP_CACHE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None
+        self._lock = threading.Lock()
+        if self.mode not in (OFF, ON, ONLY):
+            print(f"Unknown HTTP_CACHE_MODE {self.mode!r}, caching disabled")
+            self.mode = OFF
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        """key -> (size, last used), read from the files on first use"""
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        self._index[entry.name[:-5]] = (stat.st_size, stat.st_mtime)
+        return self._index
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        try:
+            # File mtime doubles as the LRU clock
+            os.utime(self._path(key), (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            index = self._load_index()
+            index[key] = (index.get(key, (0, now))[0], now)
+        return entry
+
+    def _write(self, key: str, entry: Dict[str, Any]):
+        data = json.dumps(entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            print(f"Could not write HTTP cache entry: {e}")
+            return
+        with self._lock:
+            self._load_index()[key] = (len(data), time.time())
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        index = self._load_index()
+        total = sum(size for size, _ in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del index[key]
+            total -= size
+
+    def _store(self, key: str, url: str, status: int, headers: Any, content: bytes,
+               stored: Optional[Dict[str, Any]] = None):
+        headers = CaseInsensitiveDict(headers or {})
+        entry = {
+            "url": url,
+            "status": status,
+            "headers": {name: headers[name] for name in STORED_HEADERS if name in headers},
+            "storedAt": time.time(),
+            "body64": base64.b64encode(content).decode("ascii"),
+        }
+        if stored and status == 304:
+            # Not modified: keep the stored body, take any updated validators
+            entry.update(status=stored["status"], body64=stored["body64"],
+                         headers=dict(stored["headers"], **entry["headers"]))
+        self._write(key, entry)
+        return entry
+
+    @staticmethod
+    def _body(entry: Dict[str, Any]) -> bytes:
+        return base64.b64decode(entry["body64"])
+
+    @classmethod
+    def _response(cls, entry: Dict[str, Any]) -> CachedResponse:
+        return CachedResponse(entry["url"], entry["status"], entry["headers"], cls._body(entry), from_cache=True)
+
+    def _count(self, counter: str):
+        """Bump a hit/miss counter; requests finish on many threads at once"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _validators(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stored entry"""
+        if not entry:
+            return {}
+        headers = CaseInsensitiveDict(entry["headers"])
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+    def _lookup(self, method: str, url: str, body: Any) -> Tuple[str, Optional[Dict[str, Any]], bool]:
+        """(key, stored entry, whether it can be served without asking the server)"""
+        key = cache_key(method, url, body)
+        entry = self._read(key)
+        if entry is None:
+            if self.mode == ONLY:
+                self._count("misses")
+                raise CacheMissError(f"{method.upper()} {url} is not in the HTTP cache (HTTP_CACHE_MODE=only)")
+            return key, None, False
+        fresh = self.mode == ONLY or time.time() - entry.get("storedAt", 0) < self.ttl_seconds
+        return key, entry, fresh
+
+    def _finish(self, key: str, url: str, stored: Optional[Dict[str, Any]], raw: RawResponse) -> CachedResponse:
+        status, headers, content = raw
+        if status == 304 and stored:
+            self._count("revalidated")
+            return self._response(self._store(key, url, status, headers, content, stored))
+        self._count("misses")
+        if 200 <= status < 300:
+            self._store(key, url, status, headers, content)
+        return CachedResponse(url, status, headers, content)
+
+    def request(self, method: str, url: str, send: Send, body: Any = None) -> CachedResponse:
+        """Answer a request from the cache, revalidating or fetching through send() when needed"""
+        if not self.enabled:
+            return CachedResponse(url, *send({}))
+        key, stored, fresh = self._lookup(method, url, body)
+        if fresh:
+            self._count("hits")
+            return self._response(stored)
+        return self._finish(key, url, stored, send(self._validators(stored)))
+
+    async def request_async(self, method: str, url: str, send: SendAsync, body: Any = None) -> CachedResponse:
+        """Async version of request() for aiohttp senders"""
+        if not self.enabled:
+            return CachedResponse(url, *(await send({})))
+        key, stored, fresh = self._lookup(method, url, body)
+        if fresh:
+            self._count("hits")
+            return self._response(stored)
+        return self._finish(key, url, stored, await send(self._validators(stored)))
+
+    def size(self) -> Tuple[int, int]:
+        """(entries, bytes) currently on disk"""
+        with self._lock:
+            index = self._load_index()
+            return len(index), sum(size for size, _ in index.values())
+
+    def clear(self) -> int:
+        """Delete every entry, returning how many were removed"""
+        with self._lock:
+            index = self._load_index()
+            removed = 0
+            for key in list(index):
+                try:
+                    os.remove(self._path(key))
+                    removed += 1
+                except OSError:
+                    pass
+                del index[key]
+            return removed
+
+    def summary(self) -> str:
+        return f"{self.hits} hits, {self.revalidated} revalidated (304), {self.misses} fetched ({self.mode} mode)"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the HTTP response cache")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached response")
+    args = parser.parse_args()
+
+    cache = get_response_cache()
+    if args.clear:
+        print(f"🧹 Removed {cache.clear()} cached responses from {cache.directory}")
+    else:
+        entries, size = cache.size()
+        print(f"📦 {cache.directory}: {entries} responses, {size / 1024 / 1024:.1f} MB "
+              f"(limit {cache.max_bytes / 1024 / 1024:g} MB, TTL {cache.ttl_seconds:g}s, mode {cache.mode})")
@@ -0,0 +1,148 @@
+"""
+Resource-blocking "lean page" profile for the Chrome driver
+
+Blocks fonts, media, images, analytics and third-party tags at the
+request-interception level (DevTools Network.setBlockedURLs) so each ZIP
+search downloads only what the scraper needs. Run this module directly
+to benchmark bytes transferred and page-ready time with the profile on
+and off.
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+RESOURCE_TYPE_PATTERNS = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "stylesheets": ["*.css"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.m3u8", "*.mp3", "*.ts"],
+}
+
+TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*adobedtm.com*",
+    "*demdex.net*",
+    "*omtrdc.net*",
+    "*everesttech.net*",
+    "*hotjar.com*",
+    "*bat.bing.com*",
+    "*clarity.ms*",
+    "*tiktok.com*",
+    "*criteo.com*",
+    "*quantserve.com*",
+    "*scorecardresearch.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*youtube.com/embed*",
+]
+
+
+class LeanProfile:
+    """Per-resource-type switches plus a URL blocklist applied to a Chrome driver"""
+
+    def __init__(self, block_images: Optional[bool] = None, block_stylesheets: Optional[bool] = None,
+                 block_fonts: Optional[bool] = None, block_media: Optional[bool] = None,
+                 block_trackers: Optional[bool] = None, extra_patterns: Optional[List[str]] = None):
+        self.switches = {
+            "images": Config.BLOCK_IMAGES if block_images is None else block_images,
+            "stylesheets": Config.BLOCK_STYLESHEETS if block_stylesheets is None else block_stylesheets,
+            "fonts": Config.BLOCK_FONTS if block_fonts is None else block_fonts,
+            "media": Config.BLOCK_MEDIA if block_media is None else block_media,
+        }
+        self.block_trackers = Config.BLOCK_TRACKERS if block_trackers is None else block_trackers
+        self.extra_patterns = Config.LEAN_EXTRA_BLOCKLIST if extra_patterns is None else extra_patterns
+
+    def blocked_url_patterns(self) -> List[str]:
+        """URL patterns handed to Network.setBlockedURLs"""
+        patterns = []
+        for resource_type, enabled in self.switches.items():
+            if enabled:
+                patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+        if self.block_trackers:
+            patterns.extend(TRACKER_PATTERNS)
+        patterns.extend(self.extra_patterns)
+        return patterns
+
+    def apply_prefs(self, chrome_options):
+        """Content-setting prefs that stop Chrome from requesting blocked types at all"""
+        prefs = {}
+        if self.switches["images"]:
+            prefs["profile.managed_default_content_settings.images"] = 2
+        if self.switches["stylesheets"]:
+            prefs["profile.default_content_setting_values.stylesheets"] = 2
+        if prefs:
+            chrome_options.add_experimental_option("prefs", prefs)
+
+    def apply(self, driver):
+        """Install the URL blocklist on a running driver"""
+        patterns = self.blocked_url_patterns()
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        print(f"Lean page profile active: blocking {len(patterns)} URL patterns")
+
+
+def measure_page_load(scraper, url: str) -> Dict[str, Any]:
+    """Load a URL and report bytes transferred, request counts and page-ready time"""
+    from network_capture import drain_performance_log
+    from waits import network_idle
+
+    scraper.driver.get("about:blank")
+    drain_performance_log(scraper.driver)
+
+    start = time.monotonic()
+    scraper.driver.get(url)
+    scraper.waiter.until(network_idle(), "benchmark page ready", budget=0)
+    ready_seconds = time.monotonic() - start
+
+    transferred = 0
+    requests = 0
+    blocked = 0
+    for message in drain_performance_log(scraper.driver):
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            requests += 1
+        elif method == "Network.loadingFinished":
+            transferred += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked += 1
+
+    return {"bytes": transferred, "requests": requests, "blocked": blocked, "ready_seconds": ready_seconds}
+
+
+def benchmark(url: str, runs: int):
+    """Compare the normal and lean profiles over several page loads"""
+    from toyota_scraper import ToyotaInventoryScraper
+
+    results = {}
+    for lean_page in (False, True):
+        scraper = ToyotaInventoryScraper(lean_page=lean_page, performance_log=True)
+        try:
+            results[lean_page] = [measure_page_load(scraper, url) for _ in range(runs)]
+        finally:
+            scraper.close_driver()
+
+    print(f"\n📊 Lean page benchmark: {url} ({runs} runs each)")
+    print(f"   {'profile':<8} {'KB':>10} {'requests':>9} {'blocked':>8} {'ready s':>8}")
+    for lean_page, samples in results.items():
+        print(f"   {'lean' if lean_page else 'full':<8} "
+              f"{statistics.median(s['bytes'] for s in samples) / 1024:>10.0f} "
+              f"{statistics.median(s['requests'] for s in samples):>9.0f} "
+              f"{statistics.median(s['blocked'] for s in samples):>8.0f} "
+              f"{statistics.median(s['ready_seconds'] for s in samples):>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lean page profile against a normal page load")
+    parser.add_argument("--url", default=Config.TOYOTA_SEARCH_URL)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.url, args.runs)
@@ -0,0 +1,167 @@
+"""
+Location priming so the search page opens straight into results
+
+The site remembers the shopper's ZIP in cookies and local storage. After
+a normal popup + search round-trip the primer looks for the searched ZIP
+in those stores and saves them as templates. Only values equal to the ZIP,
+or JSON values with fields equal to it, are templated (a session ID that
+happens to contain the digits is left alone), and the names found on the
+first search become an allow-list that later searches only refresh. On
+later searches it writes the target ZIP into the same places before
+loading the search URL, so there is no popup to dismiss and no second
+search to submit.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+from config import Config
+
+ZIP_PLACEHOLDER = "__ZIP__"
+
+# Entries whose value contains the ZIP anywhere; learn() keeps only the ones that hold it as a whole value
+LOCAL_STORAGE_MATCHES_JS = """
+var zip = arguments[0], found = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i), value = window.localStorage.getItem(key);
+    if (value && value.indexOf(zip) !== -1) { found[key] = value; }
+}
+return found;
+"""
+
+SET_LOCAL_STORAGE_JS = """
+var items = arguments[0];
+for (var key in items) { window.localStorage.setItem(key, items[key]); }
+"""
+
+_primers: Dict[str, "LocationPrimer"] = {}
+_primers_lock = threading.Lock()
+
+
+def get_primer(path: Optional[str] = None) -> "LocationPrimer":
+    """Return the process-wide primer for a state file"""
+    path = os.path.abspath(path or Config.LOCATION_STATE_PATH)
+    with _primers_lock:
+        if path not in _primers:
+            _primers[path] = LocationPrimer(path)
+        return _primers[path]
+
+
+def zip_template(value: str, zip_code: str) -> Optional[str]:
+    """
+    Template of a stored value that holds zip_code: the placeholder when the value is the ZIP, JSON with the
+    placeholder in every field equal to the ZIP, or None when the ZIP only appears inside something longer
+    """
+    if value == zip_code:
+        return ZIP_PLACEHOLDER
+    try:
+        data = json.loads(value)
+    except ValueError:
+        return None
+
+    found = []
+
+    def template(node):
+        if isinstance(node, dict):
+            return {key: template(item) for key, item in node.items()}
+        if isinstance(node, list):
+            return [template(item) for item in node]
+        if node == zip_code:
+            found.append(node)
+            return ZIP_PLACEHOLDER
+        return node
+
+    templated = template(data)
+    return json.dumps(templated, separators=(",", ":")) if found else None
+
+
+def search_url_for(zip_code: str) -> str:
+    """Search URL that carries the ZIP code as a query parameter"""
+    return f"{Config.TOYOTA_SEARCH_URL}?{urlencode({Config.SEARCH_URL_ZIP_PARAM: zip_code})}"
+
+
+class LocationPrimer:
+    """Learns and replays the cookies and local storage entries that hold the shopper's ZIP"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # "names" is the allow-list of cookie and storage names found on the first search
+        self.state: Dict[str, Any] = {"cookies": {}, "localStorage": {}, "names": {}}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Could not read location state {path}: {e}")
+
+    @property
+    def ready(self) -> bool:
+        """Whether any ZIP-bearing cookie or storage key is known"""
+        return bool(self.state["cookies"] or self.state["localStorage"])
+
+    def learn(self, driver, zip_code: str):
+        """Record the cookies and local storage entries that hold zip_code as a value or JSON field"""
+        try:
+            cookies = {}
+            for cookie in driver.get_cookies():
+                template = zip_template(cookie.get("value", ""), zip_code)
+                if template is not None:
+                    cookies[cookie["name"]] = {"template": template, "path": cookie.get("path", "/"),
+                                               "domain": cookie.get("domain")}
+            storage = {}
+            for key, value in (driver.execute_script(LOCAL_STORAGE_MATCHES_JS, zip_code) or {}).items():
+                template = zip_template(value, zip_code)
+                if template is not None:
+                    storage[key] = template
+        except WebDriverException as e:
+            print(f"Could not read location state from browser: {e}")
+            return
+
+        with self._lock:
+            names = self.state.get("names") or {}
+            if names:
+                # Only refresh the names found on the first search; anything else matched by coincidence
+                cookies = dict(self.state["cookies"], **{name: cookie for name, cookie in cookies.items()
+                                                         if name in names.get("cookies", [])})
+                storage = dict(self.state["localStorage"], **{key: template for key, template in storage.items()
+                                                              if key in names.get("localStorage", [])})
+            elif cookies or storage:
+                names = {"cookies": sorted(cookies), "localStorage": sorted(storage)}
+            if cookies == self.state["cookies"] and storage == self.state["localStorage"]:
+                return
+            self.state = {"cookies": cookies, "localStorage": storage, "names": names}
+            try:
+                with open(self.path, "w") as f:
+                    json.dump(self.state, f, indent=2)
+                print(f"Learned location state: {len(cookies)} cookies, {len(storage)} local storage keys")
+            except OSError as e:
+                print(f"Could not save location state {self.path}: {e}")
+
+    def prime(self, driver, zip_code: str) -> bool:
+        """Write zip_code into the learned cookies and local storage of the current site"""
+        site = urlparse(Config.TOYOTA_SEARCH_URL)
+        try:
+            if urlparse(driver.current_url).netloc != site.netloc:
+                # Cookies and storage can only be set for the origin that is loaded
+                driver.get(f"{site.scheme}://{site.netloc}/robots.txt")
+
+            for name, cookie in self.state["cookies"].items():
+                new_cookie = {"name": name, "value": cookie["template"].replace(ZIP_PLACEHOLDER, zip_code),
+                              "path": cookie.get("path") or "/"}
+                if cookie.get("domain"):
+                    new_cookie["domain"] = cookie["domain"]
+                driver.add_cookie(new_cookie)
+
+            storage = {key: template.replace(ZIP_PLACEHOLDER, zip_code)
+                       for key, template in self.state["localStorage"].items()}
+            if storage:
+                driver.execute_script(SET_LOCAL_STORAGE_JS, storage)
+            return True
+        except WebDriverException as e:
+            print(f"Could not prime location for ZIP {zip_code}: {e}")
+            return False
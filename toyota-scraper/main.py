@@ -1,68 +1,145 @@
 """
 Main script to run Toyota inventory scraper
 """
+import argparse
+import asyncio
 import time
-from typing import List
-from database import DatabaseManager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from async_inventory import AsyncInventoryEngine
+from browser_pool import BrowserPool
+from coverage_planner import CoveragePlanner
+from database import CarDataSink, DatabaseManager
+from rate_limiter import get_rate_limiter
+from retry import CircuitBreaker, CircuitOpenError, is_retryable
+from run_journal import DONE, FAILED, IN_FLIGHT, RunJournal
+from scheduler import RefreshScheduler
+from shards import Shard, parse_shard, select_shard, write_summary
 from toyota_scraper import ToyotaInventoryScraper
+from work_queue import LeaseHeartbeat, LeaseLostError, WorkQueue, default_worker_id
+from working_toyota_scraper import ToyotaInventoryAPI
 from config import Config
 
-def main():
+def plan_zip_codes(db_manager: DatabaseManager, refresh: bool = False, budget_minutes: Optional[float] = None,
+                   max_zips: Optional[int] = None, parallelism: int = 1, shard: Optional[Shard] = None) -> List[str]:
+    """ZIP codes to scrape this run: every one with --refresh, otherwise the scheduler's pick"""
+    print("📋 Fetching ZIP codes from users collection...")
+    weighted_zip_codes = list(db_manager.iter_zip_codes_weighted())
+    
+    if not weighted_zip_codes:
+        print("❌ No ZIP codes found in users collection")
+        return []
+    
+    print(f"📍 Found {len(weighted_zip_codes)} unique ZIP codes")
+    if shard:
+        weighted_zip_codes = select_shard(weighted_zip_codes, shard, key=lambda weighted: weighted[0])
+        print(f"🧩 Shard {shard[0]}/{shard[1]}: {len(weighted_zip_codes)} of them")
+    if refresh:
+        return [zip_code for zip_code, _ in weighted_zip_codes]
+    
+    scheduler = RefreshScheduler(db_manager, budget_minutes, max_zips, parallelism)
+    return scheduler.plan(weighted_zip_codes)
+
+def start_run(db_manager: DatabaseManager, mode: str, resume: Optional[str] = None, refresh: bool = False,
+              budget_minutes: Optional[float] = None, max_zips: Optional[int] = None,
+              parallelism: int = 1, shard: Optional[Shard] = None,
+              coverage_radius: Optional[float] = None) -> Tuple[List[str], Optional[RunJournal]]:
+    """ZIP codes for this run and its journal: a fresh plan, or what a resumed run left unfinished"""
+    if resume:
+        try:
+            journal = RunJournal.open(resume)
+        except OSError as e:
+            print(f"❌ Cannot resume run {resume}: {e}")
+            return [], None
+        zip_codes = journal.unfinished()
+        print(f"📒 Resuming run {resume} ({journal.summary()}): {len(zip_codes)} ZIP codes left")
+        return zip_codes, journal
+    
+    zip_codes = plan_zip_codes(db_manager, refresh, budget_minutes, max_zips, parallelism, shard)
+    if not zip_codes:
+        return [], None
+    
+    coverage_radius = Config.COVERAGE_RADIUS_MILES if coverage_radius is None else coverage_radius
+    covers = None
+    if coverage_radius > 0:
+        # Search one ZIP code for each cluster of nearby user ZIP codes and fan its results out
+        plan = CoveragePlanner(coverage_radius).plan(zip_codes)
+        print(f"🗺️  Coverage plan: {plan.summary()}")
+        zip_codes, covers = plan.queries, plan.covers
+    
+    return zip_codes, RunJournal.create(zip_codes, mode, covers=covers)
+
+def main(refresh: bool = False, budget_minutes: Optional[float] = None, max_zips: Optional[int] = None,
+         resume: Optional[str] = None, shard: Optional[Shard] = None, coverage_radius: Optional[float] = None):
     """Main function to orchestrate the scraping process"""
     print("🚗 Toyota Inventory Scraper Starting...")
+    started_at = datetime.utcnow()
     
     # Initialize components
     db_manager = DatabaseManager()
     scraper = ToyotaInventoryScraper()
     
     try:
-        # Get unique ZIP codes from users
-        print("📋 Fetching ZIP codes from users collection...")
-        zip_codes = db_manager.get_unique_zip_codes()
+        # Pick the ZIP codes due for a refresh (or the unfinished ones of a resumed run)
+        zip_codes, journal = start_run(db_manager, "serial", resume, refresh, budget_minutes, max_zips,
+                                       shard=shard, coverage_radius=coverage_radius)
         
         if not zip_codes:
-            print("❌ No ZIP codes found in users collection")
             return
         
-        print(f"📍 Found {len(zip_codes)} unique ZIP codes to scrape")
-        
         # Process each ZIP code
         total_cars_scraped = 0
         successful_scrapes = 0
+        failed_scrapes = 0
+        breaker = CircuitBreaker()
         
         for i, zip_code in enumerate(zip_codes, 1):
             print(f"\n🔄 Processing ZIP code {i}/{len(zip_codes)}: {zip_code}")
             
             try:
-                # Check if we already have data for this ZIP code
-                existing_count = db_manager.get_existing_cars_count(zip_code)
-                if existing_count > 0:
-                    print(f"⏭️  Skipping ZIP {zip_code} - already has {existing_count} cars")
-                    continue
+                # Pause (or stop) if too many recent ZIP codes failed
+                breaker.wait_if_open()
+            except CircuitOpenError as e:
+                print(f"🛑 Stopping run: {e}")
+                break
+            
+            sink = None
+            try:
+                # Scrape inventory for this ZIP code, writing cars in batches as pages are parsed
+                journal.mark(zip_code, IN_FLIGHT)
+                start = time.monotonic()
+                sink = db_manager.car_sink(zip_code, journal.covers.get(zip_code))
+                sink.extend(scraper.iter_zip_code(zip_code))
+                scrape_seconds = time.monotonic() - start
+                breaker.record(True)
                 
-                # Scrape inventory for this ZIP code
-                car_data = scraper.scrape_zip_code(zip_code)
+                # Finish the writes (an empty result still counts as a refresh)
+                success = sink.close(scrape_seconds)
                 
-                if car_data:
-                    # Insert data into database
-                    success = db_manager.insert_car_data(car_data, zip_code)
-                    
+                if success:
+                    journal.mark(zip_code, DONE, cars=sink.count)
+                else:
+                    journal.mark(zip_code, FAILED, reason="could not store data")
+                
+                if sink.count:
                     if success:
-                        total_cars_scraped += len(car_data)
+                        total_cars_scraped += sink.count
                         successful_scrapes += 1
-                        print(f"✅ Successfully scraped and stored {len(car_data)} cars for ZIP {zip_code}")
+                        print(f"✅ Successfully scraped and stored {sink.count} cars for ZIP {zip_code}")
                     else:
                         print(f"❌ Failed to store data for ZIP {zip_code}")
                 else:
                     print(f"⚠️  No cars found for ZIP {zip_code}")
-                
-                # Delay between requests to be respectful
-                if i < len(zip_codes):
-                    print(f"⏳ Waiting {Config.DELAY_BETWEEN_REQUESTS} seconds before next request...")
-                    time.sleep(Config.DELAY_BETWEEN_REQUESTS)
                     
             except Exception as e:
-                print(f"❌ Error processing ZIP {zip_code}: {e}")
+                # Keep the cars parsed before the failure, without recording the ZIP code as refreshed
+                if sink:
+                    sink.flush()
+                print(f"❌ Error processing ZIP {zip_code}: {e}" + (f" ({sink.count} cars stored)" if sink else ""))
+                breaker.record(False)
+                db_manager.record_zip_failure(zip_code)
+                journal.mark(zip_code, FAILED, reason=str(e), cars=sink.count if sink else 0)
+                failed_scrapes += 1
                 continue
         
         # Summary
@@ -70,7 +147,14 @@ def main():
         print(f"📊 Summary:")
         print(f"   - ZIP codes processed: {len(zip_codes)}")
         print(f"   - Successful scrapes: {successful_scrapes}")
+        print(f"   - Failed scrapes: {failed_scrapes}")
         print(f"   - Total cars scraped: {total_cars_scraped}")
+        print(f"   - Run {journal.run_id}: {journal.summary()}")
+        print(f"   - Rate limiting: {get_rate_limiter().summary()}")
+        
+        if shard:
+            write_summary(shard, "serial", started_at, journal.run_id, zipCodes=len(zip_codes),
+                          successful=successful_scrapes, failed=failed_scrapes, cars=total_cars_scraped)
         
     except Exception as e:
         print(f"❌ Fatal error in main process: {e}")
@@ -81,6 +165,282 @@ def main():
         db_manager.close_connection()
         print("🧹 Cleanup completed")
 
+async def scrape_with_api(db_manager: DatabaseManager, zip_codes: List[str], journal: RunJournal) -> Dict[str, int]:
+    """Fetch every ZIP code concurrently through the GraphQL engine, store the results and return the totals"""
+    engine = AsyncInventoryEngine()
+    total_cars_scraped = 0
+    successful_scrapes = 0
+    failed_scrapes = 0
+    start = time.monotonic()
+    
+    print(f"⚡ Fetching {len(zip_codes)} ZIP codes with concurrency {engine.concurrency} "
+          f"at {engine.requests_per_second:g} requests/s")
+    
+    # Each page is written through the ZIP code's sink as it arrives; the sink is closed when the ZIP is done,
+    # or only flushed when it failed, so the pages already fetched are kept without counting as a refresh
+    sinks: Dict[str, CarDataSink] = {}
+    try:
+        async for event in engine.iter_inventory(
+                zip_codes, on_start=lambda zip_code: journal.mark(zip_code, IN_FLIGHT)):
+            zip_code = event[1]
+            if zip_code not in sinks:
+                sinks[zip_code] = db_manager.car_sink(zip_code, journal.covers.get(zip_code))
+            if event[0] == 'vehicles':
+                await asyncio.to_thread(sinks[zip_code].extend, event[2])
+                continue
+            
+            sink = sinks.pop(zip_code)
+            error = event[2]
+            if error:
+                await asyncio.to_thread(sink.flush)
+                print(f"❌ Error fetching ZIP {zip_code}: {error} ({sink.count} cars stored before the failure)")
+                await asyncio.to_thread(db_manager.record_zip_failure, zip_code)
+                journal.mark(zip_code, FAILED, reason=error, cars=sink.count)
+                failed_scrapes += 1
+                continue
+            
+            success = await asyncio.to_thread(sink.close)
+            if success:
+                journal.mark(zip_code, DONE, cars=sink.count)
+            else:
+                journal.mark(zip_code, FAILED, reason="could not store data")
+            if not sink.count:
+                print(f"⚠️  No cars found for ZIP {zip_code}")
+            elif success:
+                total_cars_scraped += sink.count
+                successful_scrapes += 1
+                print(f"✅ Stored {sink.count} cars for ZIP {zip_code}")
+            else:
+                print(f"❌ Failed to store data for ZIP {zip_code}")
+    finally:
+        # ZIP codes cut off by an error or cancellation keep the cars they already fetched
+        for zip_code, sink in sinks.items():
+            await asyncio.to_thread(sink.flush)
+            print(f"⚠️  ZIP {zip_code} did not finish; {sink.count} cars stored")
+    
+    elapsed = time.monotonic() - start
+    print(f"\n🎉 API scraping completed in {elapsed:.1f}s!")
+    print(f"📊 Summary:")
+    print(f"   - ZIP codes processed: {len(zip_codes)}")
+    print(f"   - Successful scrapes: {successful_scrapes}")
+    print(f"   - Failed scrapes: {failed_scrapes}")
+    print(f"   - Total cars scraped: {total_cars_scraped}")
+    print(f"   - Run {journal.run_id}: {journal.summary()}")
+    print(f"   - Rate limiting: {get_rate_limiter().summary()}")
+    if engine.api.cache.enabled:
+        print(f"   - HTTP cache: {engine.api.cache.summary()}")
+    return {"successful": successful_scrapes, "failed": failed_scrapes, "cars": total_cars_scraped}
+
+def main_api(refresh: bool = False, budget_minutes: Optional[float] = None, max_zips: Optional[int] = None,
+             resume: Optional[str] = None, shard: Optional[Shard] = None, coverage_radius: Optional[float] = None):
+    """Scrape the user ZIP codes due for a refresh through the concurrent GraphQL engine"""
+    print("🚗 Toyota Inventory Scraper Starting (GraphQL API mode)...")
+    started_at = datetime.utcnow()
+    
+    db_manager = DatabaseManager()
+    
+    try:
+        pending, journal = start_run(db_manager, "api", resume, refresh, budget_minutes, max_zips,
+                                     parallelism=Config.API_CONCURRENCY, shard=shard, coverage_radius=coverage_radius)
+        
+        if pending:
+            totals = asyncio.run(scrape_with_api(db_manager, pending, journal))
+            if shard:
+                write_summary(shard, "api", started_at, journal.run_id, zipCodes=len(pending), **totals)
+        
+    except Exception as e:
+        print(f"❌ Fatal error in main process: {e}")
+    
+    finally:
+        db_manager.close_connection()
+        print("🧹 Cleanup completed")
+
+def main_pool(workers: int, refresh: bool = False, budget_minutes: Optional[float] = None,
+              max_zips: Optional[int] = None, resume: Optional[str] = None, shard: Optional[Shard] = None,
+              coverage_radius: Optional[float] = None, parse_processes: Optional[int] = None):
+    """Scrape the user ZIP codes due for a refresh with a pool of parallel Selenium workers"""
+    print(f"🚗 Toyota Inventory Scraper Starting ({workers} browser workers)...")
+    started_at = datetime.utcnow()
+    
+    db_manager = DatabaseManager()
+    
+    try:
+        pending, journal = start_run(db_manager, "pool", resume, refresh, budget_minutes, max_zips,
+                                     parallelism=workers, shard=shard, coverage_radius=coverage_radius)
+        
+        if not pending:
+            return
+        
+        totals = {"cars": 0, "successful": 0, "failed": 0}
+        
+        def store_results(zip_code: str, sink: CarDataSink):
+            success = sink.close()
+            if success:
+                journal.mark(zip_code, DONE, cars=sink.count)
+            else:
+                journal.mark(zip_code, FAILED, reason="could not store data")
+            if not sink.count:
+                print(f"⚠️  No cars found for ZIP {zip_code}")
+            elif success:
+                totals["cars"] += sink.count
+                totals["successful"] += 1
+                print(f"✅ Successfully scraped and stored {sink.count} cars for ZIP {zip_code}")
+            else:
+                print(f"❌ Failed to store data for ZIP {zip_code}")
+        
+        def record_failure(zip_code: str, reason: str):
+            totals["failed"] += 1
+            db_manager.record_zip_failure(zip_code)
+            journal.mark(zip_code, FAILED, reason=reason)
+            print(f"❌ Failed to scrape ZIP {zip_code}: {reason}")
+        
+        pool = BrowserPool(size=workers, parse_processes=parse_processes)
+        pool.run(pending, lambda zip_code: db_manager.car_sink(zip_code, journal.covers.get(zip_code)),
+                 store_results, record_failure, on_start=lambda zip_code: journal.mark(zip_code, IN_FLIGHT))
+        
+        print(f"\n🎉 Scraping completed!")
+        print(f"📊 Summary:")
+        print(f"   - ZIP codes processed: {len(pending)}")
+        print(f"   - Successful scrapes: {totals['successful']}")
+        print(f"   - Failed scrapes: {totals['failed']}")
+        print(f"   - Total cars scraped: {totals['cars']}")
+        print(f"   - Run {journal.run_id}: {journal.summary()}")
+        print(f"   - Rate limiting: {get_rate_limiter().summary()}")
+        pool.print_report()
+        
+        if shard:
+            write_summary(shard, "pool", started_at, journal.run_id, zipCodes=len(pending),
+                          successful=totals["successful"], failed=totals["failed"], cars=totals["cars"])
+        
+    except Exception as e:
+        print(f"❌ Fatal error in main process: {e}")
+    
+    finally:
+        db_manager.close_connection()
+        print("🧹 Cleanup completed")
+
+def main_enqueue(refresh: bool = False, budget_minutes: Optional[float] = None, max_zips: Optional[int] = None,
+                 shard: Optional[Shard] = None):
+    """Write the ZIP codes due for a refresh into the shared work queue for --worker processes"""
+    print("🚗 Toyota Inventory Scraper: filling the work queue...")
+    
+    db_manager = DatabaseManager()
+    
+    try:
+        zip_codes = plan_zip_codes(db_manager, refresh, budget_minutes, max_zips, shard=shard)
+        if not zip_codes:
+            return
+        
+        work_queue = WorkQueue(db_manager.db)
+        queued = work_queue.enqueue(zip_codes)
+        print(f"📥 Queued {queued} ZIP codes in {Config.WORK_QUEUE_COLLECTION}: {work_queue.counts()}")
+        
+    except Exception as e:
+        print(f"❌ Fatal error in main process: {e}")
+    
+    finally:
+        db_manager.close_connection()
+        print("🧹 Cleanup completed")
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed ZIP job is worth another attempt: a retryable error (or one raised from it) or an open circuit"""
+    if isinstance(error, CircuitOpenError) or is_retryable(error):
+        return True
+    return error.__cause__ is not None and is_transient(error.__cause__)
+
+def main_worker(api: bool = False):
+    """Claim ZIP jobs from the shared work queue until it is drained"""
+    worker_id = default_worker_id()
+    print(f"🚗 Toyota Inventory Scraper worker {worker_id} starting ({'GraphQL API' if api else 'Selenium'})...")
+    
+    db_manager = DatabaseManager()
+    work_queue = WorkQueue(db_manager.db)
+    scraper = None
+    breaker = CircuitBreaker()
+    totals = {"cars": 0, "successful": 0, "failed": 0, "lost": 0}
+    
+    if api:
+        inventory_api = ToyotaInventoryAPI()
+        scrape = lambda zip_code: inventory_api.iter_inventory(zip_code, Config.API_PAGE_SIZE, Config.MAX_PAGES_TO_SCRAPE)
+    else:
+        scraper = ToyotaInventoryScraper()
+        scrape = scraper.iter_zip_code
+    
+    try:
+        while True:
+            try:
+                breaker.wait_if_open()
+            except CircuitOpenError as e:
+                print(f"🛑 Stopping worker: {e}")
+                break
+            
+            zip_code = work_queue.claim(worker_id)
+            if zip_code is None:
+                if work_queue.counts()["leased"]:
+                    # Other workers hold leases that may still expire and come back
+                    time.sleep(Config.QUEUE_POLL_INTERVAL)
+                    continue
+                break
+            
+            print(f"\n🔄 Claimed ZIP code {zip_code}")
+            sink = None
+            try:
+                with LeaseHeartbeat(work_queue, zip_code, worker_id) as lease:
+                    start = time.monotonic()
+                    sink = db_manager.car_sink(zip_code)
+                    for car in scrape(zip_code):
+                        lease.check()
+                        sink.add(car)
+                    lease.check()
+                    scrape_seconds = time.monotonic() - start
+                    breaker.record(True)
+                    success = sink.close(scrape_seconds)
+                
+                if not success:
+                    work_queue.fail(zip_code, worker_id, "could not store data", retry=True)
+                    totals["failed"] += 1
+                    print(f"❌ Failed to store data for ZIP {zip_code}")
+                elif work_queue.complete(zip_code, worker_id, sink.count):
+                    totals["cars"] += sink.count
+                    totals["successful"] += 1
+                    print(f"✅ Stored {sink.count} cars for ZIP {zip_code}")
+                else:
+                    totals["lost"] += 1
+                    print(f"⚠️  Stored {sink.count} cars for ZIP {zip_code}, but its lease was lost before completion")
+            
+            except LeaseLostError as e:
+                # The job is another worker's now: keep what was scraped and leave the job alone
+                sink.flush()
+                totals["lost"] += 1
+                print(f"⚠️  Abandoning ZIP {zip_code}: {e} ({sink.count} cars stored)")
+            
+            except Exception as e:
+                if sink:
+                    sink.flush()
+                print(f"❌ Error processing ZIP {zip_code}: {e}" + (f" ({sink.count} cars stored)" if sink else ""))
+                breaker.record(False)
+                db_manager.record_zip_failure(zip_code)
+                work_queue.fail(zip_code, worker_id, str(e), retry=is_transient(e))
+                totals["failed"] += 1
+        
+        print(f"\n🎉 Worker {worker_id} finished!")
+        print(f"📊 Summary:")
+        print(f"   - Successful scrapes: {totals['successful']}")
+        print(f"   - Failed scrapes: {totals['failed']}")
+        print(f"   - Leases lost: {totals['lost']}")
+        print(f"   - Total cars scraped: {totals['cars']}")
+        print(f"   - Queue: {work_queue.counts()}")
+        print(f"   - Rate limiting: {get_rate_limiter().summary()}")
+        
+    except Exception as e:
+        print(f"❌ Fatal error in worker: {e}")
+    
+    finally:
+        if scraper:
+            scraper.close_driver()
+        db_manager.close_connection()
+        print("🧹 Cleanup completed")
+
 def scrape_single_zip(zip_code: str):
     """Function to scrape a single ZIP code for testing"""
     print(f"🧪 Testing scraper with ZIP code: {zip_code}")
@@ -114,13 +474,55 @@ def scrape_single_zip(zip_code: str):
         scraper.close_driver()
         db_manager.close_connection()
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Scrape Toyota inventory for user ZIP codes")
+    parser.add_argument("zip_code", nargs="?", help="Scrape a single ZIP code in test mode")
+    parser.add_argument("--api", action="store_true",
+                        help="Use the concurrent GraphQL engine instead of Selenium")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel Selenium browsers (default: 1)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-scrape every ZIP code instead of the ones the scheduler picks")
+    parser.add_argument("--budget-minutes", type=float, default=None,
+                        help="Only schedule as many ZIP codes as fit in this many minutes")
+    parser.add_argument("--max-zips", type=int, default=None,
+                        help="Only schedule this many ZIP codes")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Finish an interrupted run: redo only its pending, in-flight and failed ZIP codes")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Write the scheduled ZIP codes into the shared MongoDB work queue and exit")
+    parser.add_argument("--worker", action="store_true",
+                        help="Claim ZIP codes from the shared work queue until it is drained (use with --api for the GraphQL API)")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help="Only scrape shard I of N (1-based) of the ZIP codes, split by a stable hash")
+    parser.add_argument("--coverage-radius", type=float, metavar="MILES",
+                        help="Search one ZIP code per cluster of user ZIP codes within MILES and store its results for all of them")
+    parser.add_argument("--parse-processes", type=int, metavar="N",
+                        help="With --workers: browsers only capture pages and N processes parse them (0 = off)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    import sys
+    args = parse_args()
     
-    if len(sys.argv) > 1:
+    if args.zip_code:
         # Test mode with specific ZIP code
-        test_zip = sys.argv[1]
-        scrape_single_zip(test_zip)
+        scrape_single_zip(args.zip_code)
+    elif args.enqueue:
+        # Multi-node mode: fill the shared work queue
+        main_enqueue(args.refresh, args.budget_minutes, args.max_zips, args.shard)
+    elif args.worker:
+        # Multi-node mode: drain the shared work queue
+        main_worker(args.api)
+    elif args.api:
+        # Full scraping mode through the GraphQL API
+        main_api(args.refresh, args.budget_minutes, args.max_zips, args.resume, args.shard,
+                 args.coverage_radius)
+    elif args.workers > 1:
+        # Full scraping mode with a pool of browsers
+        main_pool(args.workers, args.refresh, args.budget_minutes, args.max_zips, args.resume, args.shard,
+                  args.coverage_radius, args.parse_processes)
     else:
         # Full scraping mode
-        main()
+        main(args.refresh, args.budget_minutes, args.max_zips, args.resume, args.shard,
+             args.coverage_radius)
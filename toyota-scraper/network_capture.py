@@ -0,0 +1,145 @@
+"""
+Capture inventory JSON from Chrome's DevTools performance log
+
+The search page loads its inventory over XHR. With performance logging
+enabled, every Network.responseReceived event is available through
+driver.get_log('performance'); the JSON bodies are then read back with
+Network.getResponseBody and mapped straight into car records.
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from selenium.common.exceptions import WebDriverException
+
+from config import Config
+from rate_limiter import THROTTLE_STATUS_CODES, get_rate_limiter
+
+VEHICLE_KEYS = {"vin", "msrp", "model", "modelName", "price", "year", "trim", "dealerName", "dealer"}
+
+
+def drain_performance_log(driver) -> List[Dict[str, Any]]:
+    """Read and clear the performance log, returning the DevTools messages"""
+    messages = []
+    for entry in driver.get_log("performance"):
+        try:
+            messages.append(json.loads(entry["message"])["message"])
+        except (KeyError, ValueError):
+            continue
+    return messages
+
+
+def _first(raw: Dict[str, Any], *paths: str) -> Any:
+    """Return the first non-empty value among dotted key paths"""
+    for path in paths:
+        value: Any = raw
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                break
+        if isinstance(value, dict):
+            value = value.get("value") or value.get("name") or value.get("marketingName")
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        match = re.search(r"[\d,]+", value)
+        if match:
+            return int(match.group(0).replace(",", ""))
+    return None
+
+
+def find_vehicle_lists(data: Any) -> Iterator[List[Dict[str, Any]]]:
+    """Yield every list in a JSON document whose items look like vehicles"""
+    if isinstance(data, list):
+        if data and all(isinstance(item, dict) for item in data) and len(VEHICLE_KEYS & set(data[0])) >= 2:
+            yield data
+            return
+        for item in data:
+            yield from find_vehicle_lists(item)
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from find_vehicle_lists(value)
+
+
+def map_vehicle(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Map one inventory JSON object onto the scraper's car record fields"""
+    car_data = {
+        "vin": _first(raw, "vin"),
+        "model": _first(raw, "model.marketingName", "model", "modelName", "title"),
+        "trim": _first(raw, "grade", "trim", "trimName"),
+        "year": _to_int(_first(raw, "year", "modelYear")),
+        "price": _to_int(_first(raw, "price.advertizedPrice", "price.sellingPrice", "msrp", "price", "totalMsrp")),
+        "dealerName": _first(raw, "dealerMarketingName", "dealerName", "dealer.name", "dealer"),
+        "dealerCode": _first(raw, "dealerCd", "dealerCode", "dealer.code"),
+        "fuelType": _first(raw, "fuelType", "engine.fuelType"),
+        "drivetrain": _first(raw, "drivetrain.code", "drivetrain"),
+        "color": _first(raw, "extColor.marketingName", "exteriorColor"),
+        "mileage": _to_int(_first(raw, "mileage", "odometer")),
+        "availability": _first(raw, "availability", "status"),
+        "availabilityUrl": _first(raw, "vdpUrl", "detailUrl", "url"),
+    }
+    if isinstance(car_data["drivetrain"], str):
+        car_data["drivetrain"] = car_data["drivetrain"].upper()
+    if isinstance(car_data["availabilityUrl"], str) and car_data["availabilityUrl"].startswith("/"):
+        car_data["availabilityUrl"] = "https://www.toyota.com" + car_data["availabilityUrl"]
+    return {key: value for key, value in car_data.items() if value is not None}
+
+
+class InventoryCapture:
+    """Collects inventory XHR responses seen by the browser since the last reset"""
+
+    def __init__(self, driver, url_pattern: Optional[str] = None):
+        self.driver = driver
+        self.url_pattern = re.compile(url_pattern or Config.INVENTORY_XHR_PATTERN, re.IGNORECASE)
+
+    def reset(self):
+        """Discard everything logged so far (e.g. the popup's default-ZIP search)"""
+        try:
+            self.driver.get_log("performance")
+        except WebDriverException as e:
+            print(f"Could not clear performance log: {e}")
+
+    def _inventory_request_ids(self) -> List[str]:
+        request_ids = []
+        for message in drain_performance_log(self.driver):
+            if message.get("method") != "Network.responseReceived":
+                continue
+            params = message.get("params", {})
+            response = params.get("response", {})
+            if response.get("status") in THROTTLE_STATUS_CODES:
+                # The browser saw the site push back: slow every scraper sharing this host
+                headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+                get_rate_limiter().observe(response.get("url", ""), response["status"], headers.get("retry-after"))
+            if "json" in response.get("mimeType", "") and self.url_pattern.search(response.get("url", "")):
+                request_ids.append(params.get("requestId"))
+        return request_ids
+
+    def _response_json(self, request_id: str) -> Any:
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            return json.loads(body.get("body", ""))
+        except (WebDriverException, ValueError):
+            return None
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Map every captured inventory response into car records, one per VIN"""
+        cars: List[Dict[str, Any]] = []
+        seen_vins = set()
+        for request_id in self._inventory_request_ids():
+            data = self._response_json(request_id)
+            for vehicles in find_vehicle_lists(data):
+                for raw in vehicles:
+                    car_data = map_vehicle(raw)
+                    vin = car_data.get("vin")
+                    if vin and vin in seen_vins:
+                        continue
+                    if car_data.get("model") and car_data.get("price"):
+                        seen_vins.add(vin)
+                        cars.append(car_data)
+        return cars
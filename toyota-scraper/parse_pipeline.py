@@ -0,0 +1,137 @@
+"""
+Pipelined parsing: browsers capture pages, a process pool parses them
+
+Parsing a results page is CPU work, and it used to run on the thread
+driving Chrome, so each browser sat idle while its last page was parsed.
+With PARSE_PROCESSES set, pool workers only capture pages (the HTML, or
+the records already read from the network log) and hand each ZIP code's
+pages to a ParsePipeline:
+
+- a ProcessPoolExecutor parses them with the card parser, on every core
+- a single writer thread stores the parsed ZIP codes in submission order
+  (insert_car_data upserts them in DB_BATCH_SIZE bulk writes)
+- at most PIPELINE_QUEUE_SIZE ZIP codes are captured but not yet stored;
+  submit() blocks once that many are queued, so browsers cannot race
+  ahead of parsing and memory stays bounded
+
+Browser I/O, parsing and database writes for different ZIP codes overlap.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from card_parser import CardParser, PagePayload, vehicle_key
+from config import Config
+
+ResultCallback = Callable[[str, List[Dict[str, Any]]], None]
+ErrorCallback = Callable[[str, str], None]
+
+# One card parser per worker process, built on its first job
+_parser: Optional[CardParser] = None
+
+
+def parse_zip_pages(payloads: List[PagePayload]) -> List[Dict[str, Any]]:
+    """Car records from one ZIP code's captured pages, without vehicles repeated across pages"""
+    global _parser
+    if _parser is None:
+        _parser = CardParser()
+
+    cars = []
+    seen = set()
+    for payload in payloads:
+        _, page_cars = _parser.parse_payload(payload)
+        for car in page_cars:
+            key = vehicle_key(car)
+            if key not in seen:
+                seen.add(key)
+                cars.append(car)
+    return cars
+
+
+class ParsePipeline:
+    """Bounded parse-and-store stage between capturing browsers and the database"""
+
+    def __init__(self, on_result: ResultCallback, on_error: Optional[ErrorCallback] = None,
+                 processes: Optional[int] = None, queue_size: Optional[int] = None):
+        self.processes = processes or Config.PARSE_PROCESSES or os.cpu_count() or 1
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE or 2 * self.processes
+        self.on_result = on_result
+        self.on_error = on_error
+        self.zip_codes = 0
+        self.cars = 0
+        self.failures = 0
+        self.blocked_seconds = 0.0
+        # Spawn rather than fork: a forked child would inherit the browser threads' held locks
+        self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._pending: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="parse-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, zip_code: str, payloads: List[PagePayload]):
+        """Queue a ZIP code's captured pages for parsing and storing; blocks while the pipeline is full"""
+        start = time.monotonic()
+        self._slots.acquire()
+        self.blocked_seconds += time.monotonic() - start
+        try:
+            future = self._executor.submit(parse_zip_pages, payloads)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._pending.put((zip_code, future))
+
+    def _write_loop(self):
+        """Store parsed ZIP codes in the order they were submitted"""
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            zip_code, future = item
+            try:
+                try:
+                    car_data = future.result()
+                except Exception as e:
+                    self.failures += 1
+                    print(f"❌ Parsing failed for ZIP {zip_code}: {e}")
+                    self._report_error(zip_code, f"parse failed: {type(e).__name__}: {e}")
+                    continue
+                self.zip_codes += 1
+                self.cars += len(car_data)
+                self.on_result(zip_code, car_data)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Error handling results for ZIP {zip_code}: {e}")
+                self._report_error(zip_code, f"store failed: {type(e).__name__}: {e}")
+            finally:
+                self._slots.release()
+
+    def _report_error(self, zip_code: str, reason: str):
+        """Pass a ZIP code's failure to on_error, so it is never left unreported"""
+        if not self.on_error:
+            return
+        try:
+            self.on_error(zip_code, reason)
+        except Exception as e:
+            print(f"❌ Error recording failure for ZIP {zip_code}: {e}")
+
+    def close(self):
+        """Wait for everything submitted to be parsed and stored, then stop the processes"""
+        self._pending.put(None)
+        self._writer.join()
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ParsePipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def summary(self) -> str:
+        return (f"{self.zip_codes} ZIPs parsed in {self.processes} processes, {self.cars} cars, "
+                f"{self.failures} failures, capture waited {self.blocked_seconds:.1f}s on a full queue "
+                f"({self.queue_size} slots)")
@@ -0,0 +1,188 @@
+"""
+Per-host token-bucket rate limiter shared by every scraper backend
+
+Each host gets a bucket that refills at RATE_LIMIT_PER_SECOND and holds up
+to RATE_LIMIT_BURST tokens, so short bursts go out at once while the
+long-run rate stays bounded. The GraphQL clients (sync and async), the
+plain HTTP scraper and the Selenium drivers all take tokens from the same
+process-wide limiter, so running them side by side never adds up to more
+than one host's budget. An endpoint with a budget of its own (the GraphQL
+API) is keyed by host and path instead, see endpoint_of.
+
+The rate adapts: a 429 or 503 cuts the host's rate by RATE_LIMIT_BACKOFF
+and blocks it for the Retry-After period, and each success wins back a
+slice of the configured rate (additive increase, multiplicative decrease).
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from config import Config
+
+THROTTLE_STATUS_CODES = {429, 503}
+
+_limiters: Dict[str, "RateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter() -> "RateLimiter":
+    """Return the process-wide rate limiter"""
+    with _limiters_lock:
+        if "default" not in _limiters:
+            _limiters["default"] = RateLimiter()
+        return _limiters["default"]
+
+
+def host_of(url: str) -> str:
+    """Host part of a URL (a bare host name is returned as is)"""
+    return urlparse(url).netloc or url
+
+
+def endpoint_of(url: str) -> str:
+    """Host and path of a URL, a bucket key for an endpoint with its own budget on a shared host"""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path}" if parsed.netloc else url
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Seconds to wait from a Retry-After value, given as delta-seconds or an HTTP date"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket for one host, with an adaptive refill rate"""
+
+    def __init__(self, rate: float, burst: float):
+        self.target_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            self.requests += 1
+            if self.rate <= 0:
+                return 0.0
+
+            now = time.monotonic()
+            self._refill(now)
+            # Tokens may go negative: each waiting caller holds its own place in the queue
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate if self.tokens < 0 else 0.0, self.blocked_until - now)
+            self.waited += wait
+            return wait
+
+    def throttle(self, retry_after: Optional[float]):
+        """The host pushed back: slow down and hold off for Retry-After (or one refill interval)"""
+        with self._lock:
+            self.throttled += 1
+            if self.target_rate <= 0:
+                return
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(min(Config.RATE_LIMIT_MIN_PER_SECOND, self.target_rate),
+                            self.rate * Config.RATE_LIMIT_BACKOFF)
+            self.tokens = min(self.tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+
+    def recover(self):
+        """A request went through: win back part of the configured rate"""
+        with self._lock:
+            if self.rate < self.target_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.target_rate, self.rate + self.target_rate * Config.RATE_LIMIT_RECOVERY)
+
+
+class RateLimiter:
+    """Per-host token buckets; hosts nobody configured use the default rate and burst"""
+
+    def __init__(self, requests_per_second: Optional[float] = None, burst: Optional[float] = None):
+        self.requests_per_second = Config.RATE_LIMIT_PER_SECOND if requests_per_second is None else requests_per_second
+        self.burst = Config.RATE_LIMIT_BURST if burst is None else burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = host_of(url)
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return self._buckets[host]
+
+    def configure(self, url: str, requests_per_second: float, burst: Optional[float] = None):
+        """Set a host's rate (0 = unlimited) and burst, e.g. a higher budget for the GraphQL API"""
+        bucket = self.bucket(url)
+        with bucket._lock:
+            backed_off = 0 < bucket.rate < bucket.target_rate
+            bucket.target_rate = requests_per_second
+            # Keep a backoff in force; recovery climbs to the new rate from there
+            if backed_off and requests_per_second > 0:
+                bucket.rate = min(bucket.rate, requests_per_second)
+            else:
+                bucket.rate = requests_per_second
+            if burst is not None:
+                bucket.burst = max(1.0, burst)
+                bucket.tokens = min(bucket.tokens, bucket.burst)
+
+    def acquire(self, url: str):
+        """Block until a request to the URL's host is allowed"""
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str):
+        """Await until a request to the URL's host is allowed"""
+        wait = self.bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, url: str, status_code: Optional[int], retry_after: Any = None):
+        """Feed a response status (and Retry-After header) back into the host's rate"""
+        bucket = self.bucket(url)
+        if status_code in THROTTLE_STATUS_CODES:
+            seconds = parse_retry_after(retry_after)
+            bucket.throttle(seconds)
+            print(f"🐢 {host_of(url)} answered {status_code}; slowing to {bucket.rate:.2f} req/s"
+                  + (f" and pausing {seconds:g}s" if seconds is not None else ""))
+        elif status_code is not None and 200 <= status_code < 400:
+            bucket.recover()
+
+    def summary(self) -> str:
+        """Requests, throttled responses and time spent waiting, per host"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        if not buckets:
+            return "no requests"
+        return "; ".join(
+            f"{host}: {bucket.requests} requests, {bucket.throttled} throttled, waited {bucket.waited:.1f}s, "
+            f"rate {bucket.rate:.2f}/{bucket.target_rate:g} req/s"
+            for host, bucket in sorted(buckets.items())
+        )
@@ -7,7 +7,9 @@ import requests
 import json
 import re
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
+from http_cache import RawResponse, get_response_cache
+from rate_limiter import get_rate_limiter
 
 class RealToyotaScraper:
     def __init__(self):
@@ -20,21 +22,33 @@ class RealToyotaScraper:
             "connection": "keep-alive",
             "upgrade-insecure-requests": "1"
         }
+        self.rate_limiter = get_rate_limiter()
+        self.cache = get_response_cache()
+    
+    def _send(self, url: str, extra_headers: Dict[str, str]) -> RawResponse:
+        self.rate_limiter.acquire(url)
+        response = requests.get(url, headers=dict(self.headers, **extra_headers))
+        self.rate_limiter.observe(url, response.status_code, response.headers.get("Retry-After"))
+        return response.status_code, response.headers, response.content
     
     def scrape_inventory(self, zip_code: str = "78712", limit: int = 20) -> List[Dict[str, Any]]:
         """Scrape Toyota inventory by simulating a real user search"""
+        return list(self.iter_inventory(zip_code, limit))
+    
+    def iter_inventory(self, zip_code: str = "78712", limit: int = 20) -> Iterator[Dict[str, Any]]:
+        """Yield vehicles from a simulated user search as they are extracted"""
         try:
             print(f"🚗 Scraping Toyota inventory for ZIP: {zip_code}")
             
             # Step 1: Get the search page
             print("1. Loading Toyota search page...")
-            response = requests.get(self.base_url, headers=self.headers)
+            response = self.cache.request("GET", self.base_url, lambda headers: self._send(self.base_url, headers))
             
             if response.status_code != 200:
                 print(f"❌ Failed to load search page: {response.status_code}")
-                return []
+                return
             
-            print("✅ Search page loaded successfully")
+            print("✅ Search page loaded successfully" + (" (from cache)" if response.from_cache else ""))
             
             # Step 2: Try to find the actual search API endpoint
             # Look for JavaScript that makes API calls
@@ -58,24 +72,26 @@ class RealToyotaScraper:
             
             # Step 3: Try to extract vehicle data from the page content
             print("2. Extracting vehicle data from page...")
-            vehicles = self.extract_vehicles_from_page(page_content, zip_code, limit)
+            count = 0
+            for vehicle in self.iter_vehicles_from_page(page_content, zip_code, limit):
+                count += 1
+                yield vehicle
             
-            if vehicles:
-                print(f"✅ Successfully extracted {len(vehicles)} vehicles")
-                return vehicles
+            if count:
+                print(f"✅ Successfully extracted {count} vehicles")
             else:
                 print("⚠️  No vehicles found in page content")
-                return []
                 
         except Exception as e:
             print(f"❌ Error during scraping: {e}")
-            return []
     
     def extract_vehicles_from_page(self, page_content: str, zip_code: str, limit: int) -> List[Dict[str, Any]]:
         """Extract vehicle data from page content"""
+        return list(self.iter_vehicles_from_page(page_content, zip_code, limit))
+    
+    def iter_vehicles_from_page(self, page_content: str, zip_code: str, limit: int) -> Iterator[Dict[str, Any]]:
+        """Yield vehicle data from page content as each listing is built"""
         try:
-            vehicles = []
-            
             # Look for vehicle data in the page content
             # This is a more sophisticated approach than the previous regex method
             
@@ -161,17 +177,14 @@ class RealToyotaScraper:
                         'zipCode': zip_code,
                         'scrapedAt': datetime.now().isoformat()
                     }
-                    vehicles.append(vehicle)
+                    yield vehicle
                     
                 except Exception as e:
                     print(f"⚠️  Error creating vehicle {i+1}: {e}")
                     continue
             
-            return vehicles
-            
         except Exception as e:
             print(f"❌ Error extracting vehicles: {e}")
-            return []
 
 def main():
     """Test the real Toyota scraper"""
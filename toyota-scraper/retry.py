@@ -0,0 +1,199 @@
+"""
+Shared retry policy and circuit breaker for the HTTP and Selenium scrapers
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+
+import requests
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from config import Config
+from rate_limiter import parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:  # the async engine is optional
+    aiohttp = None
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """A transient failure that is worth another attempt (e.g. results never loaded)"""
+
+
+class ScrapeFailed(Exception):
+    """A ZIP code could not be scraped, even after retries"""
+
+
+class CircuitOpenError(Exception):
+    """The error rate stayed too high after repeated pauses, so the run should stop"""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code
+    return getattr(exc, "status", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Classify an exception as transient (timeouts, 429/5xx, stale elements) or permanent"""
+    if isinstance(exc, RetryableError):
+        return True
+    if isinstance(exc, (TimeoutException, StaleElementReferenceException)):
+        return True
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, asyncio.TimeoutError)):
+        return True
+    if aiohttp and isinstance(exc, (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError)):
+        return True
+    return _status_code(exc) in RETRYABLE_STATUS_CODES
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if the error carries one"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None) or {}
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    return parse_retry_after(value)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, limited to MAX_RETRIES extra attempts"""
+
+    def __init__(self, max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, classify: Callable[[BaseException], bool] = is_retryable):
+        self.max_retries = Config.MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = Config.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.classify = classify
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """Backoff before retry number attempt (0-based), honouring Retry-After"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_seconds(exc) if exc else None
+        return max(backoff, min(retry_after, self.max_delay)) if retry_after else backoff
+
+    def _should_retry(self, attempt: int, exc: BaseException, description: str) -> Optional[float]:
+        if attempt >= self.max_retries or not self.classify(exc):
+            return None
+        delay = self.delay(attempt, exc)
+        print(f"🔁 {description} failed ({type(exc).__name__}: {exc}); "
+              f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, func: Callable[..., Any], *args, description: str = "Request",
+             on_retry: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Any:
+        """Call func, retrying retryable errors"""
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(attempt, e, description)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                if on_retry:
+                    on_retry(e)
+                attempt += 1
+
+    def iterate(self, func: Callable[..., Iterable[Any]], *args, description: str = "Request",
+                on_retry: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Iterator[Any]:
+        """Yield from func(...), retrying retryable errors raised before its first item (later ones would repeat items)"""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for item in func(*args, **kwargs):
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                delay = None if started else self._should_retry(attempt, e, description)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                if on_retry:
+                    on_retry(e)
+                attempt += 1
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args, description: str = "Request",
+                         **kwargs) -> Any:
+        """Await func(...), retrying retryable errors"""
+        attempt = 0
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(attempt, e, description)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+class CircuitBreaker:
+    """Pauses the whole run when the error rate over the last N ZIP codes spikes"""
+
+    def __init__(self, window: Optional[int] = None, error_rate: Optional[float] = None,
+                 min_calls: Optional[int] = None, cooldown: Optional[float] = None,
+                 max_trips: Optional[int] = None):
+        self.window = window or Config.BREAKER_WINDOW
+        self.error_rate = Config.BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.min_calls = min_calls or Config.BREAKER_MIN_CALLS
+        self.cooldown = Config.BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.max_trips = Config.BREAKER_MAX_TRIPS if max_trips is None else max_trips
+        self.trips = 0
+        self._open_until = 0.0
+        self._gave_up: Optional[str] = None
+        self._results: deque = deque(maxlen=self.window)
+        self._lock = threading.Lock()
+
+    def record(self, success: bool):
+        """Record the outcome of one ZIP code"""
+        with self._lock:
+            self._results.append(success)
+
+    def _current_error_rate(self) -> float:
+        return self._results.count(False) / len(self._results) if self._results else 0.0
+
+    def _pause_seconds(self) -> float:
+        """How long callers should pause; raises once the breaker has tripped too often"""
+        with self._lock:
+            if self._gave_up:
+                raise CircuitOpenError(self._gave_up)
+
+            now = time.monotonic()
+            if self._open_until > now:
+                return self._open_until - now
+            if len(self._results) < self.min_calls or self._current_error_rate() < self.error_rate:
+                return 0.0
+
+            rate = self._current_error_rate()
+            self.trips += 1
+            self._results.clear()
+            if self.trips > self.max_trips:
+                self._gave_up = f"error rate {rate:.0%} after {self.max_trips} pauses, giving up"
+                raise CircuitOpenError(self._gave_up)
+
+            self._open_until = now + self.cooldown
+            print(f"🛑 Circuit breaker open: {rate:.0%} of recent ZIP codes failed; "
+                  f"pausing {self.cooldown:g}s (pause {self.trips}/{self.max_trips})")
+            return self.cooldown
+
+    def wait_if_open(self):
+        """Block while the breaker is open"""
+        pause = self._pause_seconds()
+        if pause:
+            time.sleep(pause)
+
+    async def wait_if_open_async(self):
+        """Await while the breaker is open"""
+        pause = self._pause_seconds()
+        if pause:
+            await asyncio.sleep(pause)
@@ -0,0 +1,117 @@
+"""
+Append-only run journal so an interrupted scrape can be resumed
+
+Every run writes one JSON line per ZIP code status change (pending,
+in_flight, done, failed) to RUN_JOURNAL_DIR/<run-id>.jsonl. Replaying
+the file gives the latest status of each ZIP code, so a restart with
+--resume <run-id> only redoes ZIP codes that never finished.
+"""
+import json
+import os
+import secrets
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import Config
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+STATUSES = (PENDING, IN_FLIGHT, DONE, FAILED)
+
+
+class RunJournal:
+    """Durable per-ZIP status log for one scraping run"""
+
+    def __init__(self, run_id: str, directory: Optional[str] = None):
+        self.run_id = run_id
+        self.directory = directory or Config.RUN_JOURNAL_DIR
+        self.path = os.path.join(self.directory, f"{run_id}.jsonl")
+        self.statuses: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.covers: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, zip_codes: Iterable[str], mode: str = "serial", directory: Optional[str] = None,
+               covers: Optional[Dict[str, List[str]]] = None) -> "RunJournal":
+        """Start a new run with every ZIP code pending
+
+        covers maps a searched ZIP code to the user ZIP codes its results are also stored for.
+        """
+        journal = cls(f"{datetime.utcnow():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}", directory)
+        os.makedirs(journal.directory, exist_ok=True)
+        zip_codes = list(zip_codes)
+        journal._append([{"run": journal.run_id, "mode": mode, "zipCount": len(zip_codes)}])
+        covers = covers or {}
+        journal._append([journal._record(zip_code, PENDING, covers=covers.get(zip_code) or None)
+                         for zip_code in zip_codes])
+        print(f"📒 Run {journal.run_id}: journal at {journal.path} (resume with --resume {journal.run_id})")
+        return journal
+
+    @classmethod
+    def open(cls, run_id: str, directory: Optional[str] = None) -> "RunJournal":
+        """Load an existing run by replaying its journal"""
+        journal = cls(run_id, directory)
+        line = ""
+        with open(journal.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash mid-write carries no usable status
+                    continue
+                if record.get("status") in STATUSES:
+                    journal._apply(record)
+
+        if line and not line.endswith("\n"):
+            # Terminate a torn last line so new records start on a line of their own
+            with open(journal.path, "a") as f:
+                f.write("\n")
+        return journal
+
+    def _record(self, zip_code: str, status: str, **fields) -> Dict[str, Any]:
+        record = {"ts": datetime.utcnow().isoformat(), "zip": zip_code, "status": status}
+        record.update({key: value for key, value in fields.items() if value is not None})
+        self._apply(record)
+        return record
+
+    def _apply(self, record: Dict[str, Any]):
+        if record["zip"] not in self.statuses:
+            self.order.append(record["zip"])
+        if record.get("covers"):
+            self.covers[record["zip"]] = record["covers"]
+        self.statuses[record["zip"]] = record
+
+    def _append(self, records: List[Dict[str, Any]]):
+        """Write records and fsync so they survive the process being killed"""
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def mark(self, zip_code: str, status: str, reason: Optional[str] = None, cars: Optional[int] = None):
+        """Record a ZIP code's new status"""
+        with self._lock:
+            try:
+                self._append([self._record(zip_code, status, reason=reason, cars=cars)])
+            except OSError as e:
+                print(f"Could not write run journal {self.path}: {e}")
+
+    def unfinished(self) -> List[str]:
+        """ZIP codes that are pending, were in flight when the run stopped, or failed"""
+        return [zip_code for zip_code in self.order if self.statuses[zip_code]["status"] != DONE]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in STATUSES}
+        for record in self.statuses.values():
+            counts[record["status"]] += 1
+        return counts
+
+    def summary(self) -> str:
+        counts = self.counts()
+        return ", ".join(f"{counts[status]} {status.replace('_', '-')}" for status in STATUSES)
@@ -0,0 +1,96 @@
+"""
+Freshness-based refresh scheduling for ZIP codes
+
+Each ZIP code's state lives in the zip_state collection: when it was last
+scraped, how much of its inventory changes per hour, how long a scrape
+takes and how many users want it. A run ranks ZIP codes by the share of
+their inventory that has probably changed since the last scrape, weighted
+by user count, and takes as many as fit the time or request budget.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+
+class RefreshScheduler:
+    """Picks which ZIP codes to refresh within a time or request budget"""
+
+    def __init__(self, db_manager, budget_minutes: Optional[float] = None, max_zips: Optional[int] = None,
+                 parallelism: int = 1, min_age_hours: Optional[float] = None):
+        self.db_manager = db_manager
+        self.budget_minutes = Config.SCHEDULER_BUDGET_MINUTES if budget_minutes is None else budget_minutes
+        self.max_zips = Config.SCHEDULER_MAX_ZIPS if max_zips is None else max_zips
+        self.parallelism = max(1, parallelism)
+        self.min_age_hours = Config.FRESH_DATA_MAX_AGE_HOURS if min_age_hours is None else min_age_hours
+
+    @staticmethod
+    def age_hours(state: Dict[str, Any], now: datetime) -> Optional[float]:
+        """Hours since the ZIP code was last scraped, or None if it never was"""
+        last_scraped = state.get('lastScrapedAt')
+        return (now - last_scraped).total_seconds() / 3600 if last_scraped else None
+
+    def priority(self, state: Dict[str, Any], now: datetime) -> Tuple[int, float]:
+        """Sort key: never-scraped ZIP codes first, then expected stale inventory times demand"""
+        user_count = state.get('userCount', 1)
+        backoff = 1 + state.get('consecutiveFailures', 0)
+        age = self.age_hours(state, now)
+        if age is None:
+            return 1, user_count / backoff
+
+        rate = state.get('changeRate')
+        rate = Config.SCHEDULER_DEFAULT_CHANGE_RATE if rate is None else rate
+        staleness = 1 - math.exp(-rate * age)
+        return 0, user_count * staleness / backoff
+
+    @staticmethod
+    def estimated_seconds(state: Dict[str, Any]) -> float:
+        return state.get('scrapeSeconds') or Config.SCHEDULER_DEFAULT_ZIP_SECONDS
+
+    def _load_states(self, weighted_zip_codes: List[Tuple[str, int]]) -> Dict[str, Dict[str, Any]]:
+        """
+        zip_state documents. lastScrapedAt is only written for a ZIP code that was searched (or stood in for
+        by a coverage query), never inferred from car rows another ZIP's search happened to refresh
+        """
+        zip_codes = [zip_code for zip_code, _ in weighted_zip_codes]
+        self.db_manager.sync_zip_demand(weighted_zip_codes)
+        states = self.db_manager.get_zip_states(zip_codes)
+
+        for zip_code, user_count in weighted_zip_codes:
+            states.setdefault(zip_code, {})['userCount'] = user_count
+        return states
+
+    def plan(self, weighted_zip_codes: Iterable[Tuple[str, int]]) -> List[str]:
+        """ZIP codes to scrape this run, most valuable first"""
+        weighted_zip_codes = list(weighted_zip_codes)
+        states = self._load_states(weighted_zip_codes)
+        now = datetime.utcnow()
+
+        candidates = []
+        fresh = 0
+        for zip_code, _ in weighted_zip_codes:
+            state = states[zip_code]
+            age = self.age_hours(state, now)
+            if age is not None and age < self.min_age_hours:
+                fresh += 1
+                continue
+            candidates.append((self.priority(state, now), zip_code))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        budget_seconds = self.budget_minutes * 60 * self.parallelism
+        planned: List[str] = []
+        planned_seconds = 0.0
+        for _, zip_code in candidates:
+            if self.max_zips and len(planned) >= self.max_zips:
+                break
+            cost = self.estimated_seconds(states[zip_code])
+            if budget_seconds and planned_seconds + cost > budget_seconds:
+                continue
+            planned.append(zip_code)
+            planned_seconds += cost
+
+        print(f"🗓️  Scheduled {len(planned)} of {len(weighted_zip_codes)} ZIP codes "
+              f"(~{planned_seconds / 60 / self.parallelism:.1f} min): {fresh} scraped within "
+              f"{self.min_age_hours:g}h, {len(candidates) - len(planned)} over budget")
+        return planned
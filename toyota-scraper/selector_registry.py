@@ -0,0 +1,177 @@
+"""
+Learned selector registry for the Selenium scraper
+
+Remembers which selector matched for each page role (popup, ZIP input,
+submit button, result card, ...) and tries it first on later pages. All
+probes run with a zero implicit wait, so a missing selector costs one
+round-trip instead of the full IMPLICIT_WAIT.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+
+from config import Config
+
+Selector = Tuple[str, str]
+
+_registries: Dict[str, "SelectorRegistry"] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: Optional[str] = None) -> "SelectorRegistry":
+    """Return the process-wide registry for a file, so pooled drivers share what they learn"""
+    path = os.path.abspath(path or Config.SELECTOR_REGISTRY_PATH)
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = SelectorRegistry(path)
+        return _registries[path]
+
+
+def any_element(element) -> bool:
+    return True
+
+
+def is_visible(element) -> bool:
+    return element.is_displayed()
+
+
+def is_clickable(element) -> bool:
+    return element.is_displayed() and element.is_enabled()
+
+
+@contextmanager
+def zero_implicit_wait(driver):
+    """Temporarily disable the driver's implicit wait"""
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(Config.IMPLICIT_WAIT)
+
+
+class SelectorRegistry:
+    """Per-role hit/miss counts for selectors, persisted as JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.stats: Dict[str, Dict[str, Dict[str, Any]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read selector registry {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def key(selector: Selector) -> str:
+        by, value = selector
+        return f"{by}:{value}"
+
+    def _entry(self, role: str, selector: Selector) -> Dict[str, Any]:
+        return self.stats.setdefault(role, {}).setdefault(self.key(selector), {"hits": 0, "misses": 0})
+
+    def order(self, role: str, candidates: Sequence[Selector]) -> List[Selector]:
+        """Sort candidates so the most successful selectors for a role come first"""
+        role_stats = self.stats.get(role, {})
+
+        def rank(item):
+            index, selector = item
+            entry = role_stats.get(self.key(selector), {})
+            return (-entry.get("hits", 0), entry.get("misses", 0), index)
+
+        return [selector for _, selector in sorted(enumerate(candidates), key=rank)]
+
+    def record(self, role: str, selector: Selector, hit: bool):
+        """Count a hit or miss for a selector"""
+        with self._lock:
+            entry = self._entry(role, selector)
+            if hit:
+                entry["hits"] += 1
+                entry["lastHitAt"] = datetime.utcnow().isoformat()
+            else:
+                entry["misses"] += 1
+            self._dirty = True
+
+    def save(self):
+        """Write the registry to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self.stats, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                print(f"Could not save selector registry {self.path}: {e}")
+
+    def find(self, driver, role: str, candidates: Sequence[Selector], context=None,
+             predicate: Callable[[Any], bool] = is_visible, timeout: Optional[float] = None,
+             find_all: bool = False):
+        """
+        Poll candidates in learned order until one matches or the timeout expires.
+        Returns (element, selector), or (elements, selector) when find_all is set,
+        and (None, None) when nothing matched.
+        """
+        timeout = Config.SELECTOR_TIMEOUT if timeout is None else timeout
+        ordered = self.order(role, candidates)
+        deadline = time.monotonic() + timeout
+
+        while True:
+            matches, selector = self.probe(driver, role, ordered, context, predicate)
+            if matches:
+                for missed in ordered[:ordered.index(selector)]:
+                    self.record(role, missed, False)
+                self.record(role, selector, True)
+                return (matches if find_all else matches[0]), selector
+
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(Config.SELECTOR_POLL_INTERVAL)
+
+        for selector in ordered:
+            self.record(role, selector, False)
+        return None, None
+
+    def probe(self, driver, role: str, candidates: Sequence[Selector], context=None,
+              predicate: Callable[[Any], bool] = any_element):
+        """
+        Check candidates once, in learned order, without waiting or recording stats.
+        Returns (matches, selector) for the first candidate that matched, else ([], None).
+        """
+        context = context or driver
+        with zero_implicit_wait(driver):
+            for selector in self.order(role, candidates):
+                try:
+                    matches = [element for element in context.find_elements(*selector) if predicate(element)]
+                except (StaleElementReferenceException, WebDriverException):
+                    continue
+                if matches:
+                    return matches, selector
+        return [], None
+
+    def report(self) -> str:
+        """Summarise hits and misses per role and selector"""
+        lines = []
+        for role in sorted(self.stats):
+            lines.append(f"{role}:")
+            for key, entry in sorted(self.stats[role].items(), key=lambda item: -item[1]["hits"]):
+                lines.append(f"   {entry['hits']:>5} hits {entry['misses']:>5} misses  {key}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(get_registry().report() or "Selector registry is empty")
@@ -0,0 +1,125 @@
+"""
+Deterministic ZIP code sharding for running one scrape as N independent jobs
+
+`main.py --shard i/N` keeps only the ZIP codes whose stable hash falls in
+shard i (1-based), so N cron jobs or containers scrape disjoint slices
+with no shared state. Each shard writes its own summary JSON; run this
+module with `merge` to combine them:
+
+    python3 shards.py merge runs/shard-*-of-4.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from config import Config
+
+Shard = Tuple[int, int]
+T = TypeVar("T")
+
+COUNTERS = ("zipCodes", "successful", "failed", "cars")
+
+
+def parse_shard(value: str) -> Shard:
+    """Parse "i/N" into (i, N), with 1 <= i <= N"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}, got {value!r}")
+    return index, count
+
+
+def shard_of(zip_code: str, count: int) -> int:
+    """1-based shard a ZIP code belongs to; the same on every machine and Python process"""
+    digest = hashlib.md5(zip_code.encode("utf-8")).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def select_shard(items: Iterable[T], shard: Shard, key=lambda item: item) -> List[T]:
+    """Items whose ZIP code falls in the shard, in their original order"""
+    index, count = shard
+    return [item for item in items if shard_of(key(item), count) == index]
+
+
+def summary_path(shard: Shard, directory: Optional[str] = None) -> str:
+    index, count = shard
+    return os.path.join(directory or Config.SHARD_SUMMARY_DIR, f"shard-{index}-of-{count}.json")
+
+
+def write_summary(shard: Shard, mode: str, started_at: datetime, run_id: Optional[str] = None,
+                  directory: Optional[str] = None, **counters: int) -> str:
+    """Write one shard's run summary and return its path"""
+    finished_at = datetime.utcnow()
+    summary = {
+        "shard": f"{shard[0]}/{shard[1]}",
+        "mode": mode,
+        "runId": run_id,
+        "startedAt": started_at.isoformat(),
+        "finishedAt": finished_at.isoformat(),
+        "elapsedSeconds": round((finished_at - started_at).total_seconds(), 1),
+    }
+    summary.update({counter: counters.get(counter, 0) for counter in COUNTERS})
+
+    path = summary_path(shard, directory)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"🧩 Shard {summary['shard']} summary written to {path}")
+    return path
+
+
+def merge_summaries(paths: List[str]) -> Dict[str, Any]:
+    """Combine per-shard summaries into totals for the whole run"""
+    summaries = []
+    for path in paths:
+        with open(path) as f:
+            summaries.append(json.load(f))
+
+    counts = {int(summary["shard"].split("/")[1]) for summary in summaries}
+    if len(counts) > 1:
+        raise ValueError(f"summaries come from different shard counts: {sorted(counts)}")
+
+    count = counts.pop() if counts else 0
+    present = {int(summary["shard"].split("/")[0]) for summary in summaries}
+    merged: Dict[str, Any] = {counter: sum(summary.get(counter, 0) for summary in summaries) for counter in COUNTERS}
+    merged.update({
+        "shards": count,
+        "missingShards": [index for index in range(1, count + 1) if index not in present],
+        # Shards run side by side, so the whole run took as long as the slowest shard
+        "elapsedSeconds": max((summary.get("elapsedSeconds", 0) for summary in summaries), default=0),
+        "perShard": sorted(summaries, key=lambda summary: int(summary["shard"].split("/")[0])),
+    })
+    return merged
+
+
+def print_merged(merged: Dict[str, Any]):
+    print(f"📊 Merged summary of {merged['shards'] - len(merged['missingShards'])}/{merged['shards']} shards:")
+    for summary in merged["perShard"]:
+        print(f"   - shard {summary['shard']}: {summary['zipCodes']} ZIPs, {summary['successful']} ok, "
+              f"{summary['failed']} failed, {summary['cars']} cars in {summary['elapsedSeconds']:g}s")
+    print(f"   - total: {merged['zipCodes']} ZIPs, {merged['successful']} ok, {merged['failed']} failed, "
+          f"{merged['cars']} cars; slowest shard took {merged['elapsedSeconds']:g}s")
+    if merged["missingShards"]:
+        print(f"⚠️  No summary for shard(s) {', '.join(map(str, merged['missingShards']))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work with per-shard run summaries")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    merge_parser = subparsers.add_parser("merge", help="Combine per-shard summary files")
+    merge_parser.add_argument("paths", nargs="*", help="Summary files (default: every shard summary in SHARD_SUMMARY_DIR)")
+    merge_parser.add_argument("--output", help="Also write the merged summary to this JSON file")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(Config.SHARD_SUMMARY_DIR, "shard-*-of-*.json")))
+    merged = merge_summaries(paths)
+    print_merged(merged)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(merged, f, indent=2)
@@ -0,0 +1,55 @@
+"""
+Tests for the concurrent GraphQL engine's worker bookkeeping
+"""
+import asyncio
+
+from async_inventory import AsyncInventoryEngine
+
+
+def page(zip_code, page_number):
+    vehicles = [{"vin": f"{zip_code}-{page_number}", "model": "Camry"}]
+    return {"data": {"searchInventory": {"totalCount": 1, "vehicles": vehicles}}}
+
+
+def collect(engine, zip_codes, on_start=None):
+    async def run():
+        return [event async for event in engine.iter_inventory(zip_codes, on_start=on_start)]
+    return asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+
+def engine_with_pages():
+    engine = AsyncInventoryEngine(concurrency=2)
+
+    async def fetch_page(session, zip_code, page_number):
+        return page(zip_code, page_number)
+    engine.fetch_page = fetch_page
+    return engine
+
+
+def test_every_zip_gets_its_vehicles_and_a_done_event():
+    events = collect(engine_with_pages(), ["78712", "10001"])
+
+    assert sorted(event[1] for event in events if event[0] == 'done') == ["10001", "78712"]
+    assert sum(len(event[2]) for event in events if event[0] == 'vehicles') == 2
+
+
+def test_a_failing_on_start_is_reported_instead_of_hanging():
+    def on_start(zip_code):
+        if zip_code == "78712":
+            raise RuntimeError("journal unavailable")
+
+    events = collect(engine_with_pages(), ["78712", "10001", "60601"], on_start)
+
+    done = {event[1]: event[2] for event in events if event[0] == 'done'}
+    assert done == {"78712": "RuntimeError: journal unavailable", "10001": None, "60601": None}
+
+
+def test_a_failing_breaker_is_reported_instead_of_hanging():
+    engine = engine_with_pages()
+
+    def record(success):
+        raise RuntimeError("breaker broke")
+    engine.breaker.record = record
+
+    events = collect(engine, ["78712", "10001"])
+    assert sorted(event[1] for event in events if event[0] == 'done') == ["10001", "78712"]
@@ -0,0 +1,89 @@
+"""
+Tests for the single-pass card parser, on a saved results fragment
+"""
+import os
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from card_parser import CardParser, available_backends
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "results-fragment.html")
+
+
+@pytest.fixture(scope="module")
+def page():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+def baseline_record(card):
+    """The original extraction: one select_one() per candidate selector, the year from the card's markup"""
+    def first(selectors, parse):
+        for selector in selectors:
+            element = card.select_one(selector)
+            if element:
+                value = parse(element.get_text(strip=True))
+                if value is not None:
+                    return value
+        return None
+
+    def number(pattern):
+        def parse(text):
+            match = re.search(pattern, text)
+            return int(match.group(1).replace(',', '')) if match else None
+        return parse
+
+    def keyword(keywords, transform=str):
+        return lambda text: transform(text) if any(word in text.lower() for word in keywords) else None
+
+    car_data = {
+        'model': first(['.model', '.vehicle-model', '.car-model', 'h3', 'h2', '.title'], lambda text: text),
+        'price': first(['.price', '.vehicle-price', '.car-price', '[class*="price"]'], number(r'\$?([\d,]+)')),
+        'dealerName': first(['.dealer', '.dealer-name', '.dealership', '[class*="dealer"]'], lambda text: text),
+        'fuelType': first(['.fuel-type', '.fuel', '[class*="fuel"]'], keyword(['hybrid', 'electric', 'gas', 'gasoline'])),
+        'drivetrain': first(['.drivetrain', '.drive', '[class*="drive"]'], keyword(['awd', 'fwd', 'rwd', '4wd'], str.upper)),
+        'mileage': first(['.mileage', '.miles', '[class*="mile"]'], number(r'([\d,]+)')),
+    }
+    year = re.search(r'\b(20\d{2})\b', str(card))
+    if year:
+        car_data['year'] = int(year.group(1))
+    link = card.select_one('a[href]')
+    if link and link.get('href'):
+        href = link['href']
+        car_data['availabilityUrl'] = 'https://www.toyota.com' + href if href.startswith('/') else href
+    car_data = {field: value for field, value in car_data.items() if value is not None}
+    return car_data if car_data.get('model') and car_data.get('price') else None
+
+
+def test_every_backend_extracts_the_same_records(page):
+    results = {name: CardParser(name).parse_page(page) for name in available_backends()}
+
+    reference = results.pop('bs4')
+    assert reference[0] == '.vehicle-card' and len(reference[1]) == 3
+    for name, result in results.items():
+        assert result == reference, name
+
+
+def test_records_match_the_baseline_extraction(page):
+    cards = BeautifulSoup(page, 'html.parser').select('.vehicle-card')
+    baseline = [record for record in map(baseline_record, cards) if record]
+
+    _, cars = CardParser('bs4').parse_page(page)
+    # The parser only adds the VIN, from a data-vin attribute or the detail link
+    assert [{field: value for field, value in car.items() if field != 'vin'} for car in cars] == baseline
+    assert [car.get('vin') for car in cars] == ["4T1K31AK5RU012345", "JTMUB3FV2SD123456", None]
+
+
+def test_card_fields_follow_selector_priority(page):
+    _, cars = CardParser('bs4').parse_page(page)
+    camry, rav4, tacoma = cars
+
+    # .vehicle-price outranks the earlier "Total MSRP" label matched only by [class*="price"]
+    assert camry['price'] == 36915
+    # A fuel element without a fuel keyword falls through to the next selector
+    assert rav4['fuelType'] == "Electrified hybrid"
+    assert rav4['drivetrain'] == "AWD"
+    assert tacoma == {'model': "Tacoma TRD Off-Road", 'price': 45210, 'dealerName': "Toyota of Cedar Park",
+                      'fuelType': "Gas", 'drivetrain': "4WD", 'mileage': 1204, 'year': 2024}
@@ -0,0 +1,56 @@
+"""
+Tests for coverage planning
+"""
+from coverage_planner import CoveragePlanner, haversine_miles
+
+# Roughly 0.1 degrees of latitude (about 7 miles) apart along one meridian
+COORDINATES = {
+    "A": (30.0, -97.0),
+    "B": (30.1, -97.0),
+    "C": (30.2, -97.0),
+    "D": (30.3, -97.0),
+    "E": (35.0, -97.0),
+}
+
+
+def planner(radius_miles):
+    return CoveragePlanner(radius_miles=radius_miles, coordinates=COORDINATES)
+
+
+def test_haversine_matches_a_known_distance():
+    assert abs(haversine_miles((30.0, -97.0), (31.0, -97.0)) - 69.1) < 0.1
+
+
+def test_greedy_cover_takes_the_zip_covering_most_first():
+    plan = planner(8).plan(["A", "B", "C", "D", "E"])
+
+    # B covers A, B and C; then D and E are left, one search each
+    assert plan.queries == ["B", "D", "E"]
+    assert plan.members["B"][:2] == ["A", "B"]
+    assert sorted(zip_code for members in plan.members.values() for zip_code in members) == list("ABCDE")
+
+
+def test_each_zip_takes_the_nearest_chosen_query():
+    plan = planner(15).plan(["B", "C", "A", "D"])
+
+    for query, members in plan.members.items():
+        for zip_code in members:
+            nearest = min(plan.queries, key=lambda other: haversine_miles(COORDINATES[zip_code], COORDINATES[other]))
+            assert haversine_miles(COORDINATES[zip_code], COORDINATES[query]) == \
+                haversine_miles(COORDINATES[zip_code], COORDINATES[nearest])
+
+
+def test_ties_go_to_the_higher_demand_zip():
+    assert planner(8).plan(["D", "C"]).queries == ["D"]
+    assert planner(8).plan(["C", "D"]).queries == ["C"]
+
+
+def test_zip_codes_without_coordinates_are_searched_themselves():
+    plan = planner(8).plan(["A", "99999"])
+
+    assert plan.queries == ["A", "99999"]
+    assert plan.covers == {"A": [], "99999": []}
+
+
+def test_zero_radius_searches_every_zip():
+    assert planner(0).plan(["A", "B", "C"]).queries == ["A", "B", "C"]
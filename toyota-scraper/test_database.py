@@ -0,0 +1,69 @@
+"""
+Tests for the car_data upserts
+"""
+from datetime import datetime, timedelta
+
+from database import vehicle_filter
+
+CAMRY = {
+    "model": "Camry", "year": 2024, "trim": "LE", "price": 28000, "dealerName": "Toyota of Austin",
+    "color": "White", "availabilityUrl": "https://www.toyota.com/inventory/camry-le",
+}
+
+
+def test_identity_ignores_price():
+    assert vehicle_filter(CAMRY) == vehicle_filter(dict(CAMRY, price=26500))
+    assert vehicle_filter(CAMRY) != vehicle_filter(dict(CAMRY, color="Black"))
+
+
+def test_rescrape_with_new_price_updates_row_in_place(db_manager):
+    db_manager.upsert_car_data([dict(CAMRY)], "78712")
+    summary = db_manager.upsert_car_data([dict(CAMRY, price=26500)], "78712")
+
+    rows = list(db_manager.car_data_collection.find())
+    assert len(rows) == 1
+    assert rows[0]["price"] == 26500
+    assert (summary.inserted, summary.modified) == (0, 1)
+
+
+def test_rescrape_from_another_zip_adds_the_zip(db_manager):
+    db_manager.upsert_car_data([dict(CAMRY)], "78712")
+    db_manager.upsert_car_data([dict(CAMRY)], "78701")
+
+    rows = list(db_manager.car_data_collection.find())
+    assert len(rows) == 1
+    assert sorted(rows[0]["zipCodes"]) == ["78701", "78712"]
+
+
+def test_vin_is_the_key_when_present(db_manager):
+    vin = "JTDKBRFU0J3000000"
+    db_manager.upsert_car_data([dict(CAMRY, vin=vin)], "78712")
+    db_manager.upsert_car_data([dict(CAMRY, vin=vin, price=27000, trim="SE")], "78712")
+
+    rows = list(db_manager.car_data_collection.find())
+    assert len(rows) == 1
+    assert (rows[0]["vin"], rows[0]["trim"]) == (vin, "SE")
+
+
+def test_legacy_rows_are_migrated_and_merged(db_manager):
+    now = datetime.utcnow().replace(microsecond=0)
+    old, new = now - timedelta(days=2), now - timedelta(days=1)
+    db_manager.car_data_collection.insert_many([
+        dict(CAMRY, zipCode="78712", scrapedAt=old),
+        dict(CAMRY, price=26500, zipCode="78712", scrapedAt=new),
+        dict(CAMRY, model="RAV4", zipCode="78701", scrapedAt=new),
+    ])
+
+    assert db_manager.migrate_legacy_car_data() == 3
+    rows = {row["model"]: row for row in db_manager.car_data_collection.find()}
+    assert len(rows) == 2
+    assert rows["Camry"]["price"] == 26500
+    assert rows["Camry"]["zipCodes"] == ["78712"]
+    assert rows["Camry"]["recordKey"] == vehicle_filter(CAMRY)["recordKey"]
+    assert db_manager.get_existing_cars_count("78701") == 1
+    assert db_manager.get_zip_states(["78712"])["78712"]["lastScrapedAt"] == new
+
+    # Upserts after the upgrade find the migrated row, and a second run has nothing left to do
+    db_manager.upsert_car_data([dict(CAMRY, price=25000)], "78712")
+    assert db_manager.car_data_collection.count_documents({"model": "Camry"}) == 1
+    assert db_manager.migrate_legacy_car_data() == 0
@@ -0,0 +1,63 @@
+"""
+Tests for the on-disk HTTP response cache
+"""
+import pytest
+
+from http_cache import ON, ONLY, CacheMissError, ResponseCache
+
+URL = "https://www.toyota.com/search-inventory/graphql"
+PAYLOAD = {"query": "query  SearchInventory { x }", "variables": {"zip": "78712"}}
+
+
+class Server:
+    """Answers send() calls with queued (status, headers, body) responses, recording the request headers"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, headers):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path), mode=ON, ttl_seconds=0, max_bytes=1024 * 1024)
+
+
+def test_stale_entry_is_revalidated_and_304_keeps_the_body(cache):
+    server = Server((200, {"ETag": '"v1"', "Content-Type": "application/json"}, b'{"ok": 1}'),
+                    (304, {"ETag": '"v2"'}, b""))
+
+    cache.request("POST", URL, server, body=PAYLOAD)
+    response = cache.request("POST", URL, server, body=dict(PAYLOAD, query="query SearchInventory { x }"))
+
+    assert server.requests[1] == {"If-None-Match": '"v1"'}
+    assert response.from_cache and response.json() == {"ok": 1}
+    assert response.headers["etag"] == '"v2"'
+    assert (cache.hits, cache.revalidated, cache.misses) == (0, 1, 1)
+
+
+def test_fresh_entry_is_served_without_a_request(tmp_path):
+    cache = ResponseCache(str(tmp_path), mode=ON, ttl_seconds=3600, max_bytes=1024 * 1024)
+    server = Server((200, {}, b"{}"))
+
+    cache.request("POST", URL, server, body=PAYLOAD)
+    assert cache.request("POST", URL, server, body=PAYLOAD).from_cache
+    assert len(server.requests) == 1 and cache.hits == 1
+
+
+def test_bodies_keep_their_bytes_and_charset(cache):
+    body = "Café Toyota".encode("windows-1252")
+    cache.request("GET", URL, Server((200, {"Content-Type": "text/html; charset=windows-1252"}, body)))
+
+    offline = ResponseCache(cache.directory, mode=ONLY)
+    response = offline.request("GET", URL, Server())
+    assert response.content == body
+    assert response.text == "Café Toyota"
+
+
+def test_cache_only_mode_raises_on_a_miss(tmp_path):
+    with pytest.raises(CacheMissError):
+        ResponseCache(str(tmp_path), mode=ONLY).request("GET", URL, Server())
@@ -0,0 +1,42 @@
+"""
+Tests for learning location cookie and storage templates
+"""
+import json
+
+from location_primer import ZIP_PLACEHOLDER, LocationPrimer, zip_template
+
+
+class FakeDriver:
+    def __init__(self, cookies, storage):
+        self.cookies = [{"name": name, "value": value, "path": "/"} for name, value in cookies.items()]
+        self.storage = storage
+
+    def get_cookies(self):
+        return self.cookies
+
+    def execute_script(self, script, zip_code):
+        return {key: value for key, value in self.storage.items() if zip_code in value}
+
+
+def test_zip_template_only_takes_whole_values():
+    assert zip_template("78712", "78712") == ZIP_PLACEHOLDER
+    assert zip_template("sess-787123-abc", "78712") is None
+    assert zip_template("78712-1234", "78712") is None
+
+
+def test_zip_template_replaces_json_fields_equal_to_the_zip():
+    template = zip_template('{"zip": "78712", "id": "a78712b", "recent": ["78712"]}', "78712")
+    assert json.loads(template) == {"zip": ZIP_PLACEHOLDER, "id": "a78712b", "recent": [ZIP_PLACEHOLDER]}
+    assert zip_template('{"id": "a78712b"}', "78712") is None
+
+
+def test_names_from_the_first_search_are_the_allow_list(tmp_path):
+    primer = LocationPrimer(str(tmp_path / "location.json"))
+    primer.learn(FakeDriver({"zip": "78712", "session": "s-78712"}, {"loc": '{"zip":"78712"}'}), "78712")
+    assert set(primer.state["cookies"]) == {"zip"}
+    assert set(primer.state["localStorage"]) == {"loc"}
+
+    # A later search where an unrelated cookie happens to equal the ZIP does not add it
+    primer.learn(FakeDriver({"zip": "10001", "cart": "10001"}, {}), "10001")
+    assert set(primer.state["cookies"]) == {"zip"}
+    assert LocationPrimer(primer.path).state["names"] == {"cookies": ["zip"], "localStorage": ["loc"]}
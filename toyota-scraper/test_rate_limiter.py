@@ -0,0 +1,121 @@
+"""
+Tests for the adaptive token-bucket rate limiter
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import rate_limiter
+from config import Config
+from rate_limiter import RateLimiter, TokenBucket, endpoint_of, parse_retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(Config, "RATE_LIMIT_BACKOFF", 0.5)
+    monkeypatch.setattr(Config, "RATE_LIMIT_RECOVERY", 0.25)
+    monkeypatch.setattr(Config, "RATE_LIMIT_MIN_PER_SECOND", 0.1)
+    return clock
+
+
+def test_burst_goes_out_at_once_then_callers_queue(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+
+    clock.now += 2.5
+    assert bucket.reserve() == 0
+
+
+def test_throttle_cuts_the_rate_and_blocks_for_retry_after(clock):
+    bucket = TokenBucket(rate=4, burst=4)
+    bucket.throttle(retry_after=3)
+
+    assert bucket.rate == 2
+    assert bucket.reserve() == 3
+
+    bucket.throttle(retry_after=None)
+    assert bucket.rate == 1
+
+
+def test_successes_win_the_rate_back_additively(clock):
+    bucket = TokenBucket(rate=4, burst=4)
+    bucket.throttle(retry_after=0)
+    bucket.throttle(retry_after=0)
+    assert bucket.rate == 1
+
+    rates = []
+    for _ in range(4):
+        bucket.recover()
+        rates.append(bucket.rate)
+    assert rates == [2, 3, 4, 4]
+
+
+def test_rate_never_drops_below_the_floor(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    for _ in range(10):
+        bucket.throttle(retry_after=0)
+    assert bucket.rate == 0.1
+
+
+def test_observe_feeds_status_codes_back_per_host(clock):
+    limiter = RateLimiter(requests_per_second=4, burst=4)
+    limiter.observe("https://www.toyota.com/search", 429, "2")
+    limiter.observe("https://api.example.com/graphql", 200)
+
+    assert limiter.bucket("https://www.toyota.com/other").rate == 2
+    assert limiter.bucket("https://api.example.com/").rate == 4
+
+    limiter.observe("https://www.toyota.com/search", 200)
+    assert limiter.bucket("www.toyota.com").rate == 3
+
+
+def test_unlimited_hosts_never_wait(clock):
+    limiter = RateLimiter(requests_per_second=0)
+    assert all(limiter.bucket("example.com").reserve() == 0 for _ in range(100))
+
+
+def test_retry_after_as_seconds_or_http_date():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(retry_at) <= 30
+
+
+def test_configure_sets_the_rate_of_a_fresh_bucket(clock):
+    limiter = RateLimiter(requests_per_second=0.5, burst=1)
+    limiter.configure("https://api.example.com/graphql", 10)
+
+    assert limiter.bucket("api.example.com").rate == 10
+
+
+def test_configure_keeps_a_backoff_in_force(clock):
+    limiter = RateLimiter(requests_per_second=4, burst=4)
+    limiter.observe("https://api.example.com/graphql", 429, "0")
+    limiter.configure("https://api.example.com/graphql", 10)
+
+    bucket = limiter.bucket("api.example.com")
+    assert bucket.rate == 2 and bucket.target_rate == 10
+
+    limiter.configure("https://api.example.com/graphql", 1)
+    assert bucket.rate == 1
+
+
+def test_an_endpoint_key_budgets_apart_from_its_host(clock):
+    limiter = RateLimiter(requests_per_second=0.5, burst=1)
+    limiter.configure(endpoint_of("https://www.toyota.com/search-inventory/graphql"), 10)
+
+    assert limiter.bucket("https://www.toyota.com/search-inventory/graphql").rate == 0.5
+    assert limiter.bucket("www.toyota.com/search-inventory/graphql").rate == 10
@@ -0,0 +1,164 @@
+"""
+Tests for the retry policy and circuit breaker (on a fake clock)
+"""
+import pytest
+import requests
+from selenium.common.exceptions import TimeoutException
+
+import retry
+from retry import CircuitBreaker, CircuitOpenError, RetryableError, RetryPolicy, is_retryable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry, "time", clock)
+    # The jitter draws the whole backoff window, so the sleeps are predictable
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+def failing(*errors, result="ok"):
+    """A callable that raises each error in turn, then returns result"""
+    remaining = list(errors)
+
+    def func():
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return func
+
+
+def test_transient_errors_are_retryable_and_others_are_not():
+    assert is_retryable(RetryableError("results never loaded"))
+    assert is_retryable(TimeoutException())
+    assert is_retryable(requests.Timeout())
+    assert is_retryable(requests.ConnectionError())
+    assert is_retryable(http_error(429))
+    assert is_retryable(http_error(503))
+
+    assert not is_retryable(http_error(404))
+    assert not is_retryable(ValueError("bad data"))
+
+
+def test_backoff_doubles_up_to_the_cap_and_honours_retry_after(clock):
+    policy = RetryPolicy(max_retries=5, base_delay=1, max_delay=10)
+
+    assert [policy.delay(attempt) for attempt in range(5)] == [1, 2, 4, 8, 10]
+    assert policy.delay(0, http_error(429, retry_after="7")) == 7
+    assert policy.delay(0, http_error(429, retry_after="60")) == 10
+
+
+def test_call_retries_transient_errors_then_returns(clock):
+    policy = RetryPolicy(max_retries=3, base_delay=1, max_delay=10)
+    retried = []
+
+    result = policy.call(failing(requests.Timeout(), http_error(503)), on_retry=retried.append)
+
+    assert result == "ok"
+    assert clock.sleeps == [1, 2]
+    assert [type(error) for error in retried] == [requests.Timeout, requests.HTTPError]
+
+
+def test_call_gives_up_after_max_retries_and_on_permanent_errors(clock):
+    policy = RetryPolicy(max_retries=2, base_delay=1, max_delay=10)
+
+    with pytest.raises(requests.Timeout):
+        policy.call(failing(*(requests.Timeout() for _ in range(3))))
+    assert clock.sleeps == [1, 2]
+
+    with pytest.raises(ValueError):
+        policy.call(failing(ValueError("bad data")))
+    assert clock.sleeps == [1, 2]
+
+
+def test_iterate_retries_only_before_the_first_item(clock):
+    policy = RetryPolicy(max_retries=3, base_delay=1, max_delay=10)
+    calls = []
+
+    def pages(fail_after):
+        calls.append(fail_after)
+        if len(calls) == 1:
+            raise requests.Timeout()
+        yield "page 1"
+        if fail_after:
+            raise requests.Timeout()
+        yield "page 2"
+
+    assert list(policy.iterate(pages, False)) == ["page 1", "page 2"]
+    assert calls == [False, False]
+
+    calls.clear()
+    items = policy.iterate(pages, True)
+    with pytest.raises(requests.Timeout):
+        for _ in items:
+            pass
+    # The error after "page 1" is raised rather than retried, which would yield "page 1" again
+    assert calls == [True, True]
+
+
+def test_breaker_opens_pauses_then_lets_calls_through_again(clock):
+    breaker = CircuitBreaker(window=4, error_rate=0.5, min_calls=4, cooldown=60, max_trips=2)
+    for success in (True, False, True, True):
+        breaker.record(success)
+    breaker.wait_if_open()
+    assert clock.sleeps == []
+
+    breaker.record(False)
+    breaker.wait_if_open()
+    assert clock.sleeps == [60] and breaker.trips == 1
+
+    # After the cooldown the window starts empty: calls go through until enough new outcomes are in
+    breaker.record(False)
+    breaker.wait_if_open()
+    assert clock.sleeps == [60]
+
+
+def test_breaker_pauses_callers_for_the_rest_of_the_cooldown(clock):
+    breaker = CircuitBreaker(window=2, error_rate=0.5, min_calls=2, cooldown=60, max_trips=2)
+    breaker.record(False)
+    breaker.record(False)
+
+    assert breaker._pause_seconds() == 60
+    clock.now += 45
+    assert breaker._pause_seconds() == 15
+    clock.now += 15
+    assert breaker._pause_seconds() == 0
+
+
+def test_breaker_gives_up_after_max_trips(clock):
+    breaker = CircuitBreaker(window=2, error_rate=0.5, min_calls=2, cooldown=60, max_trips=1)
+    for _ in range(2):
+        breaker.record(False)
+    breaker.wait_if_open()
+
+    for _ in range(2):
+        breaker.record(False)
+    with pytest.raises(CircuitOpenError, match="giving up"):
+        breaker.wait_if_open()
+
+    # Once given up it stays open, even after successes
+    breaker.record(True)
+    with pytest.raises(CircuitOpenError):
+        breaker.wait_if_open()
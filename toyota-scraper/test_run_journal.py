@@ -0,0 +1,35 @@
+"""
+Tests for run journal replay
+"""
+from run_journal import DONE, FAILED, IN_FLIGHT, RunJournal
+
+
+def test_replay_restores_the_latest_status(tmp_path):
+    journal = RunJournal.create(["78712", "10001", "90210", "60601"], "api", directory=str(tmp_path),
+                                covers={"78712": ["78705"]})
+    journal.mark("78712", IN_FLIGHT)
+    journal.mark("78712", DONE, cars=12)
+    journal.mark("10001", IN_FLIGHT)
+    journal.mark("90210", FAILED, reason="timeout")
+
+    resumed = RunJournal.open(journal.run_id, str(tmp_path))
+    assert resumed.unfinished() == ["10001", "90210", "60601"]
+    assert resumed.statuses["78712"]["cars"] == 12
+    assert resumed.covers == {"78712": ["78705"]}
+    assert resumed.summary() == "1 pending, 1 in-flight, 1 done, 1 failed"
+
+
+def test_torn_last_line_is_skipped_and_terminated(tmp_path):
+    journal = RunJournal.create(["78712", "10001"], directory=str(tmp_path))
+    journal.mark("78712", DONE, cars=3)
+    with open(journal.path, "a") as f:
+        f.write('{"ts": "2024-01-15T10:30:00", "zip": "10001", "sta')
+
+    resumed = RunJournal.open(journal.run_id, str(tmp_path))
+    assert resumed.unfinished() == ["10001"]
+
+    # New records land on a line of their own and survive the next replay
+    resumed.mark("10001", DONE, cars=5)
+    assert RunJournal.open(journal.run_id, str(tmp_path)).unfinished() == []
+    with open(journal.path) as f:
+        assert f.read().endswith('"cars": 5}\n')
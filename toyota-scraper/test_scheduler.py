@@ -0,0 +1,63 @@
+"""
+Tests for refresh scheduling
+"""
+from datetime import datetime, timedelta
+
+from scheduler import RefreshScheduler
+
+
+class FakeDatabase:
+    def __init__(self, states):
+        self.states = states
+
+    def sync_zip_demand(self, weighted_zip_codes):
+        pass
+
+    def get_zip_states(self, zip_codes):
+        return {zip_code: dict(self.states[zip_code]) for zip_code in zip_codes if zip_code in self.states}
+
+
+def hours_ago(hours):
+    return datetime.utcnow() - timedelta(hours=hours)
+
+
+def plan(states, weighted, **kwargs):
+    kwargs.setdefault("budget_minutes", 0)
+    kwargs.setdefault("max_zips", 0)
+    return RefreshScheduler(FakeDatabase(states), min_age_hours=24, **kwargs).plan(weighted)
+
+
+def test_never_scraped_first_then_stale_inventory_times_demand():
+    states = {
+        "old": {"lastScrapedAt": hours_ago(200), "changeRate": 0.02},
+        "busy": {"lastScrapedAt": hours_ago(48), "changeRate": 0.02},
+        "fresh": {"lastScrapedAt": hours_ago(1), "changeRate": 0.5},
+    }
+    weighted = [("old", 1), ("busy", 10), ("fresh", 100), ("new", 1)]
+
+    assert plan(states, weighted) == ["new", "busy", "old"]
+
+
+def test_failures_back_off():
+    states = {
+        "failing": {"lastScrapedAt": hours_ago(48), "consecutiveFailures": 4},
+        "healthy": {"lastScrapedAt": hours_ago(48)},
+    }
+    assert plan(states, [("failing", 2), ("healthy", 1)]) == ["healthy", "failing"]
+
+
+def test_budget_is_filled_past_a_zip_that_does_not_fit():
+    states = {
+        "slow": {"lastScrapedAt": hours_ago(100), "scrapeSeconds": 50},
+        "medium": {"lastScrapedAt": hours_ago(90), "scrapeSeconds": 30},
+        "quick": {"lastScrapedAt": hours_ago(80), "scrapeSeconds": 10},
+    }
+    weighted = [("slow", 1), ("medium", 1), ("quick", 1)]
+
+    assert plan(states, weighted, budget_minutes=0.75) == ["medium", "quick"]
+    assert plan(states, weighted, budget_minutes=1) == ["slow", "quick"]
+    assert plan(states, weighted, budget_minutes=1, parallelism=2) == ["slow", "medium", "quick"]
+
+
+def test_max_zips_caps_the_plan():
+    assert plan({}, [("a", 3), ("b", 2), ("c", 1)], max_zips=2) == ["a", "b"]
@@ -0,0 +1,60 @@
+"""
+Tests for ZIP code sharding and summary merging
+"""
+import argparse
+import json
+from datetime import datetime
+
+import pytest
+
+from shards import merge_summaries, parse_shard, select_shard, shard_of, write_summary
+
+ZIP_CODES = ["78712", "10001", "90210", "60601"]
+
+
+def test_shards_are_stable_across_processes():
+    # MD5-based, so these never change with PYTHONHASHSEED or the machine
+    assert [shard_of(zip_code, 4) for zip_code in ZIP_CODES] == [3, 2, 3, 2]
+    assert [shard_of(zip_code, 7) for zip_code in ZIP_CODES] == [5, 4, 7, 6]
+
+
+def test_shards_partition_the_zip_codes():
+    zip_codes = [f"{number:05d}" for number in range(500)]
+    shards = [select_shard(zip_codes, (index, 3)) for index in range(1, 4)]
+
+    assert sorted(sum(shards, [])) == zip_codes
+    assert all(shard == sorted(shard) for shard in shards)
+
+
+def test_parse_shard_rejects_bad_values():
+    assert parse_shard("2/4") == (2, 4)
+    for value in ("0/4", "5/4", "x", "1/0"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+
+def test_merge_sums_counters_and_reports_missing_shards(tmp_path):
+    started_at = datetime.utcnow()
+    paths = [
+        write_summary((1, 3), "api", started_at, directory=str(tmp_path), zipCodes=10, successful=9, failed=1, cars=90),
+        write_summary((3, 3), "api", started_at, directory=str(tmp_path), zipCodes=5, successful=5, cars=40),
+    ]
+    with open(paths[1]) as f:
+        summary = json.load(f)
+    summary["elapsedSeconds"] = 120
+    with open(paths[1], "w") as f:
+        json.dump(summary, f)
+
+    merged = merge_summaries(paths)
+    assert (merged["zipCodes"], merged["successful"], merged["failed"], merged["cars"]) == (15, 14, 1, 130)
+    assert merged["missingShards"] == [2]
+    assert merged["elapsedSeconds"] == 120
+    assert [summary["shard"] for summary in merged["perShard"]] == ["1/3", "3/3"]
+
+
+def test_merge_refuses_mixed_shard_counts(tmp_path):
+    started_at = datetime.utcnow()
+    paths = [write_summary((1, 2), "api", started_at, directory=str(tmp_path)),
+             write_summary((1, 3), "api", started_at, directory=str(tmp_path))]
+    with pytest.raises(ValueError):
+        merge_summaries(paths)
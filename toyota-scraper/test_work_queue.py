@@ -0,0 +1,83 @@
+"""
+Tests for the leased work queue (on mongomock)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from work_queue import DONE, FAILED, LEASED, QUEUED, LeaseHeartbeat, LeaseLostError, WorkQueue
+
+
+@pytest.fixture
+def work_queue(db_manager):
+    return WorkQueue(db_manager.db, lease_seconds=60, max_attempts=2)
+
+
+def expire_lease(work_queue, zip_code):
+    work_queue.collection.update_one({'_id': zip_code},
+                                     {'$set': {'leaseExpiresAt': datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_claims_follow_priority_and_lease_each_job_once(work_queue):
+    work_queue.enqueue(["78712", "10001", "90210"])
+
+    assert [work_queue.claim("a"), work_queue.claim("b"), work_queue.claim("a")] == ["78712", "10001", "90210"]
+    assert work_queue.claim("b") is None
+    assert work_queue.counts()[LEASED] == 3
+
+
+def test_expired_lease_is_claimed_again_and_the_old_owner_loses_it(work_queue):
+    work_queue.enqueue(["78712"])
+    assert work_queue.claim("a") == "78712"
+    assert work_queue.claim("b") is None
+
+    expire_lease(work_queue, "78712")
+    assert work_queue.claim("b") == "78712"
+    assert not work_queue.heartbeat("78712", "a")
+    assert not work_queue.complete("78712", "a", cars=3)
+
+    assert work_queue.complete("78712", "b", cars=3)
+    job = work_queue.collection.find_one({'_id': "78712"})
+    assert (job['status'], job['attempts'], job['cars']) == (DONE, 2, 3)
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_job(work_queue):
+    work_queue.enqueue(["78712"])
+    for worker in ("a", "b"):
+        assert work_queue.claim(worker) == "78712"
+        expire_lease(work_queue, "78712")
+
+    assert work_queue.claim("c") is None
+    assert work_queue.collection.find_one({'_id': "78712"})['status'] == FAILED
+
+
+def test_retryable_failure_goes_back_into_the_queue(work_queue):
+    work_queue.enqueue(["78712"])
+    work_queue.claim("a")
+    assert work_queue.fail("78712", "a", "could not store data", retry=True)
+    assert work_queue.collection.find_one({'_id': "78712"})['status'] == QUEUED
+
+    work_queue.claim("a")
+    work_queue.fail("78712", "a", "could not store data", retry=True)
+    assert work_queue.collection.find_one({'_id': "78712"})['status'] == FAILED
+
+
+def test_enqueue_leaves_leased_jobs_alone(work_queue):
+    work_queue.enqueue(["78712", "10001"])
+    work_queue.claim("a")
+
+    assert work_queue.enqueue(["78712", "10001"]) == 1
+    assert work_queue.collection.find_one({'_id': "78712"})['leaseOwner'] == "a"
+
+
+def test_heartbeat_notices_a_lost_lease(work_queue):
+    work_queue.lease_seconds = 0.03
+    work_queue.enqueue(["78712"])
+    work_queue.claim("a")
+    expire_lease(work_queue, "78712")
+    work_queue.claim("b")
+
+    with LeaseHeartbeat(work_queue, "78712", "a") as lease:
+        lease._thread.join(timeout=1)
+        with pytest.raises(LeaseLostError):
+            lease.check()
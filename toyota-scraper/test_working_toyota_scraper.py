@@ -0,0 +1,118 @@
+"""
+Tests for the GraphQL batching planners
+"""
+import pytest
+
+from working_toyota_scraper import BatchRejectedError, ToyotaInventoryAPI
+
+
+def inventory_page(zip_code, page, count, total=None):
+    vehicles = [{"vin": f"{zip_code}-{page}-{index}", "model": "Camry"} for index in range(count)]
+    return {"data": {"searchInventory": {"totalCount": total, "vehicles": vehicles}}}
+
+
+def run_rounds(api, zip_codes, answer, limit=2, max_pages=10, window=None):
+    """Drive inventory_rounds with answer(key) -> page, returning the fetched rounds and the events"""
+    rounds = api.inventory_rounds(zip_codes, limit, max_pages, window)
+    fetched, events, reply = [], [], None
+    while True:
+        try:
+            event = rounds.send(reply)
+        except StopIteration:
+            return fetched, events
+        if event[0] == 'fetch':
+            fetched.append(event[1])
+            reply = ({key: answer(key) for key in event[1]}, {})
+        else:
+            events.append(event)
+            reply = None
+
+
+@pytest.fixture
+def api():
+    return ToyotaInventoryAPI()
+
+
+def test_split_batch_response_by_alias(api):
+    keys = [("78712", 1), ("10001", 1)]
+    data = {"data": {"q0": {"totalCount": 1, "vehicles": []}, "q1": None}}
+
+    split = api.split_batch_response(data, keys)
+    assert split[keys[0]] == {"data": {"searchInventory": {"totalCount": 1, "vehicles": []}}}
+    assert split[keys[1]] is None
+
+
+def test_split_batch_response_without_data_is_a_rejection(api):
+    with pytest.raises(BatchRejectedError, match="too complex"):
+        api.split_batch_response({"data": None, "errors": [{"message": "query too complex"}]}, [("78712", 1)])
+
+
+def test_rounds_fetch_first_pages_then_the_rest(api):
+    totals = {"78712": 5, "10001": 1}
+    fetched, events = run_rounds(api, ["78712", "10001"], lambda key: inventory_page(*key, 2, totals[key[0]]))
+
+    assert fetched == [[("78712", 1), ("10001", 1)], [("78712", 2), ("78712", 3)]]
+    assert ('done', "10001", None) in events
+    vins = [vehicle["vin"] for event in events if event[0] == 'vehicles' and event[1] == "78712" for vehicle in event[2]]
+    assert len(vins) == 6
+    assert events[-1] == ('done', "78712", None)
+
+
+def test_rounds_walk_until_a_short_page(api):
+    counts = {1: 2, 2: 2, 3: 1}
+    fetched, events = run_rounds(api, ["78712"], lambda key: inventory_page(*key, counts[key[1]]))
+
+    assert fetched == [[("78712", 1)], [("78712", 2)], [("78712", 3)]]
+    assert events[-1] == ('done', "78712", None)
+
+
+def test_rounds_stop_on_a_repeated_page(api):
+    fetched, events = run_rounds(api, ["78712"], lambda key: inventory_page(key[0], 1, 2))
+
+    assert len(fetched) == 2
+    assert sum(len(event[2]) for event in events if event[0] == 'vehicles') == 2
+
+
+def test_rounds_report_failed_pages(api):
+    rounds = api.inventory_rounds(["78712"], 2, 10)
+    assert next(rounds) == ('fetch', [("78712", 1)])
+    assert rounds.send(({}, {("78712", 1): "HTTPError: 503"})) == ('done', "78712", "HTTPError: 503")
+
+
+def test_page_plan_shrinks_rejected_batches_and_retries_failed_aliases(api):
+    api.batch_size = 4
+    keys = [("78712", page) for page in range(1, 5)]
+    plan = api.page_plan(keys)
+
+    assert next(plan) == [keys]
+    assert plan.send([BatchRejectedError("too large")]) == [keys[:2], keys[2:]]
+    assert api.batch_size == 2
+
+    answer = {key: inventory_page(*key, 1) for key in keys}
+    retry = plan.send([{keys[0]: answer[keys[0]], keys[1]: None}, {key: answer[key] for key in keys[2:]}])
+    assert retry == [[keys[1]]]
+
+    with pytest.raises(StopIteration) as done:
+        plan.send([answer[keys[1]]])
+    pages, errors = done.value.value
+    assert pages == answer and errors == {}
+
+
+def test_page_plan_records_other_failures(api):
+    api.batch_size = 2
+    keys = [("78712", 1), ("10001", 1)]
+    plan = api.page_plan(keys)
+
+    next(plan)
+    with pytest.raises(StopIteration) as done:
+        plan.send([ConnectionError("reset")])
+    assert done.value.value == ({}, {key: "ConnectionError: reset" for key in keys})
+
+
+def test_rounds_request_pages_a_window_at_a_time(api):
+    # The third page repeats the second, so the pages after it are never requested
+    answer = lambda key: inventory_page(key[0], min(key[1], 2), 2, 20)
+    fetched, events = run_rounds(api, ["78712"], answer, window=3)
+
+    assert fetched == [[("78712", 1)], [("78712", 2), ("78712", 3), ("78712", 4)]]
+    assert events[-1] == ('done', "78712", None)
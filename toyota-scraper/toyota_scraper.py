@@ -7,19 +7,227 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-import time
-import re
+import os
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Dict, Any, Optional, Set
+from card_parser import CARD_SELECTORS, FIELD_SPECS, CardParser, PagePayload, record_from_candidates, vehicle_key
 from config import Config
+from lean_profile import LeanProfile
+from location_primer import get_primer, search_url_for
+from rate_limiter import get_rate_limiter
+from retry import RetryableError, RetryPolicy, ScrapeFailed
+from network_capture import InventoryCapture
+from selector_registry import any_element, get_registry, is_clickable, is_visible
+from waits import PageWaiter, all_of, any_of, dom_settled, element_gone, element_present, network_idle
+
+# Candidate selectors per page role, in their default priority order
+POPUP_SELECTORS = [
+    # Modal/popup containers
+    (By.CSS_SELECTOR, ".modal"),
+    (By.CSS_SELECTOR, ".popup"),
+    (By.CSS_SELECTOR, ".zip-popup"),
+    (By.CSS_SELECTOR, ".location-popup"),
+    (By.CSS_SELECTOR, "[data-testid*='modal']"),
+    (By.CSS_SELECTOR, "[data-testid*='popup']"),
+    (By.CSS_SELECTOR, ".overlay"),
+    (By.CSS_SELECTOR, ".dialog"),
+    
+    # Specific Toyota selectors
+    (By.CSS_SELECTOR, ".toyota-modal"),
+    (By.CSS_SELECTOR, ".location-modal"),
+    (By.CSS_SELECTOR, ".zip-modal"),
+    (By.CSS_SELECTOR, "[class*='modal']"),
+    (By.CSS_SELECTOR, "[class*='popup']"),
+    (By.CSS_SELECTOR, "[class*='overlay']"),
+]
+
+ZIP_INPUT_SELECTORS = [
+    (By.CSS_SELECTOR, "input[placeholder*='ZIP']"),
+    (By.CSS_SELECTOR, "input[placeholder*='zip']"),
+    (By.CSS_SELECTOR, "input[name*='zip']"),
+    (By.CSS_SELECTOR, "input[id*='zip']"),
+    (By.CSS_SELECTOR, "input[data-testid*='zip']"),
+    (By.CSS_SELECTOR, "input[type='text']"),
+]
+
+SEARCH_ZIP_INPUT_SELECTORS = ZIP_INPUT_SELECTORS[:-1] + [
+    (By.CSS_SELECTOR, ".zip-input input"),
+    (By.CSS_SELECTOR, ".location-input input"),
+    (By.CSS_SELECTOR, "input[type='text']"),
+]
+
+POPUP_BUTTON_SELECTORS = [
+    (By.CSS_SELECTOR, "button[type='submit']"),
+    (By.XPATH, ".//button[contains(text(), 'Continue')]"),
+    (By.XPATH, ".//button[contains(text(), 'Submit')]"),
+    (By.XPATH, ".//button[contains(text(), 'Search')]"),
+    (By.XPATH, ".//button[contains(text(), 'OK')]"),
+    (By.XPATH, ".//button[contains(text(), 'Go')]"),
+    (By.CSS_SELECTOR, ".btn"),
+    (By.CSS_SELECTOR, ".button"),
+    (By.CSS_SELECTOR, "[data-testid*='submit']"),
+    (By.CSS_SELECTOR, "[data-testid*='continue']"),
+]
+
+SEARCH_BUTTON_SELECTORS = [
+    (By.CSS_SELECTOR, "button[type='submit']"),
+    (By.CSS_SELECTOR, "button[data-testid*='search']"),
+    (By.XPATH, "//button[contains(text(), 'Search')]"),
+    (By.CSS_SELECTOR, ".search-button"),
+    (By.CSS_SELECTOR, ".btn-search"),
+    (By.CSS_SELECTOR, "input[type='submit']"),
+]
+
+VEHICLE_CARD_SELECTORS = [(By.CSS_SELECTOR, selector) for selector in CARD_SELECTORS]
+
+NEXT_PAGE_SELECTORS = [
+    (By.CSS_SELECTOR, "button[aria-label*='Next']"),
+    (By.CSS_SELECTOR, "a[aria-label*='Next']"),
+    (By.CSS_SELECTOR, "[data-testid*='next']"),
+    (By.CSS_SELECTOR, ".pagination .next"),
+    (By.XPATH, "//button[contains(., 'Next')]"),
+    (By.XPATH, "//a[contains(., 'Next')]"),
+    (By.XPATH, "//button[contains(., 'Load More')]"),
+    (By.XPATH, "//button[contains(., 'Show More')]"),
+]
+
+NO_RESULTS_SELECTORS = [
+    (By.XPATH, "//*[contains(text(), 'No vehicles found')]"),
+    (By.XPATH, "//*[contains(text(), 'No inventory found')]"),
+    (By.XPATH, "//*[contains(text(), 'No results')]"),
+]
+
+# Returns [card selector, outerHTML of the smallest element holding every card] for the first selector
+# that matches, or null when no selector matches anything
+RESULTS_CONTAINER_JS = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var cards = document.querySelectorAll(selectors[i]);
+    if (!cards.length) continue;
+    var container = cards[0].parentElement || document.body;
+    for (var j = 1; j < cards.length; j++) {
+        while (container.parentElement && !container.contains(cards[j])) container = container.parentElement;
+    }
+    return [selectors[i], container.outerHTML];
+}
+return null;
+"""
+
+# Returns [card selector, rows] for the first card selector that matches, or null. Each row holds, per field,
+# the stripped text (or attribute) of the first element matching each candidate selector, plus the year
+# found in the card's text or attributes; Python applies the same parsing rules as for HTML.
+EXTRACT_CARDS_JS = """
+var cardSelectors = arguments[0], fields = arguments[1];
+var yearPattern = /\\b(20\\d{2})\\b/;
+function strippedText(element, separator) {
+    var walker = document.createTreeWalker(element, NodeFilter.SHOW_TEXT), parts = [], node;
+    while ((node = walker.nextNode())) {
+        var text = node.nodeValue.trim();
+        if (text) parts.push(text);
+    }
+    return parts.join(separator);
+}
+function attributeYear(card) {
+    var elements = card.querySelectorAll('*');
+    for (var i = 0; i < elements.length; i++) {
+        for (var j = 0; j < elements[i].attributes.length; j++) {
+            var match = yearPattern.exec(elements[i].attributes[j].value);
+            if (match) return match[1];
+        }
+    }
+    return null;
+}
+for (var i = 0; i < cardSelectors.length; i++) {
+    var cards = document.querySelectorAll(cardSelectors[i]);
+    if (!cards.length) continue;
+    var rows = [];
+    for (var c = 0; c < cards.length; c++) {
+        var card = cards[c], candidates = {};
+        for (var f = 0; f < fields.length; f++) {
+            var name = fields[f][0], selectors = fields[f][1], attribute = fields[f][2], values = [];
+            for (var s = 0; s < selectors.length; s++) {
+                var element = card.querySelector(selectors[s]);
+                values.push(!element ? null : attribute ? element.getAttribute(attribute) : strippedText(element, ''));
+            }
+            candidates[name] = values;
+        }
+        var year = yearPattern.exec(strippedText(card, ' '));
+        rows.push({candidates: candidates, year: year ? year[1] : attributeYear(card)});
+    }
+    return [cardSelectors[i], rows];
+}
+return null;
+"""
+
+# Returns one key per card for the first card selector that matches (its VIN, else its first link, else its
+# text), or [] when none matches; enough to tell whether a page holds cards not seen before
+CARD_KEYS_JS = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var cards = document.querySelectorAll(selectors[i]);
+    if (!cards.length) continue;
+    var keys = [];
+    for (var c = 0; c < cards.length; c++) {
+        var card = cards[c];
+        var vin = card.matches('[data-vin]') ? card : card.querySelector('[data-vin]');
+        var link = card.querySelector('a[href]');
+        keys.push(vin ? 'vin:' + vin.getAttribute('data-vin')
+                  : link ? 'url:' + link.href : 'text:' + card.textContent.replace(/\\s+/g, ' ').trim());
+    }
+    return keys;
+}
+return [];
+"""
+
+# Returns the ZIP code the page is showing: the first 5-digit value of a ZIP input, else arguments[1] when the
+# page text mentions it, else null
+ACTIVE_ZIP_JS = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+    var inputs = document.querySelectorAll(selectors[i]);
+    for (var n = 0; n < inputs.length; n++) {
+        var match = (inputs[n].value || '').match(/\\b\\d{5}\\b/);
+        if (match) return match[0];
+    }
+}
+var text = document.body ? document.body.innerText : '';
+return text.indexOf(arguments[1]) >= 0 ? arguments[1] : null;
+"""
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def get_chromedriver_path() -> str:
+    """Resolve the ChromeDriver binary once per process, even when several drivers start at once"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
 
 class ToyotaInventoryScraper:
-    def __init__(self):
+    def __init__(self, lean_page: Optional[bool] = None, performance_log: Optional[bool] = None,
+                 profile_slot: Optional[int] = None):
+        self.lean_profile = LeanProfile() if (Config.LEAN_PAGE if lean_page is None else lean_page) else None
+        self.performance_log = Config.EXTRACTION_MODE == 'network' if performance_log is None else performance_log
+        self.profile_dir = None
+        if Config.CHROME_USER_DATA_DIR:
+            # Each concurrent browser needs its own profile directory
+            self.profile_dir = os.path.abspath(Config.CHROME_USER_DATA_DIR)
+            if profile_slot is not None:
+                self.profile_dir = os.path.join(self.profile_dir, f"worker-{profile_slot}")
+        self.location = get_primer()
+        self.rate_limiter = get_rate_limiter()
+        self.retry = RetryPolicy()
         self.driver = None
         self.wait = None
+        self.waiter = None
+        self.network_capture = None
+        self.selectors = get_registry()
+        self.card_parser = CardParser()
         self.setup_driver()
     
     def setup_driver(self):
@@ -36,24 +244,35 @@ class ToyotaInventoryScraper:
         chrome_options.add_argument('--window-size=1920,1080')
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
         
+        # Reuse a persistent profile so the site's cookies and storage survive restarts
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            chrome_options.add_argument(f'--user-data-dir={self.profile_dir}')
+        
         # Disable popup blocking and allow all popups
         chrome_options.add_argument('--disable-popup-blocking')
         chrome_options.add_argument('--disable-web-security')
         chrome_options.add_argument('--allow-running-insecure-content')
         
-        # Disable images and CSS for faster loading (commented out for debugging)
-        # prefs = {
-        #     "profile.managed_default_content_settings.images": 2,
-        #     "profile.default_content_setting_values.stylesheets": 2
-        # }
-        # chrome_options.add_experimental_option("prefs", prefs)
+        # Record DevTools network events so inventory JSON can be read from XHR responses
+        if self.performance_log:
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        
+        # Skip images, fonts, media and trackers the scraper never looks at
+        if self.lean_profile:
+            self.lean_profile.apply_prefs(chrome_options)
         
         try:
-            service = Service(ChromeDriverManager().install())
+            service = Service(get_chromedriver_path())
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.driver.set_page_load_timeout(Config.PAGE_LOAD_TIMEOUT)
             self.driver.implicitly_wait(Config.IMPLICIT_WAIT)
+            if self.lean_profile:
+                self.lean_profile.apply(self.driver)
             self.wait = WebDriverWait(self.driver, 10)
+            self.waiter = PageWaiter(self.driver)
+            if Config.EXTRACTION_MODE == 'network':
+                self.network_capture = InventoryCapture(self.driver)
             print("Chrome driver setup successful")
         except Exception as e:
             print(f"Error setting up Chrome driver: {e}")
@@ -63,11 +282,17 @@ class ToyotaInventoryScraper:
         """Navigate to Toyota search inventory page"""
         try:
             print(f"Navigating to {Config.TOYOTA_SEARCH_URL}")
+            self.rate_limiter.acquire(Config.TOYOTA_SEARCH_URL)
             self.driver.get(Config.TOYOTA_SEARCH_URL)
             
             # Wait for page to load
             self.wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-            time.sleep(3)  # Additional wait for dynamic content
+            
+            # Wait for dynamic content: the ZIP popup shows up or the network goes quiet
+            self.waiter.until(
+                any_of(element_present(self.selectors, "popup", POPUP_SELECTORS, is_visible), network_idle()),
+                "search page render", budget=3
+            )
             
             # Check for and handle ZIP code popup
             if self.handle_zip_popup():
@@ -90,80 +315,29 @@ class ToyotaInventoryScraper:
         try:
             print("Checking for ZIP code popup...")
             
-            # Common popup selectors for ZIP code prompts
-            popup_selectors = [
-                # Modal/popup containers
-                ".modal",
-                ".popup", 
-                ".zip-popup",
-                ".location-popup",
-                "[data-testid*='modal']",
-                "[data-testid*='popup']",
-                ".overlay",
-                ".dialog",
-                
-                # Specific Toyota selectors
-                ".toyota-modal",
-                ".location-modal",
-                ".zip-modal",
-                "[class*='modal']",
-                "[class*='popup']",
-                "[class*='overlay']"
-            ]
-            
-            # Wait a bit for popup to appear
-            time.sleep(2)
+            # Wait for popup to appear, or for the page to settle without one
+            self.waiter.until(
+                any_of(element_present(self.selectors, "popup", POPUP_SELECTORS, is_visible), dom_settled()),
+                "ZIP popup", budget=2
+            )
             
             # Look for popup/modal elements
-            popup_element = None
-            for selector in popup_selectors:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    for element in elements:
-                        if element.is_displayed():
-                            popup_element = element
-                            print(f"Found popup with selector: {selector}")
-                            break
-                    if popup_element:
-                        break
-                except:
-                    continue
-            
+            popup_element, selector = self.selectors.find(self.driver, "popup", POPUP_SELECTORS, timeout=0)
             if not popup_element:
                 print("No ZIP code popup found")
                 return False
-            
-            # Look for ZIP code input within the popup
-            zip_input_selectors = [
-                "input[placeholder*='ZIP']",
-                "input[placeholder*='zip']",
-                "input[name*='zip']",
-                "input[id*='zip']",
-                "input[data-testid*='zip']",
-                "input[type='text']"
-            ]
-            
-            zip_input = None
-            for selector in zip_input_selectors:
-                try:
-                    # Look within the popup element first
-                    zip_input = popup_element.find_element(By.CSS_SELECTOR, selector)
-                    if zip_input and zip_input.is_displayed():
-                        print(f"Found ZIP input in popup with selector: {selector}")
-                        break
-                except:
-                    continue
-            
-            # If not found in popup, look globally
-            if not zip_input:
-                for selector in zip_input_selectors:
-                    try:
-                        zip_input = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if zip_input and zip_input.is_displayed():
-                            print(f"Found ZIP input globally with selector: {selector}")
-                            break
-                    except:
-                        continue
+            print(f"Found popup with selector: {selector[1]}")
+            
+            # Look for ZIP code input within the popup first, then globally
+            zip_input, selector = self.selectors.find(
+                self.driver, "popup_zip_input", ZIP_INPUT_SELECTORS, context=popup_element, timeout=0
+            )
+            if zip_input:
+                print(f"Found ZIP input in popup with selector: {selector[1]}")
+            else:
+                zip_input, selector = self.selectors.find(self.driver, "zip_input", ZIP_INPUT_SELECTORS)
+                if zip_input:
+                    print(f"Found ZIP input globally with selector: {selector[1]}")
             
             if not zip_input:
                 print("No ZIP code input found in popup")
@@ -176,38 +350,12 @@ class ToyotaInventoryScraper:
             print(f"Entered default ZIP code: {default_zip}")
             
             # Look for submit/continue button in popup
-            button_selectors = [
-                "button[type='submit']",
-                "button:contains('Continue')",
-                "button:contains('Submit')",
-                "button:contains('Search')",
-                "button:contains('OK')",
-                "button:contains('Go')",
-                ".btn",
-                ".button",
-                "[data-testid*='submit']",
-                "[data-testid*='continue']"
-            ]
-            
-            submit_button = None
-            for selector in button_selectors:
-                try:
-                    if ":contains" in selector:
-                        # Use XPath for text-based search
-                        text_content = selector.split(":contains")[1].strip("'\"")
-                        xpath = f"//button[contains(text(), '{text_content}')]"
-                        submit_button = self.driver.find_element(By.XPATH, xpath)
-                    else:
-                        # Look within popup first
-                        submit_button = popup_element.find_element(By.CSS_SELECTOR, selector)
-                    
-                    if submit_button and submit_button.is_displayed():
-                        print(f"Found submit button with selector: {selector}")
-                        break
-                except:
-                    continue
+            submit_button, selector = self.selectors.find(
+                self.driver, "popup_submit_button", POPUP_BUTTON_SELECTORS, context=popup_element, timeout=0
+            )
             
             if submit_button:
+                print(f"Found submit button with selector: {selector[1]}")
                 submit_button.click()
                 print("Clicked submit button in popup")
             else:
@@ -217,7 +365,7 @@ class ToyotaInventoryScraper:
                 print("Pressed Enter on ZIP input")
             
             # Wait for popup to close
-            time.sleep(2)
+            self.waiter.until(element_gone(popup_element), "popup dismissal", budget=2)
             
             # Check if popup is still visible
             try:
@@ -240,70 +388,51 @@ class ToyotaInventoryScraper:
             print(f"Searching for inventory in ZIP code: {zip_code}")
             
             # First, try to find and update the existing ZIP code input (if popup was handled)
-            # Look for any visible ZIP input fields
-            zip_input_selectors = [
-                "input[placeholder*='ZIP']",
-                "input[placeholder*='zip']", 
-                "input[name*='zip']",
-                "input[id*='zip']",
-                "input[data-testid*='zip']",
-                ".zip-input input",
-                ".location-input input",
-                "input[type='text']"
-            ]
-            
-            zip_input = None
-            for selector in zip_input_selectors:
-                try:
-                    zip_input = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, selector)))
-                    print(f"Found ZIP input with selector: {selector}")
-                    break
-                except TimeoutException:
-                    continue
+            zip_input, selector = self.selectors.find(
+                self.driver, "zip_input", SEARCH_ZIP_INPUT_SELECTORS, predicate=is_clickable
+            )
             
             if not zip_input:
                 print("Could not find ZIP code input field")
                 return False
+            print(f"Found ZIP input with selector: {selector[1]}")
+            
+            # Forget responses from earlier searches (e.g. the popup's default ZIP)
+            if self.network_capture:
+                self.network_capture.reset()
             
             # Clear and enter ZIP code
             zip_input.clear()
             zip_input.send_keys(zip_code)
             
             # Find and click search button
-            search_button_selectors = [
-                "button[type='submit']",
-                "button[data-testid*='search']",
-                "button:contains('Search')",
-                ".search-button",
-                ".btn-search",
-                "input[type='submit']"
-            ]
-            
-            search_button = None
-            for selector in search_button_selectors:
-                try:
-                    if ":contains" in selector:
-                        # Use XPath for text-based search
-                        xpath = f"//button[contains(text(), 'Search')]"
-                        search_button = self.driver.find_element(By.XPATH, xpath)
-                    else:
-                        search_button = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    print(f"Found search button with selector: {selector}")
-                    break
-                except NoSuchElementException:
-                    continue
+            search_button, selector = self.selectors.find(
+                self.driver, "search_button", SEARCH_BUTTON_SELECTORS, timeout=0
+            )
             
+            # Submitting the search loads a new result set: one request against the host's budget
+            self.rate_limiter.acquire(Config.TOYOTA_SEARCH_URL)
             if not search_button:
                 # Try pressing Enter on the input field
                 from selenium.webdriver.common.keys import Keys
                 zip_input.send_keys(Keys.RETURN)
                 print("Pressed Enter on ZIP input field")
             else:
+                print(f"Found search button with selector: {selector[1]}")
                 search_button.click()
                 print("Clicked search button")
             
-            # Wait for results to load
-            time.sleep(5)
+            # Wait for result cards (or a "no results" message) and for the list to stop changing
+            self.waiter.until(
+                all_of(
+                    any_of(
+                        element_present(self.selectors, "result_card", VEHICLE_CARD_SELECTORS),
+                        element_present(self.selectors, "no_results", NO_RESULTS_SELECTORS)
+                    ),
+                    dom_settled(CARD_SELECTORS)
+                ),
+                "inventory results", budget=5
+            )
             
             # Check if results loaded
             if self.has_inventory_results():
@@ -317,43 +446,86 @@ class ToyotaInventoryScraper:
             print(f"Error searching by ZIP code {zip_code}: {e}")
             return False
     
+    def load_results_directly(self, zip_code: str) -> Optional[bool]:
+        """
+        Open the search URL for a ZIP with the location pre-set, skipping the popup and search form.
+        Returns True/False when the page showed results/no results, or None if the regular flow is needed.
+        """
+        if not self.location.ready or not self.location.prime(self.driver, zip_code):
+            return None
+        
+        try:
+            url = search_url_for(zip_code)
+            print(f"Navigating directly to {url}")
+            if self.network_capture:
+                self.network_capture.reset()
+            self.rate_limiter.acquire(url)
+            self.driver.get(url)
+            
+            self.waiter.until(
+                all_of(
+                    any_of(
+                        element_present(self.selectors, "result_card", VEHICLE_CARD_SELECTORS),
+                        element_present(self.selectors, "no_results", NO_RESULTS_SELECTORS),
+                        element_present(self.selectors, "popup", POPUP_SELECTORS, is_visible)
+                    ),
+                    dom_settled(CARD_SELECTORS)
+                ),
+                "direct results", budget=12
+            )
+            
+            popup, _ = self.selectors.probe(self.driver, "popup", POPUP_SELECTORS, predicate=is_visible)
+            if popup:
+                print("Location popup still shown, falling back to the search form")
+                return None
+            
+            # A stale location cookie would show another ZIP code's results under this one
+            active_zip = self.page_zip_code(zip_code)
+            if active_zip != zip_code:
+                print(f"Page shows ZIP {active_zip or 'unknown'} instead of {zip_code}, falling back to the search form")
+                return None
+            
+            if self.has_inventory_results():
+                print(f"Successfully loaded inventory for ZIP {zip_code} without the popup")
+                return True
+            
+            no_results, _ = self.selectors.probe(self.driver, "no_results", NO_RESULTS_SELECTORS)
+            return False if no_results else None
+            
+        except TimeoutException:
+            print(f"Timeout loading results directly for ZIP {zip_code}")
+            return None
+    
+    def page_zip_code(self, zip_code: str) -> Optional[str]:
+        """
+        ZIP code the page is showing: the ZIP input's value, else zip_code when the page echoes it.
+        None when neither tells, which the direct load treats as a mismatch.
+        """
+        # Leaves out the catch-all text input, which could be any field on the results page
+        input_selectors = [selector for _, selector in self.selectors.order("zip_input", ZIP_INPUT_SELECTORS[:-1])]
+        try:
+            return self.driver.execute_script(ACTIVE_ZIP_JS, input_selectors, zip_code)
+        except WebDriverException as e:
+            print(f"Could not read the page's ZIP code: {e}")
+            return None
+    
     def has_inventory_results(self) -> bool:
         """Check if inventory results are displayed"""
         try:
             # Look for common result indicators
-            result_indicators = [
-                ".vehicle-listing",
-                ".inventory-item",
-                ".car-card",
-                ".vehicle-card",
-                "[data-testid*='vehicle']",
-                ".result-item"
-            ]
-            
-            for indicator in result_indicators:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, indicator)
-                    if elements:
-                        print(f"Found {len(elements)} inventory items")
-                        return True
-                except:
-                    continue
+            elements, _ = self.selectors.find(
+                self.driver, "result_card", VEHICLE_CARD_SELECTORS, predicate=any_element, timeout=0, find_all=True
+            )
+            if elements:
+                print(f"Found {len(elements)} inventory items")
+                return True
             
             # Also check for "no results" messages
-            no_results_indicators = [
-                "text()='No vehicles found'",
-                "text()='No inventory found'",
-                "text()='No results'"
-            ]
-            
-            for indicator in no_results_indicators:
-                try:
-                    element = self.driver.find_element(By.XPATH, f"//*[contains({indicator})]")
-                    if element:
-                        print("Found 'no results' message")
-                        return False
-                except:
-                    continue
+            element, _ = self.selectors.find(
+                self.driver, "no_results", NO_RESULTS_SELECTORS, predicate=any_element, timeout=0
+            )
+            if element:
+                print("Found 'no results' message")
             
             return False
             
@@ -361,167 +533,357 @@ class ToyotaInventoryScraper:
             print(f"Error checking for inventory results: {e}")
             return False
     
+    def capture_page(self) -> PagePayload:
+        """
+        What the current page yields before any HTML parsing: ('cars', records, []) when the network log or
+        the in-browser extractor already produced records, otherwise ('html', html, card selectors to try)
+        """
+        if self.network_capture:
+            car_data = self.network_capture.collect()
+            if car_data:
+                print(f"Captured {len(car_data)} vehicles from inventory XHR responses")
+                return 'cars', car_data, []
+            print("No inventory responses captured, falling back to page parsing")
+        
+        card_selectors = [selector for _, selector in self.selectors.order("result_card", VEHICLE_CARD_SELECTORS)]
+        if Config.EXTRACTION_MODE == 'js':
+            car_data = self.extract_cards_in_browser(card_selectors)
+            if car_data is not None:
+                return 'cars', car_data, []
+        
+        page_source = None
+        if Config.EXTRACTION_MODE == 'scoped':
+            scoped = self.results_container_html(card_selectors)
+            if scoped is False:
+                return 'cars', [], []
+            if scoped:
+                selector, page_source = scoped
+                card_selectors = [selector]
+        if page_source is None:
+            page_source = self.driver.page_source
+        if Config.HTML_FIXTURE_DIR:
+            self.save_fixture(page_source)
+        return 'html', page_source, card_selectors
+    
+    def parse_page(self, payload: PagePayload) -> List[Dict[str, Any]]:
+        """Car records from a captured page"""
+        kind, content, card_selectors = payload
+        if kind == 'cars':
+            if not content:
+                print("No vehicle elements found with any selector")
+            return content
+        
+        # Parse once, then try the card selectors best known first, all in a single walk
+        root = self.card_parser.backend.parse(content)
+        selector, vehicles = self.card_parser.find_cards(root, card_selectors)
+        
+        if not vehicles:
+            print("No vehicle elements found with any selector")
+            return []
+        print(f"Found {len(vehicles)} vehicles with selector: {selector} ({self.card_parser.backend.name} parser)")
+        
+        scraped_data = []
+        for vehicle in vehicles:
+            car_data = self.extract_vehicle_data(vehicle)
+            if car_data:
+                scraped_data.append(car_data)
+        
+        print(f"Successfully scraped {len(scraped_data)} vehicles")
+        return scraped_data
+    
     def scrape_inventory_data(self) -> List[Dict[str, Any]]:
         """Scrape vehicle data from the current page"""
         try:
             print("Scraping inventory data...")
-            
-            # Get page source and parse with BeautifulSoup
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Try multiple selectors for vehicle listings
-            vehicle_selectors = [
-                ".vehicle-listing",
-                ".inventory-item", 
-                ".car-card",
-                ".vehicle-card",
-                "[data-testid*='vehicle']",
-                ".result-item",
-                ".vehicle-result"
-            ]
-            
-            vehicles = []
-            for selector in vehicle_selectors:
-                vehicle_elements = soup.select(selector)
-                if vehicle_elements:
-                    print(f"Found {len(vehicle_elements)} vehicles with selector: {selector}")
-                    vehicles = vehicle_elements
-                    break
-            
-            if not vehicles:
-                print("No vehicle elements found with any selector")
-                return []
-            
-            scraped_data = []
-            for vehicle in vehicles:
-                try:
-                    car_data = self.extract_vehicle_data(vehicle)
-                    if car_data:
-                        scraped_data.append(car_data)
-                except Exception as e:
-                    print(f"Error extracting vehicle data: {e}")
-                    continue
-            
-            print(f"Successfully scraped {len(scraped_data)} vehicles")
-            return scraped_data
-            
+            return self.parse_page(self.capture_page())
         except Exception as e:
             print(f"Error scraping inventory data: {e}")
             return []
     
-    def extract_vehicle_data(self, vehicle_element) -> Optional[Dict[str, Any]]:
-        """Extract data from a single vehicle element"""
+    def extract_cards_in_browser(self, card_selectors: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Car records read by one in-page script, so no HTML crosses the WebDriver wire; None if the script failed"""
         try:
-            car_data = {}
-            
-            # Extract model and trim
-            model_selectors = ['.model', '.vehicle-model', '.car-model', 'h3', 'h2', '.title']
-            for selector in model_selectors:
-                model_elem = vehicle_element.select_one(selector)
-                if model_elem:
-                    model_text = model_elem.get_text(strip=True)
-                    car_data['model'] = model_text
-                    break
-            
-            # Extract year
-            year_match = re.search(r'\b(20\d{2})\b', str(vehicle_element))
-            if year_match:
-                car_data['year'] = int(year_match.group(1))
-            
-            # Extract price
-            price_selectors = ['.price', '.vehicle-price', '.car-price', '[class*="price"]']
-            for selector in price_selectors:
-                price_elem = vehicle_element.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    price_match = re.search(r'\$?([\d,]+)', price_text)
-                    if price_match:
-                        car_data['price'] = int(price_match.group(1).replace(',', ''))
-                        break
-            
-            # Extract dealer name
-            dealer_selectors = ['.dealer', '.dealer-name', '.dealership', '[class*="dealer"]']
-            for selector in dealer_selectors:
-                dealer_elem = vehicle_element.select_one(selector)
-                if dealer_elem:
-                    car_data['dealerName'] = dealer_elem.get_text(strip=True)
-                    break
-            
-            # Extract fuel type
-            fuel_selectors = ['.fuel-type', '.fuel', '[class*="fuel"]']
-            for selector in fuel_selectors:
-                fuel_elem = vehicle_element.select_one(selector)
-                if fuel_elem:
-                    fuel_text = fuel_elem.get_text(strip=True)
-                    if any(keyword in fuel_text.lower() for keyword in ['hybrid', 'electric', 'gas', 'gasoline']):
-                        car_data['fuelType'] = fuel_text
-                        break
-            
-            # Extract drivetrain
-            drivetrain_selectors = ['.drivetrain', '.drive', '[class*="drive"]']
-            for selector in drivetrain_selectors:
-                drive_elem = vehicle_element.select_one(selector)
-                if drive_elem:
-                    drive_text = drive_elem.get_text(strip=True)
-                    if any(keyword in drive_text.lower() for keyword in ['awd', 'fwd', 'rwd', '4wd']):
-                        car_data['drivetrain'] = drive_text.upper()
-                        break
-            
-            # Extract mileage
-            mileage_selectors = ['.mileage', '.miles', '[class*="mile"]']
-            for selector in mileage_selectors:
-                mile_elem = vehicle_element.select_one(selector)
-                if mile_elem:
-                    mile_text = mile_elem.get_text(strip=True)
-                    mile_match = re.search(r'([\d,]+)', mile_text)
-                    if mile_match:
-                        car_data['mileage'] = int(mile_match.group(1).replace(',', ''))
-                        break
-            
-            # Extract availability URL
-            link_elem = vehicle_element.select_one('a[href]')
-            if link_elem:
-                href = link_elem.get('href')
-                if href:
-                    if href.startswith('/'):
-                        href = 'https://www.toyota.com' + href
-                    car_data['availabilityUrl'] = href
-            
-            # Only return if we have at least model and price
-            if car_data.get('model') and car_data.get('price'):
-                return car_data
-            
+            found = self.driver.execute_script(EXTRACT_CARDS_JS, card_selectors, FIELD_SPECS)
+        except WebDriverException as e:
+            print(f"In-browser extraction failed, parsing the page instead: {e}")
+            return None
+        if not found:
+            print("No vehicle elements found with any selector")
+            return []
+        selector, rows = found
+        print(f"Found {len(rows)} vehicles with selector: {selector} (in-browser extraction)")
+        
+        scraped_data = []
+        for row in rows:
+            car_data = record_from_candidates(row.get("candidates") or {}, row.get("year"))
+            if car_data:
+                scraped_data.append(car_data)
+        print(f"Successfully scraped {len(scraped_data)} vehicles")
+        return scraped_data
+    
+    def results_container_html(self, card_selectors: List[str]):
+        """
+        (card selector, outerHTML of the results container) read in the browser, so only the cards' subtree
+        crosses the WebDriver wire and gets parsed. False when the page has no cards, None if the script failed.
+        """
+        try:
+            found = self.driver.execute_script(RESULTS_CONTAINER_JS, card_selectors)
+        except WebDriverException as e:
+            print(f"Could not read the results container, parsing the whole page: {e}")
+            return None
+        if not found:
+            return False
+        selector, html = found
+        print(f"Parsing the {len(html) / 1024:.0f} KB results container matched by {selector}")
+        return selector, html
+    
+    @staticmethod
+    def save_fixture(page_source: str):
+        """Keep a copy of a results page for the card parser benchmark"""
+        try:
+            os.makedirs(Config.HTML_FIXTURE_DIR, exist_ok=True)
+            path = os.path.join(Config.HTML_FIXTURE_DIR, f"results-{datetime.utcnow():%Y%m%d-%H%M%S-%f}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(page_source)
+        except OSError as e:
+            print(f"Could not save HTML fixture: {e}")
+    
+    vehicle_key = staticmethod(vehicle_key)
+    
+    def go_to_next_page(self) -> bool:
+        """Click the next-page (or load-more) control and wait for the list to update"""
+        next_button, selector = self.selectors.find(
+            self.driver, "next_page", NEXT_PAGE_SELECTORS, predicate=is_clickable, timeout=0
+        )
+        if not next_button:
+            print("No next page control found")
+            return False
+        
+        print(f"Going to next page with selector: {selector[1]}")
+        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", next_button)
+        card_selectors = [selector for _, selector in self.selectors.order("result_card", VEHICLE_CARD_SELECTORS)]
+        before = self.card_keys(card_selectors)
+        self.rate_limiter.acquire(Config.TOYOTA_SEARCH_URL)
+        next_button.click()
+        # The results container outlives the click, so its mutation observer is already quiet from the
+        # last page: wait for the cards to change before waiting for the DOM to settle
+        if before is not None and not self.waiter.until(
+                lambda driver: driver.execute_script(CARD_KEYS_JS, card_selectors) != before, "next page cards", budget=0):
+            print("The next page control did not change the results")
+            return False
+        self.waiter.until(dom_settled(CARD_SELECTORS), "next page", budget=0)
+        return True
+    
+    def card_keys(self, card_selectors: List[str]) -> Optional[List[str]]:
+        """Keys of the cards on the page, in page order; None if they could not be read"""
+        try:
+            return self.driver.execute_script(CARD_KEYS_JS, card_selectors)
+        except WebDriverException as e:
+            print(f"Could not read card keys: {e}")
             return None
+    
+    def iter_all_pages(self) -> Iterator[Dict[str, Any]]:
+        """Yield vehicles from up to MAX_PAGES_TO_SCRAPE result pages as each page is parsed, stopping when a page adds none"""
+        seen = set()
+        
+        for page in range(1, Config.MAX_PAGES_TO_SCRAPE + 1):
+            if page > 1:
+                print(f"Scraping results page {page}...")
+            
+            new_cars = 0
+            for car in self.scrape_inventory_data():
+                key = self.vehicle_key(car)
+                if key not in seen:
+                    seen.add(key)
+                    new_cars += 1
+                    yield car
+            
+            if page > 1 and not new_cars:
+                print(f"Page {page} only had vehicles already seen, stopping")
+                break
+            
+            if page == Config.MAX_PAGES_TO_SCRAPE or not self.go_to_next_page():
+                break
+    
+    def scrape_all_pages(self) -> List[Dict[str, Any]]:
+        """Scrape up to MAX_PAGES_TO_SCRAPE result pages, stopping when a page adds no new vehicles"""
+        return list(self.iter_all_pages())
+    
+    def page_card_keys(self, payload: PagePayload) -> Optional[Set]:
+        """Keys of the vehicles on a captured page, read without parsing its HTML; None if they could not be read"""
+        kind, content, card_selectors = payload
+        if kind == 'cars':
+            return {self.vehicle_key(car) for car in content}
+        keys = self.card_keys(card_selectors)
+        return set(keys) if keys is not None else None
+    
+    def capture_all_pages(self) -> List[PagePayload]:
+        """
+        Capture up to MAX_PAGES_TO_SCRAPE result pages without parsing them, for the parse pipeline.
+        Like iter_all_pages, pagination stops when a page's card keys add none not seen before.
+        """
+        payloads: List[PagePayload] = []
+        seen = set()
+        
+        for page in range(1, Config.MAX_PAGES_TO_SCRAPE + 1):
+            if page > 1:
+                print(f"Capturing results page {page}...")
+            try:
+                payload = self.capture_page()
+            except Exception as e:
+                print(f"Error capturing inventory page: {e}")
+                break
+            
+            keys = self.page_card_keys(payload)
+            if keys is None:
+                # Without keys, only a page identical to the last one is known to add nothing
+                if payloads and payload == payloads[-1]:
+                    print(f"Page {page} was the same as the last one, stopping")
+                    break
+            elif page > 1 and not keys - seen:
+                print(f"Page {page} only had vehicles already seen, stopping")
+                break
+            else:
+                seen |= keys
+            payloads.append(payload)
             
+            if page == Config.MAX_PAGES_TO_SCRAPE or not self.go_to_next_page():
+                break
+        
+        return payloads
+    
+    def extract_vehicle_data(self, vehicle_element) -> Optional[Dict[str, Any]]:
+        """Extract data from a single vehicle element (a node from the card parser's backend)"""
+        try:
+            return self.card_parser.extract(vehicle_element)
         except Exception as e:
             print(f"Error extracting vehicle data: {e}")
             return None
     
-    def scrape_zip_code(self, zip_code: str) -> List[Dict[str, Any]]:
-        """Complete scraping process for a single ZIP code"""
-        try:
-            print(f"\n=== Scraping ZIP code: {zip_code} ===")
-            
+    def _open_results(self, zip_code: str) -> bool:
+        """
+        Bring up a ZIP code's inventory results; False when the site reports no inventory.
+        Raises RetryableError when the page never got to results.
+        """
+        print(f"\n=== Scraping ZIP code: {zip_code} ===")
+        self.waiter.reset()
+        
+        # Go straight to results when the location can be pre-set
+        direct = self.load_results_directly(zip_code) if Config.DIRECT_SEARCH else None
+        if direct is False:
+            print(f"No inventory results found for ZIP {zip_code}")
+            return False
+        
+        if direct is None:
             # Navigate to search page
             if not self.navigate_to_search_page():
-                return []
+                raise RetryableError("search page did not load")
             
             # Search by ZIP code
             if not self.search_by_zip_code(zip_code):
-                return []
-            
-            # Scrape the results
-            car_data = self.scrape_inventory_data()
-            
-            print(f"Scraped {len(car_data)} vehicles for ZIP {zip_code}")
-            return car_data
-            
+                no_results, _ = self.selectors.probe(self.driver, "no_results", NO_RESULTS_SELECTORS)
+                if no_results:
+                    return False
+                raise RetryableError("inventory results did not load")
+            
+            # Remember where the site keeps the ZIP so the next search can skip the popup
+            self.location.learn(self.driver, zip_code)
+        return True
+    
+    def _iter_zip_code_once(self, zip_code: str) -> Iterator[Dict[str, Any]]:
+        """One attempt at scraping a ZIP code, yielding vehicles page by page"""
+        if not self._open_results(zip_code):
+            return
+        
+        # Scrape the results, following pagination
+        count = 0
+        for car in self.iter_all_pages():
+            count += 1
+            yield car
+        
+        print(f"Scraped {count} vehicles for ZIP {zip_code}")
+        print(f"Page waits for ZIP {zip_code}: {self.waiter.summary()}")
+    
+    def _capture_zip_code_once(self, zip_code: str) -> List[PagePayload]:
+        """One attempt at capturing a ZIP code's result pages"""
+        if not self._open_results(zip_code):
+            return []
+        
+        pages = self.capture_all_pages()
+        print(f"Captured {len(pages)} result pages for ZIP {zip_code}")
+        print(f"Page waits for ZIP {zip_code}: {self.waiter.summary()}")
+        return pages
+    
+    def _recover_after_error(self, error: BaseException):
+        """Replace a crashed browser before the next attempt"""
+        if not self.is_driver_alive():
+            print("Browser session lost, restarting driver before retrying")
+            self.restart_driver()
+    
+    def iter_zip_code(self, zip_code: str) -> Iterator[Dict[str, Any]]:
+        """
+        Complete scraping process for a single ZIP code, yielding vehicles as each results page is parsed.
+        Transient failures are retried until the first vehicle is out; yields nothing only when the site
+        reports no inventory and raises ScrapeFailed otherwise.
+        """
+        try:
+            yield from self.retry.iterate(
+                self._iter_zip_code_once, zip_code,
+                description=f"Scrape of ZIP {zip_code}", on_retry=self._recover_after_error
+            )
         except Exception as e:
             print(f"Error scraping ZIP code {zip_code}: {e}")
-            return []
+            raise ScrapeFailed(f"{type(e).__name__}: {e}") from e
+        finally:
+            self.selectors.save()
+    
+    def scrape_zip_code(self, zip_code: str) -> List[Dict[str, Any]]:
+        """
+        Complete scraping process for a single ZIP code, retrying transient failures.
+        Returns [] only when the site reports no inventory; raises ScrapeFailed otherwise.
+        """
+        return list(self.iter_zip_code(zip_code))
+    
+    def capture_zip_code(self, zip_code: str) -> List[PagePayload]:
+        """
+        Like scrape_zip_code, but returns the captured pages unparsed so parsing can run elsewhere.
+        Raises ScrapeFailed when retries run out.
+        """
+        try:
+            return self.retry.call(
+                self._capture_zip_code_once, zip_code,
+                description=f"Capture of ZIP {zip_code}", on_retry=self._recover_after_error
+            )
+        except Exception as e:
+            print(f"Error capturing ZIP code {zip_code}: {e}")
+            raise ScrapeFailed(f"{type(e).__name__}: {e}") from e
+        finally:
+            self.selectors.save()
+    
+    def is_driver_alive(self) -> bool:
+        """Check whether the browser session still responds"""
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+    
+    def restart_driver(self):
+        """Replace the current browser with a fresh one"""
+        self.close_driver()
+        self.setup_driver()
     
     def close_driver(self):
         """Close the browser driver"""
+        self.selectors.save()
         if self.driver:
-            self.driver.quit()
-            print("Browser driver closed")
+            try:
+                self.driver.quit()
+                print("Browser driver closed")
+            except WebDriverException as e:
+                print(f"Error closing browser driver: {e}")
+            finally:
+                self.driver = None
+                self.wait = None
@@ -0,0 +1,185 @@
+"""
+Event-driven waits for the Selenium flow
+
+Each wait polls a real page condition (element present, DOM quiet,
+network quiet) and returns as soon as it holds, up to a deadline. The
+fixed sleep it replaces is passed as a budget so the scraper can report
+how much time the condition-based wait saved; the deadline is a small
+multiple of that sleep, so a page that never settles costs little more
+than the sleep did.
+"""
+import time
+from typing import Any, Callable, List, Optional
+
+from selenium.common.exceptions import StaleElementReferenceException, WebDriverException
+
+from config import Config
+
+Condition = Callable[[Any], Any]
+
+# Watches the element holding the first card matched by arguments[0] (the body until a card exists) for
+# added/removed nodes and text changes; attribute changes (carousels, spinners) do not count as activity
+MUTATION_OBSERVER_JS = """
+var selectors = arguments[0], target = document.body, state = window.__scraperMutations;
+for (var i = 0; i < selectors.length; i++) {
+    var card = document.querySelector(selectors[i]);
+    if (card) {
+        target = card.parentElement || document.body;
+        break;
+    }
+}
+if (!state || state.target !== target) {
+    if (state) state.observer.disconnect();
+    state = window.__scraperMutations = {target: target, last: performance.now()};
+    state.observer = new MutationObserver(function () {
+        state.last = performance.now();
+    });
+    state.observer.observe(target, {childList: true, subtree: true, characterData: true});
+}
+return performance.now() - state.last;
+"""
+
+# Counts finished resource loads with a PerformanceObserver, which, unlike getEntriesByType, does not stop
+# at the resource timing buffer's size; browsers without one count and clear the buffer instead
+RESOURCE_COUNT_JS = """
+var state = window.__scraperResources;
+if (!state) {
+    state = window.__scraperResources = {count: 0, observed: false};
+    try {
+        new PerformanceObserver(function (list) {
+            state.count += list.getEntries().length;
+        }).observe({type: 'resource', buffered: true});
+        state.observed = true;
+    } catch (e) {}
+}
+if (!state.observed) {
+    state.count += performance.getEntriesByType('resource').length;
+    performance.clearResourceTimings();
+}
+return [state.count, document.readyState];
+"""
+
+
+def dom_settled(container_selectors: Optional[List[str]] = None, quiet_ms: Optional[int] = None) -> Condition:
+    """
+    Condition that holds once nodes and text have not changed for quiet_ms inside the element holding the
+    first card matched by container_selectors (the whole body until one matches)
+    """
+    container_selectors = container_selectors or []
+    quiet_ms = Config.DOM_QUIET_MS if quiet_ms is None else quiet_ms
+
+    def condition(driver):
+        return driver.execute_script(MUTATION_OBSERVER_JS, container_selectors) >= quiet_ms
+    return condition
+
+
+def network_idle(quiet_ms: Optional[int] = None) -> Condition:
+    """Condition that holds once the document is loaded and no resource has finished loading for quiet_ms"""
+    quiet_ms = Config.NETWORK_QUIET_MS if quiet_ms is None else quiet_ms
+    state = {"count": None, "since": time.monotonic()}
+
+    def condition(driver):
+        count, ready_state = driver.execute_script(RESOURCE_COUNT_JS)
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+        return ready_state == "complete" and (now - state["since"]) * 1000 >= quiet_ms
+    return condition
+
+
+def element_present(registry, role: str, candidates, predicate=None) -> Condition:
+    """Condition that holds once any candidate selector for a role matches"""
+    def condition(driver):
+        kwargs = {"predicate": predicate} if predicate else {}
+        matches, _ = registry.probe(driver, role, candidates, **kwargs)
+        return matches
+    return condition
+
+
+def element_gone(element) -> Condition:
+    """Condition that holds once an element is hidden or detached"""
+    def condition(driver):
+        try:
+            return not element.is_displayed()
+        except StaleElementReferenceException:
+            return True
+    return condition
+
+
+def any_of(*conditions: Condition) -> Condition:
+    def condition(driver):
+        for check in conditions:
+            result = check(driver)
+            if result:
+                return result
+        return False
+    return condition
+
+
+def all_of(*conditions: Condition) -> Condition:
+    def condition(driver):
+        result = True
+        for check in conditions:
+            result = check(driver)
+            if not result:
+                return False
+        return result
+    return condition
+
+
+class PageWaiter:
+    """Polls page conditions and tracks time waited against the fixed sleeps they replace"""
+
+    def __init__(self, driver, poll_interval: Optional[float] = None):
+        self.driver = driver
+        self.poll_interval = poll_interval or Config.WAIT_POLL_INTERVAL
+        self.reset()
+
+    def reset(self):
+        """Clear the per-ZIP counters"""
+        self.waited = 0.0
+        self.budget = 0.0
+        self.timeouts: List[str] = []
+
+    def until(self, condition: Condition, label: str, budget: float, timeout: Optional[float] = None):
+        """
+        Wait for a condition, returning its result or None if the deadline passed. Waits that replace a
+        fixed sleep give up after WAIT_BUDGET_MULTIPLE times that sleep, at most WAIT_TIMEOUT.
+        """
+        if timeout is None:
+            timeout = Config.WAIT_TIMEOUT
+            if budget:
+                timeout = min(timeout, budget * Config.WAIT_BUDGET_MULTIPLE)
+        start = time.monotonic()
+        deadline = start + timeout
+        result = None
+
+        while True:
+            try:
+                result = condition(self.driver)
+            except (StaleElementReferenceException, WebDriverException):
+                result = None
+            if result or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        waited = time.monotonic() - start
+        if budget:
+            # Only waits that replaced a fixed sleep count towards the savings report
+            self.waited += waited
+            self.budget += budget
+        if result and budget:
+            print(f"⏱️  {label}: ready after {waited:.2f}s (fixed wait was {budget:g}s, saved {budget - waited:+.2f}s)")
+        elif result:
+            print(f"⏱️  {label}: ready after {waited:.2f}s")
+        else:
+            self.timeouts.append(label)
+            print(f"⏱️  {label}: not ready after {waited:.2f}s deadline")
+        return result
+
+    def summary(self) -> str:
+        """Describe total time waited against the fixed-sleep budget"""
+        text = f"waited {self.waited:.1f}s vs {self.budget:g}s of fixed sleeps (saved {self.budget - self.waited:+.1f}s)"
+        if self.timeouts:
+            text += f", {len(self.timeouts)} wait(s) hit the deadline"
+        return text
@@ -0,0 +1,176 @@
+"""
+MongoDB-backed ZIP job queue with leases, for scraping from several hosts
+
+`main.py --enqueue` writes one job per ZIP code into the queue collection.
+Any number of `main.py --worker` processes, on any host that can reach
+MongoDB, then claim jobs with an atomic findOneAndUpdate that sets a
+lease. A background heartbeat extends the lease while the ZIP is being
+scraped. A job whose lease expires (the worker died or hung) can be
+claimed again by another worker, up to QUEUE_MAX_ATTEMPTS times.
+"""
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import Config
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class LeaseLostError(Exception):
+    """Another worker claimed the job after this worker's lease expired"""
+
+
+QUEUE_INDEXES = [
+    IndexModel([('status', ASCENDING), ('priority', ASCENDING)], name='status_priority'),
+    IndexModel([('status', ASCENDING), ('leaseExpiresAt', ASCENDING)], name='status_lease_expiry'),
+]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """ZIP jobs in a Mongo collection, claimed with expiring leases"""
+
+    def __init__(self, db, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.collection = db[Config.WORK_QUEUE_COLLECTION]
+        self.lease_seconds = lease_seconds or Config.QUEUE_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.QUEUE_MAX_ATTEMPTS
+        self.collection.create_indexes(QUEUE_INDEXES)
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def enqueue(self, zip_codes: Iterable[str]) -> int:
+        """Queue ZIP codes in order; finished jobs are queued again, leased ones are left alone"""
+        zip_codes = list(zip_codes)
+        job = {'status': QUEUED, 'attempts': 0, 'enqueuedAt': datetime.utcnow()}
+        operations = [
+            UpdateOne({'_id': zip_code, 'status': {'$ne': LEASED}},
+                      {'$set': dict(job, priority=priority),
+                       '$unset': {'leaseOwner': '', 'leaseExpiresAt': '', 'lastError': '', 'finishedAt': ''}},
+                      upsert=True)
+            for priority, zip_code in enumerate(zip_codes)
+        ]
+
+        skipped = 0
+        for start in range(0, len(operations), Config.DB_BATCH_SIZE):
+            try:
+                self.collection.bulk_write(operations[start:start + Config.DB_BATCH_SIZE], ordered=False)
+            except BulkWriteError as e:
+                # A leased job does not match the filter, so its upsert hits the existing _id
+                errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in errors):
+                    raise
+                skipped += len(errors)
+
+        if skipped:
+            print(f"⏭️  {skipped} ZIP codes are leased by a worker right now and were left as they are")
+        return len(zip_codes) - skipped
+
+    def _fail_exhausted(self):
+        """Give up on jobs whose lease expired after the last allowed attempt"""
+        self.collection.update_many(
+            {'status': LEASED, 'leaseExpiresAt': {'$lt': datetime.utcnow()}, 'attempts': {'$gte': self.max_attempts}},
+            {'$set': {'status': FAILED, 'lastError': f'lease expired {self.max_attempts} times'}}
+        )
+
+    def claim(self, worker_id: str) -> Optional[str]:
+        """Atomically lease the next queued (or lease-expired) job, returning its ZIP code"""
+        self._fail_exhausted()
+        now = datetime.utcnow()
+        job = self.collection.find_one_and_update(
+            {'$or': [
+                {'status': QUEUED},
+                {'status': LEASED, 'leaseExpiresAt': {'$lt': now}, 'attempts': {'$lt': self.max_attempts}},
+            ]},
+            {'$set': {'status': LEASED, 'leaseOwner': worker_id, 'leaseExpiresAt': self._lease_expiry(),
+                      'claimedAt': now},
+             '$inc': {'attempts': 1}},
+            sort=[('priority', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        return job['_id'] if job else None
+
+    def heartbeat(self, zip_code: str, worker_id: str) -> bool:
+        """Extend a lease; False means the lease was lost to another worker"""
+        result = self.collection.update_one(
+            {'_id': zip_code, 'status': LEASED, 'leaseOwner': worker_id},
+            {'$set': {'leaseExpiresAt': self._lease_expiry()}}
+        )
+        return result.matched_count == 1
+
+    def complete(self, zip_code: str, worker_id: str, cars: int) -> bool:
+        """Mark a leased job done"""
+        result = self.collection.update_one(
+            {'_id': zip_code, 'status': LEASED, 'leaseOwner': worker_id},
+            {'$set': {'status': DONE, 'cars': cars, 'finishedAt': datetime.utcnow()},
+             '$unset': {'leaseExpiresAt': ''}}
+        )
+        return result.matched_count == 1
+
+    def fail(self, zip_code: str, worker_id: str, reason: str, retry: bool = False) -> bool:
+        """Release a leased job, back into the queue if retry is set and attempts remain"""
+        job = self.collection.find_one({'_id': zip_code, 'status': LEASED, 'leaseOwner': worker_id}, {'attempts': 1})
+        if not job:
+            return False
+        status = QUEUED if retry and job.get('attempts', 0) < self.max_attempts else FAILED
+        self.collection.update_one(
+            {'_id': zip_code, 'status': LEASED, 'leaseOwner': worker_id},
+            {'$set': {'status': status, 'lastError': reason, 'finishedAt': datetime.utcnow()},
+             '$unset': {'leaseOwner': '', 'leaseExpiresAt': ''}}
+        )
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        counts = {status: 0 for status in (QUEUED, LEASED, DONE, FAILED)}
+        for doc in self.collection.aggregate([{'$group': {'_id': '$status', 'jobs': {'$sum': 1}}}]):
+            counts[doc['_id']] = doc['jobs']
+        return counts
+
+
+class LeaseHeartbeat:
+    """Context manager that keeps a job's lease alive from a background thread"""
+
+    def __init__(self, work_queue: WorkQueue, zip_code: str, worker_id: str):
+        self.work_queue = work_queue
+        self.zip_code = zip_code
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{zip_code}", daemon=True)
+
+    def _run(self):
+        interval = self.work_queue.lease_seconds / 3
+        while not self._stop.wait(interval):
+            try:
+                if not self.work_queue.heartbeat(self.zip_code, self.worker_id):
+                    self.lost = True
+                    print(f"⚠️  Lease on ZIP {self.zip_code} was lost to another worker")
+                    return
+            except Exception as e:
+                print(f"Heartbeat for ZIP {self.zip_code} failed: {e}")
+
+    def check(self):
+        """Raise LeaseLostError once the lease is lost, so the worker stops working on a job it no longer owns"""
+        if self.lost:
+            raise LeaseLostError(f"lease on ZIP {self.zip_code} was lost to another worker")
+
+    def __enter__(self) -> "LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self._stop.set()
+        self._thread.join()
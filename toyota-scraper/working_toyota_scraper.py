@@ -8,7 +8,75 @@ Toyota Inventory Scraper (GraphQL API)
 
 import requests
 import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple
+from config import Config
+from http_cache import RawResponse, get_response_cache
+from rate_limiter import endpoint_of, get_rate_limiter
+from retry import RetryPolicy
+
+INVENTORY_FIELDS = """{
+            totalCount
+            vehicles {
+                vin
+                year
+                model
+                trim
+                msrp
+                drivetrain
+                exteriorColor
+                availability
+                fuelType
+            }
+        }"""
+
+SEARCH_INVENTORY_QUERY = """
+    query SearchInventory($zip: String!, $pageSize: Int, $page: Int) {
+        searchInventory(zip: $zip, pageSize: $pageSize, page: $page) %s
+    }
+""" % INVENTORY_FIELDS
+
+# Status codes a server uses to turn down a document that is too large or too costly
+BATCH_REJECTION_STATUS_CODES = {400, 413, 414, 422, 431}
+
+PageKey = Tuple[str, int]
+PageResults = Tuple[Dict[PageKey, Dict[str, Any]], Dict[PageKey, str]]
+PagePlan = Generator[List[List[PageKey]], List[Any], PageResults]
+# ('fetch', keys) is answered with (pages, errors); ('vehicles', zip, vehicles) and ('done', zip, error) are not
+InventoryEvent = Tuple[Any, ...]
+InventoryRounds = Generator[InventoryEvent, Optional[PageResults], None]
+
+
+class BatchRejectedError(Exception):
+    """The server refused a batched document as a whole (too large, too complex)"""
+
+
+class InventoryFetchError(Exception):
+    """A ZIP code's inventory could not be fetched"""
+
+
+def is_batch_rejection(exc: BaseException) -> bool:
+    if isinstance(exc, BatchRejectedError):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in BATCH_REJECTION_STATUS_CODES
+
+
+def new_vehicles(vehicles: List[Dict[str, Any]], seen_vins: Set[str]) -> List[Dict[str, Any]]:
+    """Vehicles whose VIN has not been seen yet (ones without a VIN always count as new)"""
+    fresh = []
+    for vehicle in vehicles:
+        vin = vehicle.get("vin")
+        if vin:
+            if vin in seen_vins:
+                continue
+            seen_vins.add(vin)
+        fresh.append(vehicle)
+    return fresh
+
 
 class ToyotaInventoryAPI:
     def __init__(self):
@@ -17,41 +85,73 @@ class ToyotaInventoryAPI:
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0"
         }
+        self.retry = RetryPolicy()
+        # Its own budget, apart from the search pages the browsers load from the same host
+        self.rate_key = endpoint_of(self.api_url)
+        self.rate_limiter = get_rate_limiter()
+        self.rate_limiter.configure(self.rate_key, Config.API_REQUESTS_PER_SECOND)
+        self.cache = get_response_cache()
+        self.batch_size = max(1, Config.API_BATCH_SIZE)
+        self._batch_lock = threading.Lock()
 
-    def get_inventory(self, zip_code="78712", limit=20):
-        """Query Toyota's API for live vehicle listings"""
-        payload = {
+    def build_payload(self, zip_code: str, limit: int = 20, page: int = 1) -> Dict[str, Any]:
+        """Build the SearchInventory GraphQL payload for a ZIP code"""
+        return {
             "operationName": "SearchInventory",
             "variables": {
                 "zip": zip_code,
                 "pageSize": limit,
-                "page": 1
+                "page": page
             },
-            "query": """
-                query SearchInventory($zip: String!, $pageSize: Int, $page: Int) {
-                    searchInventory(zip: $zip, pageSize: $pageSize, page: $page) {
-                        vehicles {
-                            year
-                            model
-                            trim
-                            msrp
-                            drivetrain
-                            exteriorColor
-                            availability
-                            fuelType
-                        }
-                    }
-                }
-            """
+            "query": SEARCH_INVENTORY_QUERY
+        }
+
+    def build_batch_payload(self, keys: List[PageKey], limit: int = 20) -> Dict[str, Any]:
+        """One GraphQL document that asks for several ZIP/page results through field aliases q0, q1, ..."""
+        selection = " ".join(INVENTORY_FIELDS.split())
+        definitions = ["$pageSize: Int"]
+        fields = []
+        variables: Dict[str, Any] = {"pageSize": limit}
+        for index, (zip_code, page) in enumerate(keys):
+            definitions += [f"$zip{index}: String!", f"$page{index}: Int"]
+            fields.append(f"q{index}: searchInventory(zip: $zip{index}, pageSize: $pageSize, page: $page{index}) "
+                          f"{selection}")
+            variables.update({f"zip{index}": zip_code, f"page{index}": page})
+        return {
+            "operationName": "SearchInventoryBatch",
+            "variables": variables,
+            "query": f"query SearchInventoryBatch({', '.join(definitions)}) {{\n" + "\n".join(fields) + "\n}"
         }
 
-        response = requests.post(self.api_url, headers=self.headers, data=json.dumps(payload))
-        data = response.json()
+    def split_batch_response(self, data: Dict[str, Any], keys: List[PageKey]) -> Dict[PageKey, Optional[Dict[str, Any]]]:
+        """Per-key responses shaped like a single SearchInventory answer (None where an alias failed)"""
+        results = data.get("data")
+        if results is None:
+            # No data at all: the document was rejected before any field ran
+            raise BatchRejectedError("; ".join(error.get("message", "") for error in data.get("errors") or [])
+                                     or "batched query returned no data")
+        split = {}
+        for index, key in enumerate(keys):
+            result = results.get(f"q{index}")
+            split[key] = {"data": {"searchInventory": result}} if result is not None else None
+        return split
+
+    def shrink_batch(self, rejected_size: int, exc: BaseException):
+        """Halve the batch size after the server turned down a document of rejected_size queries"""
+        with self._batch_lock:
+            new_size = max(1, rejected_size // 2)
+            if new_size < self.batch_size:
+                self.batch_size = new_size
+                print(f"📦 Server rejected a batch of {rejected_size} queries ({type(exc).__name__}: {exc}); "
+                      f"batching {new_size} at a time from now on")
 
-        vehicles = data.get("data", {}).get("searchInventory", {}).get("vehicles", [])
+    def format_vehicles(self, data: Dict[str, Any], zip_code: str) -> List[Dict[str, Any]]:
+        """Map a SearchInventory response onto car records"""
+        vehicles = (data.get("data") or {}).get("searchInventory", {}).get("vehicles", [])
         formatted = []
         for v in vehicles:
             formatted.append({
+                "vin": v.get("vin"),
                 "year": v.get("year"),
                 "model": v.get("model"),
                 "trim": v.get("trim"),
@@ -65,6 +165,185 @@ class ToyotaInventoryAPI:
             })
         return formatted
 
+    def page_count(self, data: Dict[str, Any], limit: int, max_pages: int) -> Optional[int]:
+        """Number of pages to fetch for a ZIP, or None if the response has no total count"""
+        total = (data.get("data") or {}).get("searchInventory", {}).get("totalCount")
+        if not isinstance(total, int):
+            return None
+        return max(1, min(math.ceil(total / limit), max_pages))
+
+    def _send(self, payload: Dict[str, Any], extra_headers: Dict[str, str]) -> RawResponse:
+        self.rate_limiter.acquire(self.rate_key)
+        response = requests.post(self.api_url, headers=dict(self.headers, **extra_headers), data=json.dumps(payload),
+                                 timeout=Config.PAGE_LOAD_TIMEOUT)
+        self.rate_limiter.observe(self.rate_key, response.status_code, response.headers.get("Retry-After"))
+        return response.status_code, response.headers, response.content
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.cache.request("POST", self.api_url, lambda headers: self._send(payload, headers), body=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def get_page(self, zip_code: str, limit: int, page: int) -> Dict[str, Any]:
+        """Fetch one raw SearchInventory page, retrying timeouts and 429/5xx responses"""
+        payload = self.build_payload(zip_code, limit, page)
+        return self.retry.call(self._post, payload, description=f"Inventory request for ZIP {zip_code} page {page}")
+
+    def get_batch(self, keys: List[PageKey], limit: int) -> Dict[PageKey, Optional[Dict[str, Any]]]:
+        """Fetch several raw pages in one batched request"""
+        payload = self.build_batch_payload(keys, limit)
+        data = self.retry.call(self._post, payload, description=f"Batched inventory request for {len(keys)} pages")
+        return self.split_batch_response(data, keys)
+
+    def page_plan(self, keys: Iterable[PageKey]) -> PagePlan:
+        """
+        Plan (zip, page) fetches as requests the server accepts, without doing any I/O. Yields the requests
+        to send at once (one key is a plain query, several an aliased batch), is sent back each request's
+        result or the exception it raised, in the same order, and returns (pages, errors)
+        """
+        pending = list(keys)
+        singles: List[PageKey] = []
+        pages: Dict[PageKey, Dict[str, Any]] = {}
+        errors: Dict[PageKey, str] = {}
+        while pending or singles:
+            size = self.batch_size
+            planned = [pending[i:i + size] for i in range(0, len(pending), size)] + [[key] for key in singles]
+            pending, singles = [], []
+            outcomes = yield planned
+            for request, outcome in zip(planned, outcomes):
+                if isinstance(outcome, Exception):
+                    if len(request) > 1 and is_batch_rejection(outcome):
+                        self.shrink_batch(len(request), outcome)
+                        pending += request
+                    else:
+                        errors.update({key: f"{type(outcome).__name__}: {outcome}" for key in request})
+                elif len(request) == 1:
+                    pages[request[0]] = outcome
+                else:
+                    for key in request:
+                        if outcome[key] is None:
+                            # Only this alias failed: ask for it on its own
+                            singles.append(key)
+                        else:
+                            pages[key] = outcome[key]
+        return pages, errors
+
+    def _send_requests(self, planned: List[List[PageKey]], limit: int) -> List[Any]:
+        """Send planned requests concurrently, returning each one's result or the exception it raised"""
+        def send(request: List[PageKey]) -> Any:
+            try:
+                if len(request) == 1:
+                    return self.get_page(request[0][0], limit, request[0][1])
+                return self.get_batch(request, limit)
+            except Exception as e:
+                return e
+
+        if len(planned) == 1:
+            return [send(planned[0])]
+        with ThreadPoolExecutor(max_workers=min(Config.API_CONCURRENCY, len(planned))) as executor:
+            return list(executor.map(send, planned))
+
+    def get_pages(self, keys: Iterable[PageKey], limit: int) -> PageResults:
+        """Fetch (zip, page) pages in as few requests as the server accepts, returning (pages, errors)"""
+        plan = self.page_plan(keys)
+        try:
+            planned = next(plan)
+            while True:
+                planned = plan.send(self._send_requests(planned, limit))
+        except StopIteration as done:
+            return done.value
+
+    def inventory_rounds(self, zip_codes: Iterable[str], limit: int, max_pages: int,
+                         window: Optional[int] = None) -> InventoryRounds:
+        """
+        Plan inventory fetches for ZIP codes as rounds, without doing any I/O. Yields ('fetch', keys) and is
+        sent back (pages, errors) for those (zip, page) keys; yields ('vehicles', zip, vehicles) with each
+        page's new vehicles, and ('done', zip, error) once a ZIP code is finished (error is None on success).
+        At most window pages per ZIP are asked for at once, so stopping early leaves the rest unrequested.
+        """
+        window = window or Config.API_CONCURRENCY
+        zip_codes = list(dict.fromkeys(zip_codes))
+        seen_vins: Dict[str, Set[str]] = {zip_code: set() for zip_code in zip_codes}
+        next_pages: Dict[str, int] = {}
+        last_pages: Dict[str, int] = {}
+        # ZIP codes without a total count: one page a round until a page comes back short or repeats itself
+        walking: Set[str] = set()
+
+        # Round 1: every ZIP's first page
+        pages, errors = yield 'fetch', [(zip_code, 1) for zip_code in zip_codes]
+        for zip_code in zip_codes:
+            if (zip_code, 1) in errors:
+                yield 'done', zip_code, errors[zip_code, 1]
+                continue
+            first_page = pages[zip_code, 1]
+            vehicles = self.format_vehicles(first_page, zip_code)
+            fresh = new_vehicles(vehicles, seen_vins[zip_code])
+            if fresh:
+                yield 'vehicles', zip_code, fresh
+            page_count = self.page_count(first_page, limit, max_pages)
+            if page_count is None:
+                walking.add(zip_code)
+                page_count = max_pages if len(vehicles) >= limit else 1
+            if page_count > 1:
+                next_pages[zip_code] = 2
+                last_pages[zip_code] = page_count
+            else:
+                yield 'done', zip_code, None
+
+        # Later rounds: the next window of pages of ZIPs with a total count, the next page of walking ones
+        while next_pages:
+            wanted = {}
+            for zip_code, page in next_pages.items():
+                size = 1 if zip_code in walking else window
+                wanted[zip_code] = range(page, min(last_pages[zip_code], page + size - 1) + 1)
+            pages, errors = yield 'fetch', [(zip_code, page) for zip_code, wanted_pages in wanted.items()
+                                            for page in wanted_pages]
+            for zip_code, wanted_pages in wanted.items():
+                for page in wanted_pages:
+                    error = errors.get((zip_code, page))
+                    if error:
+                        break
+                    vehicles = self.format_vehicles(pages[zip_code, page], zip_code)
+                    fresh = new_vehicles(vehicles, seen_vins[zip_code])
+                    if fresh:
+                        yield 'vehicles', zip_code, fresh
+                    if not fresh or (zip_code in walking and len(vehicles) < limit):
+                        break
+                else:
+                    if wanted_pages[-1] < last_pages[zip_code]:
+                        next_pages[zip_code] = wanted_pages[-1] + 1
+                        continue
+                del next_pages[zip_code]
+                yield 'done', zip_code, error
+
+    def iter_rounds(self, zip_codes: Iterable[str], limit: int = 20,
+                    max_pages: Optional[int] = None) -> Iterator[InventoryEvent]:
+        """Run inventory_rounds over HTTP, yielding its ('vehicles', ...) and ('done', ...) events"""
+        rounds = self.inventory_rounds(zip_codes, limit, max_pages or Config.MAX_PAGES_TO_SCRAPE)
+        reply = None
+        while True:
+            try:
+                event = rounds.send(reply)
+            except StopIteration:
+                return
+            if event[0] == 'fetch':
+                reply = self.get_pages(event[1], limit)
+            else:
+                reply = None
+                yield event
+
+    def iter_inventory(self, zip_code="78712", limit=20, max_pages: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield live vehicle listings page by page as they arrive, following pagination"""
+        for event in self.iter_rounds([zip_code], limit, max_pages):
+            if event[0] == 'vehicles':
+                yield from event[2]
+            elif event[2]:
+                raise InventoryFetchError(event[2])
+
+    def get_inventory(self, zip_code="78712", limit=20, max_pages: Optional[int] = None):
+        """Query Toyota's API for live vehicle listings, following pagination"""
+        return list(self.iter_inventory(zip_code, limit, max_pages))
+
 
 def main():
     scraper = ToyotaInventoryAPI()